@@ -0,0 +1,182 @@
+"""Controle de admissão: limite de cálculos simultâneos por endpoint, com fila.
+
+Com um worker, uma rajada de requisições caras (ex.: `/ranking/ufs` com
+filtro de fabricante, que vai ao rollup) ocupava todas as conexões do pool e
+enfileirava sem limite na espera por elas; o `/health` do Render, que divide
+o mesmo processo, passava a responder tarde e a instância era reiniciada.
+Aqui cada endpoint tem no máximo `concorrência` cálculos indo ao banco e uma
+fila de `fila` requisições esperando vaga:
+
+- vaga livre: a requisição calcula na hora;
+- fila com espaço: espera até `ADMISSION_QUEUE_TIMEOUT_MS` por uma vaga;
+- fila cheia (ou espera esgotada): 503 imediato com `Retry-After`, sem
+  tocar no pool.
+
+Só o cálculo passa pela admissão (ver `serve` em app/main.py): respostas do
+cache, 304 e requisições que esperam um cálculo idêntico em andamento
+(app/singleflight.py) não ocupam vaga. `/health` e `/metrics` não passam por
+`serve` nem abrem sessão: são a faixa prioritária, que não disputa vaga nem
+conexão com os endpoints do dashboard.
+
+Ajustes opcionais por variável de ambiente:
+
+    ADMISSION_CONTROL            (default 1; 0 desliga, para comparação em benchmark)
+    ADMISSION_CONCURRENCY        (default 3) — cálculos simultâneos por endpoint
+    ADMISSION_QUEUE              (default 16) — requisições esperando vaga, por endpoint
+    ADMISSION_LIMITS             por endpoint, "concorrência/fila", ex.: "dashboard=2/8,ranking_ufs=2/4"
+    ADMISSION_QUEUE_TIMEOUT_MS   (default 1000) — espera máxima na fila
+    ADMISSION_RETRY_AFTER        (default 1) — segundos sugeridos no 503
+"""
+import asyncio
+import contextlib
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from .cache import _env_number
+from .metrics import Counter
+
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1").strip().lower() not in ("0", "false", "no")
+ADMISSION_CONCURRENCY = max(1, _env_number("ADMISSION_CONCURRENCY", 3))
+ADMISSION_QUEUE = max(0, _env_number("ADMISSION_QUEUE", 16))
+ADMISSION_QUEUE_TIMEOUT_MS = _env_number("ADMISSION_QUEUE_TIMEOUT_MS", 1000)
+ADMISSION_RETRY_AFTER = _env_number("ADMISSION_RETRY_AFTER", 1)
+
+# Limites padrão por endpoint; /dashboard e /batch abrem duas sessões cada
+DEFAULT_ENDPOINT_LIMITS = {"dashboard": (2, 8), "batch": (2, 8)}
+
+ADMITTED = Counter("admission_admitted_total", "Cálculos admitidos, direto ou depois da fila.", ("endpoint", "via"))
+QUEUED = Counter("admission_queued_total", "Requisições que esperaram vaga na fila.", ("endpoint",))
+REJECTED = Counter("admission_rejected_total", "Requisições recusadas com 503.", ("endpoint", "reason"))
+
+
+def parse_endpoint_limits(value: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    """`"dashboard=2/8, overview=4/16"` -> {"dashboard": (2, 8), "overview": (4, 16)}."""
+    limits: Dict[str, Tuple[int, int]] = {}
+    for item in (value or "").split(","):
+        name, _, spec = item.partition("=")
+        concurrency, _, queue = spec.partition("/")
+        try:
+            limits[name.strip()] = (max(1, int(concurrency)), max(0, int(queue)) if queue else ADMISSION_QUEUE)
+        except ValueError:
+            continue
+    return limits
+
+
+ENDPOINT_LIMITS = {**DEFAULT_ENDPOINT_LIMITS, **parse_endpoint_limits(os.getenv("ADMISSION_LIMITS"))}
+
+
+class Overloaded(Exception):
+    """Sem vaga para o cálculo: fila cheia ou espera esgotada."""
+
+
+class EndpointLimiter:
+    """Vagas de cálculo de um endpoint e a fila (FIFO) de quem espera por
+    elas. Só o event loop mexe no estado, então não há lock; ao liberar uma
+    vaga com fila, ela passa direto para o primeiro da fila."""
+
+    def __init__(self, endpoint: str, concurrency: int, queue: int):
+        self.endpoint = endpoint
+        self.concurrency = concurrency
+        self.queue = queue
+        self.active = 0
+        self._waiters: Deque["asyncio.Future"] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: Optional[float]) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            ADMITTED.inc(1, self.endpoint, "direto")
+            return
+        if len(self._waiters) >= self.queue:
+            REJECTED.inc(1, self.endpoint, "fila_cheia")
+            raise Overloaded(f"fila de {self.endpoint} cheia")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        QUEUED.inc(1, self.endpoint)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga chegou junto com o timeout/cancelamento: repassá-la
+                self.release()
+            else:
+                with contextlib.suppress(ValueError):
+                    self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                REJECTED.inc(1, self.endpoint, "espera")
+                raise Overloaded(f"sem vaga em {self.endpoint} em {timeout}s") from None
+            raise
+        ADMITTED.inc(1, self.endpoint, "fila")
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"concurrency": self.concurrency, "queue": self.queue, "active": self.active, "waiting": self.waiting}
+
+
+class AdmissionControl:
+    def __init__(self, enabled: bool = ADMISSION_CONTROL):
+        self.enabled = enabled
+        self._limiters: Dict[str, EndpointLimiter] = {}
+
+    def limiter(self, endpoint: str) -> EndpointLimiter:
+        # Os nomes vêm de `serve` (conjunto fixo), não da URL
+        limiter = self._limiters.get(endpoint)
+        if limiter is None:
+            concurrency, queue = ENDPOINT_LIMITS.get(endpoint, (ADMISSION_CONCURRENCY, ADMISSION_QUEUE))
+            limiter = self._limiters[endpoint] = EndpointLimiter(endpoint, concurrency, queue)
+        return limiter
+
+    @contextlib.asynccontextmanager
+    async def slot(self, endpoint: str) -> AsyncIterator[None]:
+        """Vaga de cálculo do endpoint; `Overloaded` se não houver."""
+        if not self.enabled:
+            yield
+            return
+        limiter = self.limiter(endpoint)
+        timeout = ADMISSION_QUEUE_TIMEOUT_MS / 1000 if ADMISSION_QUEUE_TIMEOUT_MS > 0 else None
+        await limiter.acquire(timeout)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, **{name: l.stats() for name, l in sorted(self._limiters.items())}}
+
+
+admission_control = AdmissionControl()
+
+
+def is_overloaded(error: BaseException) -> bool:
+    """`Overloaded` direto ou visto por quem esperava o mesmo cálculo
+    (`SharedFailure` com a causa original)."""
+    return isinstance(error, Overloaded) or isinstance(error.__cause__, Overloaded)
+
+
+def render_metrics_lines() -> str:
+    lines = []
+    for metric in (ADMITTED, QUEUED, REJECTED):
+        lines.extend(metric.render())
+    limiters = sorted(admission_control._limiters.items())
+    lines += [
+        "# HELP admission_active Cálculos em andamento por endpoint.",
+        "# TYPE admission_active gauge",
+        *(f'admission_active{{endpoint="{name}"}} {l.active}' for name, l in limiters),
+        "# HELP admission_waiting Requisições na fila por endpoint.",
+        "# TYPE admission_waiting gauge",
+        *(f'admission_waiting{{endpoint="{name}"}} {l.waiting}' for name, l in limiters),
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,86 @@
+"""Gravação dos contadores de doses aplicadas e ESAVI reduzidos dos microdados.
+
+Os microdados de vacinação (centenas de milhões de linhas) não entram no
+Postgres: `load_aplicacao.py` os reduz a contadores no grão (ano, mes, sigla,
+fabricante_id) e este módulo os grava em `aplicacao_rollup`. Em seguida,
+`estado_snapshot` (app/estados.py) e `timeseries` são recalculados a partir
+da view `vacinacao_rollup` (distribuição + aplicação), com a eficiência real.
+
+A gravação é idempotente por (ano, mes, sigla): os grupos presentes numa
+carga substituem os valores anteriores daquela medida, então um mês de uma UF
+pode ser reprocessado sem limpar a tabela.
+"""
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .estados import eficiencia_sql, refresh_estado_snapshot
+from .queries import APLICACAO_TABLE, ROLLUP_TABLE
+
+
+# Medidas de `aplicacao_rollup` preenchidas por tipo de microdado
+MEDIDAS = {"doses": "aplicadas", "esavi": "esavi"}
+
+CountKey = Tuple[int, int, Optional[str], Optional[int]]
+
+
+def merge_counts(conn: Connection, counts: Dict[CountKey, int], medida: str) -> int:
+    """Substitui `medida` nos (ano, mes, sigla) presentes em `counts`.
+
+    Retorna o número de grupos gravados. Linhas que ficam com as duas medidas
+    zeradas são apagadas.
+    """
+    if medida not in MEDIDAS.values():
+        raise ValueError(f"medida desconhecida: {medida}")
+    conn.execute(text(
+        "CREATE TEMP TABLE aplicacao_counts (ano integer, mes integer, sigla text, "
+        "fabricante_id smallint, n bigint) ON COMMIT DROP"
+    ))
+    if counts:
+        conn.execute(
+            text("INSERT INTO aplicacao_counts (ano, mes, sigla, fabricante_id, n) "
+                 "VALUES (:ano, :mes, :sigla, :fabricante_id, :n)"),
+            [{"ano": ano, "mes": mes, "sigla": sigla, "fabricante_id": fabricante_id, "n": n}
+             for (ano, mes, sigla, fabricante_id), n in counts.items()],
+        )
+
+    same_group = "r.ano = c.ano AND r.mes = c.mes AND r.sigla IS NOT DISTINCT FROM c.sigla"
+    same_key = f"{same_group} AND r.fabricante_id IS NOT DISTINCT FROM c.fabricante_id"
+    conn.execute(text(
+        f"UPDATE {APLICACAO_TABLE} AS r SET {medida} = 0 "
+        f"WHERE EXISTS (SELECT 1 FROM aplicacao_counts AS c WHERE {same_group})"
+    ))
+    conn.execute(text(
+        f"UPDATE {APLICACAO_TABLE} AS r SET {medida} = c.n FROM aplicacao_counts AS c WHERE {same_key}"
+    ))
+    conn.execute(text(
+        f"INSERT INTO {APLICACAO_TABLE} (ano, mes, sigla, fabricante_id, aplicadas, esavi) "
+        f"SELECT c.ano, c.mes, c.sigla, c.fabricante_id, "
+        f"{'c.n' if medida == 'aplicadas' else '0'}, {'c.n' if medida == 'esavi' else '0'} "
+        f"FROM aplicacao_counts AS c "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {APLICACAO_TABLE} AS r WHERE {same_key})"
+    ))
+    conn.execute(text(f"DELETE FROM {APLICACAO_TABLE} WHERE aplicadas = 0 AND esavi = 0"))
+    conn.execute(text("DROP TABLE aplicacao_counts"))
+    return len(counts)
+
+
+def refresh_state_tables(conn: Connection) -> Tuple[int, int]:
+    """Recalcula `estado_snapshot` (ver app/estados.py) e `timeseries` (por
+    UF e `BR`) a partir dos rollups; retorna (estados alterados, pontos da série)."""
+    estados = refresh_estado_snapshot(conn)
+
+    conn.execute(text("DELETE FROM public.timeseries"))
+    # GROUPING(sigla) = 1 marca o total do país; linhas sem UF no dado só entram nele
+    pontos = conn.execute(text(
+        f"INSERT INTO public.timeseries (ano, mês, uf, distribuídas, aplicadas, eficiência, esavi) "
+        f"SELECT ano, mes, CASE WHEN total_br = 1 THEN 'BR' ELSE sigla END, distribuidas, aplicadas, "
+        f"{eficiencia_sql('distribuidas', 'aplicadas')}, esavi "
+        f"FROM (SELECT ano, mes, sigla, GROUPING(sigla) AS total_br, COALESCE(SUM(qtde), 0) AS distribuidas, "
+        f"      COALESCE(SUM(aplicadas), 0) AS aplicadas, COALESCE(SUM(esavi), 0) AS esavi "
+        f"      FROM {ROLLUP_TABLE} WHERE ano IS NOT NULL AND mes IS NOT NULL "
+        f"      GROUP BY GROUPING SETS ((ano, mes, sigla), (ano, mes))) AS agg "
+        f"WHERE total_br = 1 OR sigla IS NOT NULL"
+    )).rowcount
+    return estados, pontos
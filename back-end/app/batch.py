@@ -0,0 +1,213 @@
+"""`POST /batch`: vários conjuntos de filtros de uma métrica numa só consulta.
+
+A comparação entre estados chamava `/timeseries` uma vez por UF — 27
+requisições e 27 consultas. Aqui o frontend manda a lista de filtros de uma
+métrica (`overview`, `timeseries` ou `ranking_ufs`):
+
+    {"metrica": "timeseries",
+     "filtros": [{"id": "SP", "uf": "SP", "ano": 2021}, {"id": "RJ", "uf": "RJ", "ano": 2021}]}
+
+e recebe `{"data": {"SP": [...], "RJ": [...]}, "success": true}`, cada valor
+idêntico à resposta do endpoint individual com os mesmos filtros (inclusive
+`de`/`ate`/`janela`/`acumulado` da série, ver app/series.py). Sem `id`, a
+chave é a posição do filtro na lista.
+
+Todos os conjuntos saem de uma só consulta agrupada por (ano, mes, sigla) —
+e fabricante, se algum filtro o usar — sobre o rollup (e não sobre
+`distribuicao_raw`, que os endpoints também já não leem), restrita à união
+dos filtros. As respostas de cada conjunto são montadas em Python com as
+mesmas funções de formatação dos endpoints. O ranking sem filtro de período
+nem de fabricante continua vindo do snapshot dos estados, como em
+`/ranking/ufs`.
+
+Ajuste opcional por variável de ambiente:
+
+    BATCH_MAX   (default 50) — conjuntos de filtros por requisição
+
+Uso (a partir de `back-end/`):
+
+    python -m app.batch --verificar   # /batch x endpoints individuais
+"""
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .cache import _env_number
+from .estados import snapshot_covers
+from .queries import ROLLUP_TABLE, overview_payload, ranking_item, series_point, snapshot_ranking_item
+from .series import SeriesWindow, window_series
+
+
+BATCH_MAX = max(1, _env_number("BATCH_MAX", 50))
+
+METRICAS = ("overview", "timeseries", "ranking_ufs")
+
+# Conjunto de filtros já normalizado: (id, ano, mes, uf, fabricante_id, janela da série)
+FilterSet = Tuple[str, Optional[int], Optional[int], Optional[str], Optional[int], Optional[Tuple]]
+
+
+def batch_sql(metrica: str, sets: Sequence[FilterSet]) -> Tuple[str, Dict[str, Any]]:
+    """Uma consulta agrupada para todos os conjuntos: WHERE com a união
+    (OR) dos filtros de cada um, sem WHERE se algum não filtrar nada."""
+    by_fabricante = any(s[4] is not None for s in sets)
+    clauses: List[str] = []
+    params: Dict[str, Any] = {}
+    seen = set()
+    for i, (_, ano_int, mes_int, uf, fabricante_id, _) in enumerate(sets):
+        # Como em /overview, a UF não filtra os totais
+        filters = tuple(
+            (column, value) for column, value in (
+                ("ano", ano_int), ("mes", mes_int),
+                ("sigla", None if metrica == "overview" else uf), ("fabricante_id", fabricante_id),
+            ) if value is not None
+        )
+        if not filters:
+            clauses = []
+            break
+        if filters in seen:
+            continue
+        seen.add(filters)
+        clauses.append("(" + " AND ".join(f"{column} = :{column}_{i}" for column, _ in filters) + ")")
+        params.update({f"{column}_{i}": value for column, value in filters})
+
+    group = "ano, mes, sigla" + (", fabricante_id" if by_fabricante else "")
+    fabricante = "fabricante_id" if by_fabricante else "CAST(NULL AS smallint) AS fabricante_id"
+    sql = (
+        f"SELECT ano, mes, sigla, {fabricante}, SUM(qtde) AS qtde, SUM(aplicadas) AS aplicadas, "
+        f"SUM(esavi) AS esavi FROM {ROLLUP_TABLE}"
+    )
+    if not clauses:
+        return f"{sql} GROUP BY {group}", {}
+    return f"{sql} WHERE {' OR '.join(clauses)} GROUP BY {group}", params
+
+
+def _matches(row, ano_int, mes_int, uf, fabricante_id) -> bool:
+    return (
+        (ano_int is None or row.ano == ano_int)
+        and (mes_int is None or row.mes == mes_int)
+        and (uf is None or row.sigla == uf)
+        and (fabricante_id is None or row.fabricante_id == fabricante_id)
+    )
+
+
+def _add(total: Optional[int], value) -> Optional[int]:
+    # SUM do SQL: NULL só se todas as parcelas forem NULL
+    if value is None:
+        return total
+    return int(value) if total is None else total + int(value)
+
+
+def _sums(rows: Iterable, key) -> Dict[Any, List[Optional[int]]]:
+    groups: Dict[Any, List[Optional[int]]] = {}
+    for r in rows:
+        sums = groups.setdefault(key(r), [None, None, None])
+        sums[0], sums[1], sums[2] = _add(sums[0], r.qtde), _add(sums[1], r.aplicadas), _add(sums[2], r.esavi)
+    return groups
+
+
+def answer(metrica: str, rows: Sequence, filter_set: FilterSet, snapshot_records: Sequence = ()) -> Any:
+    """Resposta de um conjunto de filtros a partir das linhas agrupadas,
+    igual à do endpoint individual."""
+    _, ano_int, mes_int, uf, fabricante_id, window_key = filter_set
+    if metrica == "overview":
+        (qtde, aplicadas, esavi), = _sums(
+            (r for r in rows if _matches(r, ano_int, mes_int, None, fabricante_id)), lambda r: None
+        ).values() or [[None, None, None]]
+        return overview_payload(qtde, aplicadas, esavi)
+
+    matching = [r for r in rows if _matches(r, ano_int, mes_int, uf, fabricante_id)]
+    if metrica == "timeseries":
+        months = sorted(
+            ((ano, mes, *sums) for (ano, mes), sums in _sums(matching, lambda r: (r.ano, r.mes)).items()),
+            # ORDER BY ano, mes do SQL: NULLs por último
+            key=lambda m: (m[0] is None, m[0] or 0, m[1] is None, m[1] or 0),
+        )
+        if window_key is not None:
+            return window_series(months, uf, SeriesWindow(*window_key))
+        return [series_point(ano, mes, uf, qtde, aplicadas, esavi) for ano, mes, qtde, aplicadas, esavi in months]
+
+    # Como em /ranking/ufs: snapshot dos estados quando houver (e sem período nem fabricante)
+    covered = snapshot_covers(ano_int, mes_int, fabricante_id)
+    records = [r for r in snapshot_records if uf is None or r.uf == uf] if covered else []
+    if records:
+        return [snapshot_ranking_item(r) for r in records]
+    by_sigla = _sums(matching, lambda r: r.sigla)
+    # ORDER BY SUM(qtde) DESC do SQL: NULLs primeiro
+    ordered = sorted(by_sigla.items(), key=lambda item: (item[1][0] is not None, -(item[1][0] or 0)))
+    return [ranking_item(sigla, qtde, aplicadas) for sigla, (qtde, aplicadas, _) in ordered]
+
+
+# ====== Verificação ======
+
+def _comparable(metrica: str, data: Any) -> Any:
+    # Empates no ranking por distribuídas não têm ordem definida no SQL
+    if metrica == "ranking_ufs":
+        return sorted(data, key=lambda item: (str(item.get("uf")), item.get("distribuídas")))
+    return data
+
+
+async def verify(requests_per_batch: int) -> List[str]:
+    import httpx
+    from sqlalchemy import text
+
+    from .cache import response_cache
+    from .database import AsyncSessionLocal, async_engine
+    from .main import app
+
+    async with AsyncSessionLocal() as session:
+        siglas = [r[0] for r in await session.execute(text(
+            f"SELECT DISTINCT sigla FROM {ROLLUP_TABLE} WHERE sigla IS NOT NULL ORDER BY 1"
+        ))]
+        anos = [r[0] for r in await session.execute(text(
+            f"SELECT DISTINCT ano FROM {ROLLUP_TABLE} WHERE ano IS NOT NULL ORDER BY 1"
+        ))]
+    filtros = [{"id": f"uf-{s}", "uf": s} for s in siglas]
+    filtros += [{"id": f"uf-{s}-{a}", "uf": s, "ano": a} for s in siglas[:3] for a in anos]
+    filtros += [{"id": "todos"}, {"id": "mes-3", "mes": 3}, {"id": "pfizer", "fabricante": "pfizer"},
+                {"id": "janela", "uf": siglas[0] if siglas else None, "de": "2021-03", "janela": 3, "acumulado": 1}]
+    filtros = filtros[:requests_per_batch]
+
+    mismatches = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://verificar") as client:
+            for metrica, path in (("overview", "/overview"), ("timeseries", "/timeseries"),
+                                  ("ranking_ufs", "/ranking/ufs")):
+                response_cache.clear()
+                batch = await client.post("/batch", json={"metrica": metrica, "filtros": filtros})
+                if batch.status_code != 200:
+                    return [f"{metrica}: /batch respondeu {batch.status_code}: {batch.text[:200]}"]
+                data = batch.json()["data"]
+                for f in filtros:
+                    params = {k: v for k, v in f.items() if k != "id" and v is not None}
+                    single = (await client.get(path, params=params)).json()["data"]
+                    if _comparable(metrica, single) != _comparable(metrica, data[f["id"]]):
+                        mismatches.append(f"{metrica} {f}")
+            print(f"{len(filtros)} conjuntos de filtros x 3 métricas conferidos.")
+    finally:
+        await async_engine.dispose()
+    return mismatches
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Consulta em lote (POST /batch).")
+    parser.add_argument("--verificar", action="store_true", help="comparar /batch com os endpoints individuais")
+    parser.add_argument("--conjuntos", type=int, default=BATCH_MAX, help="conjuntos de filtros no lote")
+    args = parser.parse_args(argv)
+    if not args.verificar:
+        parser.print_help()
+        return 0
+
+    mismatches = asyncio.run(verify(args.conjuntos))
+    for line in mismatches[:20]:
+        print(f"Divergência: {line}")
+    if mismatches:
+        print(f"{len(mismatches)} respostas divergentes.")
+        return 1
+    print("/batch e endpoints individuais conferem.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""Cache em processo para as respostas do dashboard.
+
+O frontend repete o dia todo as mesmas poucas combinações de filtros; em vez
+de ir ao Postgres a cada requisição, as respostas de `/overview`,
+`/timeseries` e `/ranking/ufs` ficam num LRU limitado, com TTL, e são
+descartadas quando a versão dos dados muda (ver `DataVersion`).
+
+Ajustes opcionais por variável de ambiente:
+
+    CACHE_MAX_ENTRIES            (default 256)
+    CACHE_TTL_SECONDS            (default 300)
+    CACHE_VERSION_CHECK_SECONDS  (default 5) — intervalo mínimo entre
+                                 consultas à versão dos dados no banco
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _env_number(name: str, default, cast=int):
+    value = os.getenv(name)
+    try:
+        return cast(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+CACHE_MAX_ENTRIES = _env_number("CACHE_MAX_ENTRIES", 256)
+CACHE_TTL_SECONDS = _env_number("CACHE_TTL_SECONDS", 300.0, float)
+CACHE_VERSION_CHECK_SECONDS = _env_number("CACHE_VERSION_CHECK_SECONDS", 5.0, float)
+
+
+class ResponseCache:
+    """LRU com TTL cujas entradas valem apenas para uma versão dos dados."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, entry_version, value = entry
+            if entry_version != version:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, version: int, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+async def _rollback(db: AsyncSession) -> None:
+    try:
+        await db.rollback()
+    except Exception:
+        # Conexão já perdida: a sessão descarta a transação ao fechar
+        pass
+
+
+class DataVersionTracker:
+    """Lê a versão dos dados (`public.data_version`) no máximo a cada
+    `check_interval` segundos, para não custar uma consulta por requisição.
+
+    Depois de um reload, respostas antigas podem ser servidas por até
+    `check_interval` segundos.
+    """
+
+    def __init__(self, check_interval: float = CACHE_VERSION_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._version = 0
+        self._checked_at: Optional[float] = None
+        self._checking = False
+        self._lock = threading.Lock()
+
+    async def current(self, db: AsyncSession) -> int:
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._checked_at is not None and now - self._checked_at < self.check_interval
+            # Com uma leitura já em andamento, as demais requisições usam a
+            # versão conhecida em vez de repetir a consulta ao mesmo tempo
+            if fresh or (self._checking and self._checked_at is not None):
+                return self._version
+            self._checking = True
+        try:
+            try:
+                r = (await db.execute(text("SELECT versao FROM public.data_version WHERE id = 1"))).first()
+                version = int(r.versao) if r is not None else 0
+            except Exception:
+                await _rollback(db)
+                with self._lock:
+                    if self._checked_at is not None:
+                        # Banco lento ou fora do ar: manter a última versão lida (e
+                        # tentar de novo na próxima requisição) em vez de voltar a 0
+                        return self._version
+                # Tabela ausente (banco ainda não inicializado): tratar como versão 0
+                version = 0
+            else:
+                # Encerrar a transação: a conexão volta ao pool em vez de ficar
+                # presa à requisição enquanto ela espera (cache, single-flight)
+                await _rollback(db)
+        finally:
+            with self._lock:
+                self._checking = False
+        with self._lock:
+            self._version = version
+            self._checked_at = now
+        return version
+
+    def current_cached(self) -> int:
+        """Última versão lida, sem consultar o banco."""
+        with self._lock:
+            return self._version
+
+
+response_cache = ResponseCache()
+data_version = DataVersionTracker()
@@ -0,0 +1,432 @@
+"""Motor colunar em memória (NumPy) para os agregados de distribuição.
+
+Alternativa opcional ao SQL para `/overview`, `/timeseries`, `/ranking/ufs`
+e `/dashboard`: o rollup de distribuição é carregado uma vez em arrays
+compactos — ANO, MES, SIGLA e fabricante codificados por dicionário em inteiros pequenos,
+QTDE em int64 — e os filtros viram máscaras vetorizadas e `bincount`, sem ida
+ao banco por requisição.
+
+A carga parte dos rollups (view `vacinacao_rollup`) e não de `distribuicao_raw`:
+o rollup é a tabela bruta já agrupada por (ano, mes, sigla, fabricante), então todas as respostas
+são idênticas e a carga lê ordens de grandeza menos linhas. Cada medida (QTDE,
+aplicadas, ESAVI) vira um array int64. Os arrays são
+recarregados (e trocados de uma vez) quando a versão dos dados muda.
+
+Seleção por variável de ambiente (NumPy só é necessário nos modos `numpy`
+e `mmap`):
+
+    QUERY_ENGINE   sql (default) | numpy | mmap
+
+No modo `mmap` os arrays ficam num arquivo mapeado em memória, compartilhado
+por todos os workers do Gunicorn (ver app/shared_snapshot.py).
+
+Uso (a partir de `back-end/`):
+
+    python -m app.columnar --verificar   # paridade com o SQL e latência
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, text
+
+from .database import AsyncSessionLocal, EstadoSnapshot, engine
+from .estados import RANKING_ORDER, snapshot_covers
+from .queries import (
+    ROLLUP_TABLE,
+    overview_payload,
+    overview_total_sql,
+    ranking_item,
+    ranking_sql,
+    series_point,
+    snapshot_ranking_item,
+    timeseries_sql,
+)
+from .resilience import statement_timeout
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+
+QUERY_ENGINE = os.getenv("QUERY_ENGINE", "sql").strip().lower()
+
+
+def _sort_key(value):
+    # Mesma ordem do ORDER BY do Postgres: NULLs por último
+    return (value is None, value if value is not None else 0)
+
+
+def _sigla_sort_key(value):
+    return (value is None, value or "")
+
+
+def encode(values: Sequence, sort_key=_sort_key) -> Tuple[List, "np.ndarray"]:
+    """Codificação por dicionário: (valores distintos ordenados, códigos)."""
+    dictionary = sorted(set(values), key=sort_key)
+    dtype = np.int16 if len(dictionary) < 2 ** 15 else np.int32
+    index = {v: i for i, v in enumerate(dictionary)}
+    codes = np.fromiter((index[v] for v in values), dtype=dtype, count=len(values))
+    return dictionary, codes
+
+
+def _optional_int(value):
+    return int(value) if value is not None else None
+
+
+# Dimensões codificadas: (nome, leitura da linha do rollup, ordenação)
+DIMENSIONS = (
+    ("ano", lambda r: _optional_int(r.ano), _sort_key),
+    ("mes", lambda r: _optional_int(r.mes), _sort_key),
+    ("sigla", lambda r: r.sigla, _sigla_sort_key),
+    ("fabricante", lambda r: _optional_int(r.fabricante_id), _sort_key),
+)
+
+
+# Medidas somadas por grupo, na ordem das colunas da view
+MEASURES = ("qtde", "aplicadas", "esavi")
+
+
+class ColumnarSnapshot:
+    """Arrays de uma versão dos dados. Imutável depois de construído.
+
+    `dictionaries` e `codes` são indexados pelo nome da dimensão (ver
+    DIMENSIONS) e `measures` pelo nome da medida (MEASURES); os arrays podem
+    vir da memória ou de um arquivo mapeado (app/shared_snapshot.py).
+    """
+
+    def __init__(
+        self,
+        version: int,
+        dictionaries: Dict[str, List],
+        codes: Dict[str, "np.ndarray"],
+        measures: Dict[str, "np.ndarray"],
+        snapshot_items: List[Dict[str, Any]],
+        source: str = "memoria",
+    ):
+        self.version = version
+        self.loaded_at = time.time()
+        self.source = source
+        self.anos, self.meses, self.siglas, self.fabricantes = (dictionaries[name] for name, _, _ in DIMENSIONS)
+        self.ano_codes, self.mes_codes, self.sigla_codes, self.fabricante_codes = (
+            codes[name] for name, _, _ in DIMENSIONS
+        )
+        self.qtde, self.aplicadas, self.esavi = (measures[name] for name in MEASURES)
+        self._ano_index = {v: i for i, v in enumerate(self.anos)}
+        self._mes_index = {v: i for i, v in enumerate(self.meses)}
+        self._sigla_index = {v: i for i, v in enumerate(self.siglas)}
+        self._fabricante_index = {v: i for i, v in enumerate(self.fabricantes)}
+        # Snapshot dos estados já formatado, na ordem de `posicao` (ranking per capita)
+        self.snapshot_items = snapshot_items
+
+    @classmethod
+    def from_rows(cls, version: int, rows: Sequence, records: Sequence) -> "ColumnarSnapshot":
+        dictionaries, codes = {}, {}
+        for name, getter, sort_key in DIMENSIONS:
+            dictionaries[name], codes[name] = encode([getter(r) for r in rows], sort_key)
+        measures = {
+            name: np.fromiter((int(getattr(r, name) or 0) for r in rows), dtype=np.int64, count=len(rows))
+            for name in MEASURES
+        }
+        return cls(version, dictionaries, codes, measures, [snapshot_ranking_item(r) for r in records])
+
+    def dictionaries(self) -> Dict[str, List]:
+        return dict(zip((name for name, _, _ in DIMENSIONS), (self.anos, self.meses, self.siglas, self.fabricantes)))
+
+    def codes(self) -> Dict[str, "np.ndarray"]:
+        return dict(zip(
+            (name for name, _, _ in DIMENSIONS),
+            (self.ano_codes, self.mes_codes, self.sigla_codes, self.fabricante_codes),
+        ))
+
+    def measures(self) -> Dict[str, "np.ndarray"]:
+        return dict(zip(MEASURES, (self.qtde, self.aplicadas, self.esavi)))
+
+    @property
+    def rows(self) -> int:
+        return int(self.qtde.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = list(self.codes().values()) + list(self.measures().values())
+        return sum(a.nbytes for a in arrays)
+
+    def mask(
+        self,
+        ano_int: Optional[int],
+        mes_int: Optional[int],
+        uf: Optional[str] = None,
+        fabricante_id: Optional[int] = None,
+    ) -> "np.ndarray":
+        mask = np.ones(self.rows, dtype=bool)
+        for value, index, codes in (
+            (ano_int, self._ano_index, self.ano_codes),
+            (mes_int, self._mes_index, self.mes_codes),
+            (uf, self._sigla_index, self.sigla_codes),
+            (fabricante_id, self._fabricante_index, self.fabricante_codes),
+        ):
+            if value is None:
+                continue
+            code = index.get(value)
+            if code is None:
+                # Valor fora do dicionário: nenhuma linha atende ao filtro
+                return np.zeros(self.rows, dtype=bool)
+            mask &= codes == code
+        return mask
+
+    def _group_sums(self, keys: "np.ndarray", mask: "np.ndarray", groups: int):
+        """Soma de cada medida e contagem de linhas por grupo (códigos
+        0..groups-1), só com as linhas de `mask`.
+
+        Os pesos do `bincount` são float64: exatos para totais abaixo de 2**53.
+        """
+        counts = np.bincount(keys, minlength=groups)
+        sums = [
+            np.rint(np.bincount(keys, weights=values[mask], minlength=groups)).astype(np.int64)
+            for values in (self.qtde, self.aplicadas, self.esavi)
+        ]
+        return sums, counts
+
+    def overview(self, ano_int: Optional[int], mes_int: Optional[int],
+                 fabricante_id: Optional[int] = None) -> Dict[str, Any]:
+        mask = self.mask(ano_int, mes_int, None, fabricante_id)
+        return overview_payload(*(int(values[mask].sum()) for values in (self.qtde, self.aplicadas, self.esavi)))
+
+    def months(self, ano_int: Optional[int], mes_int: Optional[int], uf: Optional[str],
+               fabricante_id: Optional[int] = None) -> List[Tuple[Any, Any, int, int, int]]:
+        """(ano, mes, distribuídas, aplicadas, esavi) por mês, na ordem da série."""
+        mask = self.mask(ano_int, mes_int, uf, fabricante_id)
+        n_meses = len(self.meses)
+        keys = self.ano_codes[mask].astype(np.int64) * n_meses + self.mes_codes[mask]
+        (qtde, aplicadas, esavi), counts = self._group_sums(keys, mask, len(self.anos) * n_meses)
+        # Códigos seguem a ordem (ano, mes) do dicionário: basta percorrer os grupos não vazios
+        return [
+            (self.anos[key // n_meses], self.meses[key % n_meses], int(qtde[key]), int(aplicadas[key]), int(esavi[key]))
+            for key in np.flatnonzero(counts)
+        ]
+
+    def timeseries(self, ano_int: Optional[int], mes_int: Optional[int], uf: Optional[str],
+                   fabricante_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [series_point(*month[:2], uf, *month[2:]) for month in self.months(ano_int, mes_int, uf, fabricante_id)]
+
+    def ranking_by_sigla(self, ano_int: Optional[int], mes_int: Optional[int], uf: Optional[str],
+                         fabricante_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        mask = self.mask(ano_int, mes_int, uf, fabricante_id)
+        (qtde, aplicadas, _), counts = self._group_sums(self.sigla_codes[mask], mask, len(self.siglas))
+        present = np.flatnonzero(counts)
+        ordered = present[np.argsort(-qtde[present], kind="stable")]
+        return [ranking_item(self.siglas[code], qtde[code], aplicadas[code]) for code in ordered]
+
+    def ranking(self, ano_int: Optional[int], mes_int: Optional[int], uf: Optional[str],
+                fabricante_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Como `/ranking/ufs`: prioriza o snapshot dos estados, se existir
+        (o snapshot não tem período nem fabricante, então esses filtros usam
+        sempre o rollup)."""
+        if self.snapshot_items and snapshot_covers(ano_int, mes_int, fabricante_id):
+            return [item for item in self.snapshot_items if uf is None or item["uf"] == uf]
+        return self.ranking_by_sigla(ano_int, mes_int, uf, fabricante_id)
+
+    def dashboard(self, ano_int: Optional[int], mes_int: Optional[int], uf: Optional[str],
+                  fabricante_id: Optional[int] = None) -> Dict[str, Any]:
+        return {
+            "overview": self.overview(ano_int, mes_int, fabricante_id),
+            "timeseries": self.timeseries(ano_int, mes_int, uf, fabricante_id),
+            "ranking": self.ranking(ano_int, mes_int, uf, fabricante_id),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "rows": self.rows,
+            "bytes": self.nbytes,
+            "anos": len(self.anos),
+            "meses": len(self.meses),
+            "siglas": len(self.siglas),
+            "fabricantes": len(self.fabricantes),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def load_snapshot(conn, version: int) -> ColumnarSnapshot:
+    """Lê o rollup e o snapshot dos estados. `conn` pode ser uma Connection
+    ou Session síncrona."""
+    if np is None:
+        raise RuntimeError("QUERY_ENGINE=numpy exige o pacote numpy (pip install numpy).")
+    rows = conn.execute(text(
+        f"SELECT ano, mes, sigla, fabricante_id, {', '.join(MEASURES)} FROM {ROLLUP_TABLE}"
+    )).all()
+    # Colunas da tabela (e não a entidade): linhas iguais em Connection e Session
+    records = conn.execute(
+        select(*EstadoSnapshot.__table__.columns).order_by(*RANKING_ORDER)
+    ).all()
+    return ColumnarSnapshot.from_rows(version, rows, records)
+
+
+class ColumnarEngine:
+    """Mantém o ColumnarSnapshot da versão corrente dos dados.
+
+    A recarga monta um snapshot novo e só então troca a referência, então
+    requisições em andamento terminam com os arrays antigos. Com `shared`,
+    o snapshot vem do arquivo compartilhado entre workers.
+    """
+
+    def __init__(self, enabled: bool, shared: bool = False):
+        self.enabled = enabled
+        self.shared = shared
+        self._snapshot: Optional[ColumnarSnapshot] = None
+        self._lock = asyncio.Lock()
+        self.reloads = 0
+
+    def _fresh(self, snapshot: Optional[ColumnarSnapshot], version: int) -> bool:
+        if snapshot is None:
+            return False
+        # O arquivo compartilhado pode ter sido gerado por outro worker que já
+        # viu uma versão mais nova do que a deste
+        if self.shared:
+            return snapshot.version >= version
+        return snapshot.version == version
+
+    async def current(self, version: int) -> ColumnarSnapshot:
+        snapshot = self._snapshot
+        if self._fresh(snapshot, version):
+            return snapshot
+        # A recarga serve a todas as requisições: o limite de tempo da que a
+        # disparou (app/resilience.py) não a cancela no meio
+        return await asyncio.shield(self._reload(version))
+
+    async def _reload(self, version: int) -> ColumnarSnapshot:
+        async with self._lock:
+            snapshot = self._snapshot
+            if not self._fresh(snapshot, version):
+                with statement_timeout(None):
+                    if self.shared:
+                        from .shared_snapshot import load_shared
+
+                        # Espera pelo lock de arquivo e leitura do banco fora do event loop
+                        snapshot = await asyncio.to_thread(load_shared, version)
+                    else:
+                        async with AsyncSessionLocal() as session:
+                            snapshot = await session.run_sync(lambda s: load_snapshot(s, version))
+                self._snapshot = snapshot
+                self.reloads += 1
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "reloads": self.reloads,
+            "snapshot": snapshot.stats() if snapshot is not None else None,
+        }
+
+
+columnar_engine = ColumnarEngine(QUERY_ENGINE in ("numpy", "mmap"), shared=QUERY_ENGINE == "mmap")
+if columnar_engine.enabled and np is None:
+    print(f"Aviso: QUERY_ENGINE={QUERY_ENGINE} mas numpy não está instalado; usando SQL.")
+    columnar_engine.enabled = False
+
+
+# ====== Verificação (paridade com o SQL e latência) ======
+
+def _sql_results(conn, ano_int, mes_int, uf, fabricante_id):
+    sql, params = overview_total_sql(ano_int, mes_int, fabricante_id)
+    r = conn.execute(text(sql), params).first()
+    overview = overview_payload(r.total, r.aplicadas, r.esavi)
+    sql, params = timeseries_sql(ano_int, mes_int, uf, fabricante_id)
+    series = [
+        series_point(r.ano, r.mes, uf, r.distribuidas, r.aplicadas, r.esavi) for r in conn.execute(text(sql), params)
+    ]
+    sql, params = ranking_sql(ano_int, mes_int, uf, fabricante_id)
+    ranking = [ranking_item(r.uf, r.distribuidas, r.aplicadas) for r in conn.execute(text(sql), params)]
+    return overview, series, ranking
+
+
+def _ranking_key(items):
+    # Empates em SUM(qtde) não têm ordem definida no SQL
+    return sorted(items, key=lambda i: (-i["distribuídas"], i["uf"] or ""))
+
+
+def _median_ms(samples: List[float]) -> float:
+    return statistics.median(samples) * 1000 if samples else 0.0
+
+
+def verify(conn, snapshot: ColumnarSnapshot) -> List[str]:
+    """Compara SQL e NumPy em todas as combinações de filtros do dicionário
+    (mais valores ausentes dele); retorna as divergências."""
+    anos = [None] + [a for a in snapshot.anos if a is not None] + [1900]
+    meses = [None] + list(range(1, 13))
+    ufs = [None] + [s for s in snapshot.siglas if s is not None] + ["XX"]
+    fabricantes = [None] + [f for f in snapshot.fabricantes if f is not None] + [-1]
+    problems = []
+    sql_times, numpy_times = [], []
+    combos = list(itertools.product(anos, meses, ufs, fabricantes))
+    for ano_int, mes_int, uf, fabricante_id in combos:
+        started = time.perf_counter()
+        expected = _sql_results(conn, ano_int, mes_int, uf, fabricante_id)
+        sql_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        got = (
+            snapshot.overview(ano_int, mes_int, fabricante_id),
+            snapshot.timeseries(ano_int, mes_int, uf, fabricante_id),
+            snapshot.ranking_by_sigla(ano_int, mes_int, uf, fabricante_id),
+        )
+        numpy_times.append(time.perf_counter() - started)
+
+        label = f"ano={ano_int} mes={mes_int} uf={uf} fabricante={fabricante_id}"
+        if got[0] != expected[0]:
+            problems.append(f"{label}: overview {got[0]} != {expected[0]}")
+        if got[1] != expected[1]:
+            problems.append(f"{label}: timeseries diverge ({len(got[1])} vs {len(expected[1])} pontos)")
+        if _ranking_key(got[2]) != _ranking_key(expected[2]):
+            problems.append(f"{label}: ranking diverge ({len(got[2])} vs {len(expected[2])} UFs)")
+        if [i["distribuídas"] for i in got[2]] != [i["distribuídas"] for i in expected[2]]:
+            problems.append(f"{label}: ranking fora de ordem")
+
+    print(f"{len(combos)} combinações de filtros conferidas.")
+    print(f"Latência mediana por combinação (overview + série + ranking): "
+          f"SQL {_median_ms(sql_times):.2f} ms, NumPy {_median_ms(numpy_times):.3f} ms")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Motor colunar NumPy sobre o rollup de distribuição.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere a paridade com o SQL em todas as combinações de filtros e mede a latência")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("numpy não está instalado (pip install numpy).")
+        return 1
+
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        snapshot = load_snapshot(conn, 0)
+        elapsed = time.perf_counter() - started
+        print(f"{snapshot.rows} linhas carregadas em {elapsed * 1000:.0f} ms "
+              f"({snapshot.nbytes / 1024:.0f} KiB em arrays; {len(snapshot.anos)} anos, "
+              f"{len(snapshot.meses)} meses, {len(snapshot.siglas)} UFs, {len(snapshot.fabricantes)} fabricantes).")
+        if not args.verificar:
+            return 0
+        problems = verify(conn, snapshot)
+
+    if problems:
+        for p in problems[:20]:
+            print("FALHOU:", p)
+        if len(problems) > 20:
+            print(f"... e mais {len(problems) - 20} divergências.")
+        return 1
+    print("Paridade OK: NumPy e SQL retornam os mesmos agregados.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
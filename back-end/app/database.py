@@ -1,10 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String
+from sqlalchemy import create_engine, Column, Integer, SmallInteger, BigInteger, Float, String, Numeric, Index, DateTime, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from typing import Generator, AsyncGenerator
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from .metrics import instrument_engine, timed_pool
 
 # Tentar carregar um .env localizado na pasta `backend/` relativa a este arquivo.
 # Isso evita um problema conhecido em que `find_dotenv()` falha quando o código
@@ -52,6 +56,7 @@ except ValueError:
 # Habilitar pool_pre_ping para evitar erros com conexões ociosas em servidores gerenciados
 engine = create_engine(
     DATABASE_URL,
+    poolclass=timed_pool(QueuePool, "sync"),
     pool_size=pool_size,
     max_overflow=max_overflow,
     pool_pre_ping=True,
@@ -60,6 +65,37 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def async_database_url(url: str):
+    """Converte a DATABASE_URL (psycopg2) para o driver asyncpg.
+
+    O asyncpg não entende `sslmode`; o equivalente é o parâmetro `ssl`
+    (ex.: `?sslmode=require` vira `?ssl=require`).
+    """
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(parsed.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode is not None and "ssl" not in query:
+        query["ssl"] = sslmode
+    return parsed.set(query=query)
+
+
+# Engine assíncrono (asyncpg) usado pelos endpoints `async def`. Os scripts de
+# manutenção (init_db, rollup) continuam no engine síncrono acima. O pool é
+# dimensionado pelas mesmas variáveis, mas é separado do pool síncrono.
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL),
+    poolclass=timed_pool(AsyncAdaptedQueuePool, "async"),
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    pool_pre_ping=True,
+)
+
+# Tempo de banco, consultas e linhas por requisição (ver app/metrics.py)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
 # Models SQLAlchemy baseados nos tipos esperados
 
 class Estado(Base):
@@ -84,6 +120,8 @@ class TimePoint(Base):
 
 
 class EstadoSnapshot(Base):
+    """Totais por UF de todo o período, com os indicadores per capita e a
+    posição no ranking já calculados (ver app/estados.py)."""
     __tablename__ = "estado_snapshot"
 
     uf = Column(String(2), primary_key=True, index=True)
@@ -91,6 +129,80 @@ class EstadoSnapshot(Base):
     distribuídas = Column(Integer, default=0)
     aplicadas = Column(Integer, default=0)
     eficiência = Column(Float, default=0.0)
+    populacao = Column(Integer)
+    doses_por_100k = Column(Float)
+    cobertura = Column(Float)
+    posicao = Column(Integer, index=True)
+
+
+class Fabricante(Base):
+    """Dimensão de fabricantes: chave inteira pequena referenciada por
+    `distribuicao_raw.FABRICANTE_ID` e pelo rollup, em vez do texto do insumo.
+
+    `codigo` é o valor aceito no filtro `fabricante` (ex.: `pfizer`).
+    """
+    __tablename__ = "fabricantes"
+
+    id = Column(SmallInteger, primary_key=True)
+    codigo = Column(String(40), nullable=False, unique=True)
+    nome = Column(String(100), nullable=False)
+
+
+class DistribuicaoRollup(Base):
+    """Agregado de `distribuicao_raw` no grão (ANO, MES, SIGLA, FABRICANTE_ID).
+
+    Mantido por `app.rollup.refresh_rollup`; os endpoints do dashboard leem
+    daqui em vez de varrer a tabela bruta a cada requisição. As colunas de
+    dimensão aceitam NULL para preservar os totais de linhas incompletas do
+    dump (somas sem filtro continuam batendo com a tabela bruta).
+    """
+    __tablename__ = "distribuicao_rollup"
+    __table_args__ = (
+        Index("ix_distribuicao_rollup_ano_mes_sigla", "ano", "mes", "sigla"),
+        Index("ix_distribuicao_rollup_fabricante", "fabricante_id", "ano", "mes"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    ano = Column(Integer)
+    mes = Column(Integer)
+    sigla = Column(String)
+    fabricante_id = Column(SmallInteger)
+    qtde = Column(Numeric, nullable=False, default=0)
+
+
+class AplicacaoRollup(Base):
+    """Doses aplicadas e notificações de ESAVI no grão (ANO, MES, SIGLA,
+    FABRICANTE_ID), reduzidas dos microdados por `load_aplicacao.py`.
+
+    Os microdados não são guardados: só estes contadores. A view
+    `vacinacao_rollup` junta esta tabela a `distribuicao_rollup` para os
+    endpoints do dashboard.
+    """
+    __tablename__ = "aplicacao_rollup"
+    __table_args__ = (
+        Index("ix_aplicacao_rollup_ano_mes_sigla", "ano", "mes", "sigla"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    ano = Column(Integer)
+    mes = Column(Integer)
+    sigla = Column(String)
+    fabricante_id = Column(SmallInteger)
+    aplicadas = Column(BigInteger, nullable=False, default=0)
+    esavi = Column(BigInteger, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Versão dos dados de distribuição (linha única, id = 1).
+
+    Incrementada a cada recálculo do rollup; caches em processo comparam
+    com ela para descartar respostas calculadas sobre dados antigos.
+    """
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now())
 
 
 # Helper para pegar a sessão do banco
@@ -106,3 +218,14 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Versão assíncrona de `get_db` para endpoints `async def`.
+
+    Uma AsyncSession não pode ser usada por duas corrotinas ao mesmo tempo;
+    consultas independentes que devem rodar em paralelo abrem a sua própria
+    sessão via `AsyncSessionLocal()`.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
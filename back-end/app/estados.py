@@ -0,0 +1,283 @@
+"""População das UFs (IBGE, Censo 2022) e o snapshot pré-ranqueado dos estados.
+
+`estado_snapshot` guarda, por UF, os totais de doses de todo o período e os
+indicadores per capita, já com a posição no ranking; `/ranking/ufs` (e o
+ranking do `/dashboard` e do `/batch`) só leem as linhas na ordem de
+`posicao`, sem agregar, juntar com `estados` ou ordenar na requisição.
+
+- `doses_por_100k`: doses distribuídas por 100 mil habitantes;
+- `cobertura`: doses aplicadas por 100 habitantes, em % (passa de 100 com
+  mais de uma dose por pessoa);
+- `posicao`: 1 = mais doses distribuídas por habitante. UFs sem população
+  conhecida ficam no fim.
+
+Como o snapshot não tem período nem fabricante, rankings com filtro de
+`ano`, `mes` ou `fabricante` continuam agregando o rollup (`snapshot_covers`).
+
+O snapshot sai de uma só consulta — o agregado por UF do rollup juntado com
+`estados` — e é gravado na mesma transação que atualiza o rollup
+(`refresh_rollup` e `refresh_rollup_periods`, a cada mês carregado, e a carga
+dos microdados em app/aplicacao.py). Só as UFs cujos valores mudaram são
+regravadas.
+
+Uso (a partir de `back-end/`):
+
+    python -m app.estados              # recalcula o snapshot dos estados
+    python -m app.estados --verificar  # recalcula e confere com o cálculo em Python
+"""
+import argparse
+import sys
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .database import Estado, EstadoSnapshot, engine
+from .queries import ROLLUP_TABLE
+
+
+# Nome e população residente (IBGE, Censo Demográfico 2022)
+POPULACAO_2022: Dict[str, Tuple[str, int]] = {
+    "AC": ("Acre", 830018),
+    "AL": ("Alagoas", 3127683),
+    "AP": ("Amapá", 733759),
+    "AM": ("Amazonas", 3941613),
+    "BA": ("Bahia", 14141626),
+    "CE": ("Ceará", 8794957),
+    "DF": ("Distrito Federal", 2817381),
+    "ES": ("Espírito Santo", 3833712),
+    "GO": ("Goiás", 7056495),
+    "MA": ("Maranhão", 6776699),
+    "MT": ("Mato Grosso", 3658649),
+    "MS": ("Mato Grosso do Sul", 2757013),
+    "MG": ("Minas Gerais", 20538718),
+    "PA": ("Pará", 8120131),
+    "PB": ("Paraíba", 3974687),
+    "PR": ("Paraná", 11444380),
+    "PE": ("Pernambuco", 9058931),
+    "PI": ("Piauí", 3271199),
+    "RJ": ("Rio de Janeiro", 16054524),
+    "RN": ("Rio Grande do Norte", 3302729),
+    "RS": ("Rio Grande do Sul", 10882965),
+    "RO": ("Rondônia", 1581196),
+    "RR": ("Roraima", 636707),
+    "SC": ("Santa Catarina", 7610361),
+    "SP": ("São Paulo", 44411238),
+    "SE": ("Sergipe", 2210004),
+    "TO": ("Tocantins", 1511460),
+}
+
+# Colunas per capita acrescentadas a `estado_snapshot` depois da criação
+SNAPSHOT_COLUMNS = {
+    "populacao": "integer",
+    "doses_por_100k": "double precision",
+    "cobertura": "double precision",
+    "posicao": "integer",
+}
+
+# Ordem do ranking pré-calculado; linhas gravadas antes da `posicao` (NULL,
+# por último no Postgres) mantêm a ordem antiga por eficiência
+RANKING_ORDER = (EstadoSnapshot.posicao, EstadoSnapshot.eficiência.desc())
+
+
+def snapshot_covers(ano_int: Optional[int], mes_int: Optional[int], fabricante_id: Optional[int]) -> bool:
+    """O snapshot tem os totais de todo o período e de todos os fabricantes:
+    só responde ao ranking sem esses filtros (com eles, o ranking vem do rollup)."""
+    return ano_int is None and mes_int is None and fabricante_id is None
+
+
+def eficiencia_sql(distribuidas: str, aplicadas: str) -> str:
+    # Mesma regra de queries.eficiencia: 0 quando não há doses distribuídas
+    return (
+        f"CASE WHEN {distribuidas} > 0 "
+        f"THEN round(CAST({aplicadas} AS numeric) * 100 / {distribuidas}, 1) ELSE 0 END"
+    )
+
+
+def _per_capita_sql(value: str, populacao: str, escala: int) -> str:
+    # NULL sem população conhecida
+    return f"CASE WHEN {populacao} > 0 THEN round(CAST({value} AS numeric) * {escala} / {populacao}, 1) END"
+
+
+def ensure_estado_tables(conn: Connection) -> bool:
+    """Cria `estados` e `estado_snapshot` se faltarem, acrescenta as colunas
+    per capita a snapshots antigos e preenche a população das UFs que ainda
+    não a têm. Retorna True se algo mudou (o snapshot precisa ser recalculado)."""
+    Estado.__table__.create(bind=conn, checkfirst=True)
+    EstadoSnapshot.__table__.create(bind=conn, checkfirst=True)
+
+    # Consultar antes: ALTER TABLE travaria a tabela até o fim da transação
+    existing = {r[0] for r in conn.execute(text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = 'estado_snapshot'"
+    ))}
+    missing = [name for name in SNAPSHOT_COLUMNS if name not in existing]
+    for name in missing:
+        conn.execute(text(f"ALTER TABLE public.estado_snapshot ADD COLUMN {name} {SNAPSHOT_COLUMNS[name]}"))
+    if missing:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_estado_snapshot_posicao ON public.estado_snapshot (posicao)"
+        ))
+
+    # População carregada por outra fonte não é sobrescrita
+    seeded = conn.execute(
+        text(
+            "INSERT INTO public.estados (uf, nome, populacao) VALUES (:uf, :nome, :populacao) "
+            "ON CONFLICT (uf) DO UPDATE SET populacao = EXCLUDED.populacao WHERE estados.populacao IS NULL"
+        ),
+        [{"uf": uf, "nome": nome, "populacao": populacao} for uf, (nome, populacao) in POPULACAO_2022.items()],
+    ).rowcount
+    return bool(missing) or seeded > 0
+
+
+def uf_sql(column: str) -> str:
+    # O dump traz siglas com espaços ou em minúsculas ("SP ", "sp"); no
+    # snapshot (varchar(2)) elas colidiriam com "SP" no ON CONFLICT
+    return f"upper(trim({column}))"
+
+
+# Siglas do rollup que viram linhas do snapshot: só as de duas letras
+SNAPSHOT_SOURCE_SQL = (
+    f"SELECT {uf_sql('sigla')} AS uf, qtde, aplicadas FROM {ROLLUP_TABLE} "
+    f"WHERE length({uf_sql('sigla')}) = 2"
+)
+
+
+def snapshot_sql() -> str:
+    """Agregado por UF do rollup juntado com `estados`, com os indicadores e a
+    posição; grava só as UFs cujos valores mudaram."""
+    columns = "uf, nome, distribuídas, aplicadas, eficiência, populacao, doses_por_100k, cobertura, posicao"
+    return (
+        f"INSERT INTO public.estado_snapshot ({columns}) "
+        f"SELECT uf, nome, distribuidas, aplicadas, eficiencia, populacao, doses_por_100k, cobertura, "
+        f"  ROW_NUMBER() OVER (ORDER BY doses_por_100k DESC NULLS LAST, eficiencia DESC, uf) "
+        f"FROM (SELECT agg.uf, COALESCE(e.nome, agg.uf) AS nome, agg.distribuidas, agg.aplicadas, "
+        f"      {eficiencia_sql('agg.distribuidas', 'agg.aplicadas')} AS eficiencia, e.populacao, "
+        f"      {_per_capita_sql('agg.distribuidas', 'e.populacao', 100000)} AS doses_por_100k, "
+        f"      {_per_capita_sql('agg.aplicadas', 'e.populacao', 100)} AS cobertura "
+        f"      FROM (SELECT uf, COALESCE(SUM(qtde), 0) AS distribuidas, COALESCE(SUM(aplicadas), 0) AS aplicadas "
+        f"            FROM ({SNAPSHOT_SOURCE_SQL}) AS src GROUP BY uf) AS agg "
+        f"      LEFT JOIN public.estados AS e ON e.uf = agg.uf) AS calc "
+        f"ON CONFLICT (uf) DO UPDATE SET ({columns}) = ROW({', '.join(f'EXCLUDED.{c}' for c in columns.split(', '))}) "
+        f"WHERE ({', '.join(f'estado_snapshot.{c}' for c in columns.split(', '))}) "
+        f"  IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in columns.split(', '))})"
+    )
+
+
+def refresh_estado_snapshot(conn: Connection) -> int:
+    """Recalcula `estado_snapshot` na transação de `conn` (que já deve ter o
+    rollup atualizado); retorna o número de UFs regravadas ou removidas."""
+    ensure_estado_tables(conn)
+    removed = conn.execute(text(
+        f"DELETE FROM public.estado_snapshot AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM ({SNAPSHOT_SOURCE_SQL}) AS r WHERE r.uf = s.uf)"
+    )).rowcount
+    return removed + conn.execute(text(snapshot_sql())).rowcount
+
+
+# ====== Verificação ======
+
+def _round(value: Decimal) -> float:
+    # round() do Postgres em numeric: metade para longe do zero
+    return float(value.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+
+
+def expected_snapshot(conn: Connection) -> List[Dict]:
+    """O mesmo snapshot calculado em Python a partir do rollup e de `estados`."""
+    estados = {r.uf: (r.nome, r.populacao) for r in conn.execute(text("SELECT uf, nome, populacao FROM public.estados"))}
+    totals: Dict[str, List[Decimal]] = {}
+    for r in conn.execute(text(
+        f"SELECT sigla, COALESCE(SUM(qtde), 0) AS distribuidas, COALESCE(SUM(aplicadas), 0) AS aplicadas "
+        f"FROM {ROLLUP_TABLE} WHERE sigla IS NOT NULL GROUP BY sigla"
+    )):
+        uf = r.sigla.strip().upper()
+        if len(uf) != 2:
+            continue
+        sums = totals.setdefault(uf, [Decimal(0), Decimal(0)])
+        sums[0] += Decimal(r.distribuidas)
+        sums[1] += Decimal(r.aplicadas)
+    rows = []
+    for uf, (distribuidas, aplicadas) in totals.items():
+        nome, populacao = estados.get(uf, (None, None))
+        per_capita = populacao is not None and populacao > 0
+        rows.append({
+            "uf": uf,
+            "nome": nome or uf,
+            "distribuídas": int(distribuidas),
+            "aplicadas": int(aplicadas),
+            "eficiência": _round(aplicadas * 100 / distribuidas) if distribuidas > 0 else 0.0,
+            "populacao": populacao,
+            "doses_por_100k": _round(distribuidas * 100000 / populacao) if per_capita else None,
+            "cobertura": _round(aplicadas * 100 / populacao) if per_capita else None,
+        })
+    rows.sort(key=lambda row: (row["doses_por_100k"] is None, -(row["doses_por_100k"] or 0),
+                               -row["eficiência"], row["uf"]))
+    for posicao, row in enumerate(rows, start=1):
+        row["posicao"] = posicao
+    return rows
+
+
+def verify(conn: Connection) -> List[str]:
+    expected = expected_snapshot(conn)
+    stored = [dict(r._mapping) for r in conn.execute(
+        text("SELECT uf, nome, distribuídas, aplicadas, eficiência, populacao, doses_por_100k, cobertura, posicao "
+             "FROM public.estado_snapshot ORDER BY posicao")
+    )]
+    if len(stored) != len(expected):
+        return [f"{len(stored)} UFs no snapshot, {len(expected)} esperadas"]
+    return [f"{e['uf']}: esperado {e}, gravado {s}" for e, s in zip(expected, stored) if e != s]
+
+
+def check_padded_sigla() -> List[str]:
+    """Regressão: siglas com espaços, em minúsculas ou longas demais no
+    rollup não derrubam o recálculo (numa transação desfeita no fim)."""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text(
+                "INSERT INTO public.distribuicao_rollup (ano, mes, sigla, fabricante_id, qtde) VALUES "
+                "(1900, 1, 'SP ', NULL, 7), (1900, 1, ' sp', NULL, 5), (1900, 1, 'XYZ', NULL, 3)"
+            ))
+            refresh_estado_snapshot(conn)
+            return [f"sigla com espaços: {line}" for line in verify(conn)]
+        except Exception as e:
+            return [f"sigla com espaços: {str(e).splitlines()[0]}"]
+        finally:
+            trans.rollback()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula o snapshot pré-ranqueado dos estados.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere o snapshot com o cálculo em Python após recalcular")
+    args = parser.parse_args(argv)
+
+    from .rollup import bump_data_version
+
+    with engine.begin() as conn:
+        changed = refresh_estado_snapshot(conn)
+        if changed:
+            bump_data_version(conn)
+    print(f"Snapshot dos estados recalculado: {changed} UFs alteradas.")
+
+    if args.verificar:
+        with engine.connect() as conn:
+            mismatches = verify(conn)
+            top = conn.execute(text(
+                "SELECT posicao, uf, doses_por_100k, cobertura FROM public.estado_snapshot ORDER BY posicao LIMIT 5"
+            )).all()
+        mismatches += check_padded_sigla()
+        for r in top:
+            print(f"{r.posicao:>3}. {r.uf}  {r.doses_por_100k} doses/100 mil hab.  cobertura {r.cobertura}%")
+        for line in mismatches[:20]:
+            print(f"Divergência: {line}")
+        if mismatches:
+            print(f"{len(mismatches)} divergências.")
+            return 1
+        print("Snapshot dos estados confere com o cálculo em Python.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
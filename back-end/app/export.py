@@ -0,0 +1,167 @@
+"""Exportação em streaming das linhas de `distribuicao_raw` (CSV ou NDJSON).
+
+`/export` aceita os mesmos filtros dos endpoints do dashboard (`ano`, `mes`,
+`uf`, `fabricante`) e devolve as linhas da tabela bruta que casam com eles,
+em vez de um dump do banco. As linhas vêm de um cursor do lado do servidor
+(`stream` + `yield_per`) e são codificadas e enviadas em blocos de
+`EXPORT_CHUNK_ROWS`, então a memória do processo não depende do tamanho do
+recorte (mil ou 50 milhões de linhas).
+
+Para não competir com o dashboard:
+
+- as exportações usam um engine próprio, com no máximo
+  `EXPORT_MAX_CONCURRENCY` conexões (o pool dos endpoints não é tocado
+  durante o streaming);
+- acima desse limite, a requisição recebe 503 com `Retry-After` na hora,
+  sem fila;
+- o event loop é liberado a cada bloco.
+
+Ajustes opcionais por variável de ambiente:
+
+    EXPORT_MAX_CONCURRENCY   (default 2) — exportações simultâneas por processo
+    EXPORT_CHUNK_ROWS        (default 5000) — linhas por bloco do cursor
+    EXPORT_RETRY_AFTER       (default 30) — segundos sugeridos no 503
+"""
+import asyncio
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from .cache import _env_number
+from .database import DATABASE_URL, async_database_url
+from .metrics import Counter
+from .responses import encode_json
+from .schema import ColumnMap, get_column_map
+
+
+EXPORT_MAX_CONCURRENCY = max(1, _env_number("EXPORT_MAX_CONCURRENCY", 2))
+EXPORT_CHUNK_ROWS = max(1, _env_number("EXPORT_CHUNK_ROWS", 5000))
+EXPORT_RETRY_AFTER = _env_number("EXPORT_RETRY_AFTER", 30)
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORTS = Counter("exports_total", "Exportações por formato e resultado.", ("formato", "result"))
+EXPORT_ROWS = Counter("export_rows_total", "Linhas enviadas pelo /export.", ("formato",))
+
+# Vagas de exportação em uso. Só o event loop mexe no contador, então não
+# há corrida entre o teste e o incremento em `try_acquire`.
+_active = 0
+_engine: Optional[AsyncEngine] = None
+
+
+def export_engine() -> AsyncEngine:
+    """Engine das exportações, criado no primeiro uso e separado do pool dos
+    endpoints (`database.async_engine`)."""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            async_database_url(DATABASE_URL),
+            pool_size=EXPORT_MAX_CONCURRENCY,
+            max_overflow=0,
+            pool_pre_ping=True,
+        )
+    return _engine
+
+
+async def dispose() -> None:
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def try_acquire() -> bool:
+    """Reserva uma vaga de exportação sem esperar (sem fila)."""
+    global _active
+    if _active >= EXPORT_MAX_CONCURRENCY:
+        return False
+    _active += 1
+    return True
+
+
+def release() -> None:
+    global _active
+    _active -= 1
+
+
+def active_exports() -> int:
+    return _active
+
+
+async def column_map() -> ColumnMap:
+    async with export_engine().connect() as conn:
+        return await conn.run_sync(get_column_map)
+
+
+def export_sql(
+    columns: ColumnMap,
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str],
+    fabricante_id: Optional[int],
+) -> Tuple[str, Dict[str, Any]]:
+    """SELECT das linhas brutas filtradas, sem ORDER BY (a ordem forçaria um
+    sort do recorte inteiro antes da primeira linha). Os filtros usam as
+    colunas de partição/índice (ANO, MES) como estão na tabela."""
+    where: List[str] = []
+    params: Dict[str, Any] = {}
+    for logical, value in (("ano", ano_int), ("mes", mes_int), ("sigla", uf), ("fabricante_id", fabricante_id)):
+        if value is None:
+            continue
+        if not columns.has(logical):
+            raise ValueError(f"coluna {logical} ausente em {columns.table}")
+        where.append(f"{columns.col(logical)} = :{logical}")
+        params[logical] = value
+    sql = f"SELECT * FROM {columns.table}"
+    if where:
+        sql = f"{sql} WHERE {' AND '.join(where)}"
+    return sql, params
+
+
+def _csv_chunk(rows: Sequence[Sequence[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _ndjson_chunk(keys: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    return b"".join(encode_json(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+async def stream_rows(sql: str, params: Dict[str, Any], formato: str) -> AsyncIterator[bytes]:
+    """Blocos já codificados do resultado; libera a vaga de exportação ao
+    terminar (inclusive se o cliente desconectar no meio)."""
+    result_label = "erro"
+    try:
+        async with export_engine().connect() as conn:
+            # Cursor do lado do servidor, lido de EXPORT_CHUNK_ROWS em EXPORT_CHUNK_ROWS
+            result = await conn.stream(text(sql), params, execution_options={"yield_per": EXPORT_CHUNK_ROWS})
+            keys = list(result.keys())
+            if formato == "csv":
+                yield _csv_chunk([keys])
+            async for rows in result.partitions(EXPORT_CHUNK_ROWS):
+                yield _csv_chunk(rows) if formato == "csv" else _ndjson_chunk(keys, rows)
+                EXPORT_ROWS.inc(len(rows), formato)
+        result_label = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        result_label = "interrompida"
+        raise
+    finally:
+        EXPORTS.inc(1, formato, result_label)
+        release()
+
+
+def render_metrics_lines() -> str:
+    lines = []
+    for metric in (EXPORTS, EXPORT_ROWS):
+        lines.extend(metric.render())
+    lines += [
+        "# HELP exports_active Exportações em andamento neste processo.",
+        "# TYPE exports_active gauge",
+        f"exports_active {active_exports()}",
+    ]
+    return "\n".join(lines) + "\n"
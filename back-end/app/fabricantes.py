@@ -0,0 +1,238 @@
+"""Dimensão de fabricantes (`public.fabricantes`) e o filtro `fabricante`.
+
+O dump traz o fabricante como texto livre no insumo (ex.: `VACINA COVID-19 -
+PFIZER`, `CORONAVAC/BUTANTAN`). Cada texto é classificado uma vez num
+fabricante da tabela `fabricantes` (id smallint), e a tabela bruta e o rollup
+guardam só o id. O filtro dos endpoints recebe o `codigo` (`pfizer`) e vira
+uma comparação de inteiros no rollup.
+
+Uso (a partir de `back-end/`), para uma tabela bruta já carregada:
+
+    python -m app.fabricantes              # preenche FABRICANTE_ID e o rollup
+    python -m app.fabricantes --verificar  # confere os totais por fabricante
+"""
+import argparse
+import sys
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Fabricante, engine
+from .resilience import is_database_failure
+from .schema import RAW_SCHEMA, RAW_TABLE, quote_ident, refresh_column_map
+
+
+# (codigo, nome, trechos que identificam o fabricante no texto do insumo)
+FABRICANTES_CONHECIDOS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("pfizer", "Pfizer/BioNTech", ("PFIZER", "COMIRNATY", "BIONTECH")),
+    ("astrazeneca", "AstraZeneca", ("ASTRAZENECA", "FIOCRUZ", "OXFORD", "COVISHIELD")),
+    ("coronavac", "CoronaVac", ("CORONAVAC", "BUTANTAN", "SINOVAC")),
+    ("janssen", "Janssen", ("JANSSEN",)),
+]
+
+RAW_COLUMN = "FABRICANTE_ID"
+
+# Id usado quando o filtro não corresponde a nenhum fabricante: não casa
+# com nenhuma linha (o endpoint responde vazio em vez de ignorar o filtro)
+NO_MATCH = -1
+
+
+def slugify(value: str) -> str:
+    ascii_value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    slug = "".join(c if c.isalnum() else "-" for c in ascii_value.lower())
+    return "-".join(part for part in slug.split("-") if part)[:40]
+
+
+def classify(texto: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(codigo, nome) do fabricante descrito por `texto`; None se vazio."""
+    if texto is None or not texto.strip():
+        return None
+    upper = texto.strip().upper()
+    for codigo, nome, trechos in FABRICANTES_CONHECIDOS:
+        if any(t in upper for t in trechos):
+            return codigo, nome
+    return slugify(texto), texto.strip()
+
+
+def insert_missing(conn: Connection, fabricantes: Iterable[Tuple[str, str]]) -> None:
+    """Cadastra os (codigo, nome) ainda ausentes. O NOT EXISTS evita que
+    códigos já cadastrados consumam valores da sequência do id smallint (um
+    INSERT ... ON CONFLICT DO NOTHING sozinho consome um a cada carga)."""
+    params = [{"codigo": codigo, "nome": nome} for codigo, nome in sorted(set(fabricantes))]
+    if params:
+        conn.execute(text(
+            "INSERT INTO public.fabricantes (codigo, nome) SELECT :codigo, :nome "
+            "WHERE NOT EXISTS (SELECT 1 FROM public.fabricantes WHERE codigo = :codigo) "
+            "ON CONFLICT (codigo) DO NOTHING"
+        ), params)
+
+
+def create_fabricantes_table(conn: Connection) -> None:
+    Fabricante.__table__.create(bind=conn, checkfirst=True)
+    insert_missing(conn, ((codigo, nome) for codigo, nome, _ in FABRICANTES_CONHECIDOS))
+
+
+def ensure_fabricantes(conn: Connection, textos: Iterable[Optional[str]]) -> Dict[str, int]:
+    """Cadastra os fabricantes ainda ausentes; retorna texto original -> id."""
+    create_fabricantes_table(conn)
+    classified = {t: classify(t) for t in set(textos) if t is not None}
+    insert_missing(conn, (c for c in classified.values() if c is not None))
+    ids = {r.codigo: r.id for r in conn.execute(text("SELECT id, codigo FROM public.fabricantes"))}
+    return {t: ids[c[0]] for t, c in classified.items() if c is not None}
+
+
+def create_mapping_table(conn: Connection, mapping: Dict[str, int]) -> str:
+    """Tabela temporária texto -> id, para preencher FABRICANTE_ID com um JOIN."""
+    conn.execute(text(
+        "CREATE TEMP TABLE fabricante_map (texto text PRIMARY KEY, fabricante_id smallint) ON COMMIT DROP"
+    ))
+    if mapping:
+        conn.execute(
+            text("INSERT INTO fabricante_map (texto, fabricante_id) VALUES (:texto, :id)"),
+            [{"texto": t, "id": i} for t, i in mapping.items()],
+        )
+    return "fabricante_map"
+
+
+def ensure_raw_column(conn: Connection) -> bool:
+    """Adiciona FABRICANTE_ID à tabela bruta, se faltar; retorna True se criou."""
+    column_map = refresh_column_map(conn)
+    if column_map.has("fabricante_id"):
+        return False
+    conn.execute(text(f"ALTER TABLE {column_map.table} ADD COLUMN {quote_ident(RAW_COLUMN)} smallint"))
+    refresh_column_map(conn)
+    return True
+
+
+def backfill_raw(conn: Connection) -> int:
+    """Preenche FABRICANTE_ID a partir do texto do insumo; retorna as linhas
+    alteradas (0 se a tabela não tiver coluna de fabricante em texto)."""
+    ensure_raw_column(conn)
+    column_map = refresh_column_map(conn)
+    if not column_map.has("fabricante"):
+        return 0
+    texto_col = column_map.col("fabricante")
+    textos = [r[0] for r in conn.execute(text(f"SELECT DISTINCT {texto_col} FROM {column_map.table}"))]
+    mapping = ensure_fabricantes(conn, textos)
+    create_mapping_table(conn, mapping)
+    id_col = column_map.col("fabricante_id")
+    return conn.execute(text(
+        f"UPDATE {column_map.table} AS r SET {id_col} = m.fabricante_id FROM fabricante_map AS m "
+        f"WHERE r.{texto_col} = m.texto AND r.{id_col} IS DISTINCT FROM m.fabricante_id"
+    )).rowcount
+
+
+def prepare_dimension(conn: Connection) -> int:
+    """Startup (app/rollup.py `ensure_rollup`): cria e semeia `fabricantes` e,
+    se a dimensão ainda não foi montada nesta base (tabela vazia ou
+    FABRICANTE_ID recém-criada, como num dump restaurado), preenche
+    FABRICANTE_ID. Retorna as linhas preenchidas: com alguma, o rollup
+    precisa ser recalculado."""
+    Fabricante.__table__.create(bind=conn, checkfirst=True)
+    empty = conn.execute(text("SELECT 1 FROM public.fabricantes LIMIT 1")).first() is None
+    added_column = ensure_raw_column(conn)
+    create_fabricantes_table(conn)
+    if not (empty or added_column):
+        return 0
+    return backfill_raw(conn)
+
+
+def fabricante_payload(r) -> Dict[str, object]:
+    return {"id": int(r.id), "codigo": r.codigo, "nome": r.nome}
+
+
+class FabricanteDirectory:
+    """`codigo` -> id em memória, relido quando a versão dos dados muda."""
+
+    def __init__(self):
+        self._version: Optional[int] = None
+        self._items: List[Dict[str, object]] = []
+        self._by_key: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def items(self, db: AsyncSession, version: int) -> List[Dict[str, object]]:
+        with self._lock:
+            if self._version == version:
+                return self._items
+        try:
+            rows = (await db.execute(select(Fabricante).order_by(Fabricante.nome))).scalars().all()
+        except Exception as e:
+            # Banco lento ou fora do ar: propagar (app/resilience.py), sem
+            # guardar a lista vazia como se fosse desta versão
+            if is_database_failure(e):
+                raise
+            # Tabela ainda não criada: nenhum fabricante conhecido
+            await db.rollback()
+            rows = []
+        items = [fabricante_payload(r) for r in rows]
+        by_key = {}
+        for item in items:
+            by_key[str(item["codigo"])] = item["id"]
+            by_key[str(item["id"])] = item["id"]
+        with self._lock:
+            self._version, self._items, self._by_key = version, items, by_key
+        return items
+
+    async def resolve(self, db: AsyncSession, value: Optional[str], version: int) -> Optional[int]:
+        """Id do fabricante pelo código (ou id); None sem filtro e NO_MATCH
+        quando o valor não corresponde a nenhum fabricante."""
+        if value is None:
+            return None
+        await self.items(db, version)
+        with self._lock:
+            return self._by_key.get(value.strip().lower(), NO_MATCH)
+
+
+fabricantes = FabricanteDirectory()
+
+
+def check_totals(conn: Connection) -> int:
+    """Grupos por fabricante com total divergente entre tabela bruta e rollup."""
+    column_map = refresh_column_map(conn)
+    id_col = column_map.col("fabricante_id")
+    raw_sql = (
+        f"SELECT {id_col} AS fabricante_id, COALESCE(SUM({column_map.qtde_expr()}), 0) AS qtde "
+        f"FROM {column_map.table} GROUP BY 1"
+    )
+    rollup_sql = "SELECT fabricante_id, SUM(qtde) AS qtde FROM public.distribuicao_rollup GROUP BY 1"
+    r = conn.execute(text(
+        f"SELECT COUNT(*) AS n FROM ("
+        f"({raw_sql} EXCEPT ALL {rollup_sql}) UNION ALL ({rollup_sql} EXCEPT ALL {raw_sql})"
+        f") AS diff"
+    )).first()
+    return int(r.n)
+
+
+def main(argv=None) -> int:
+    from .rollup import create_rollup_table, refresh_rollup
+
+    parser = argparse.ArgumentParser(description="Preenche a dimensão de fabricantes de distribuicao_raw.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere os totais por fabricante entre a tabela bruta e o rollup")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conn:
+        create_fabricantes_table(conn)
+        updated = backfill_raw(conn)
+        create_rollup_table(conn)
+        groups = refresh_rollup(conn)
+        names = conn.execute(text("SELECT codigo, nome FROM public.fabricantes ORDER BY nome")).all()
+    print(f"{RAW_SCHEMA}.{RAW_TABLE}: {updated} linhas com FABRICANTE_ID atualizado; rollup com {groups} grupos.")
+    print("Fabricantes: " + ", ".join(f"{r.codigo} ({r.nome})" for r in names))
+
+    if args.verificar:
+        with engine.connect() as conn:
+            diff = check_totals(conn)
+        if diff:
+            print(f"FALHOU: {diff} fabricantes com total divergente entre tabela bruta e rollup.")
+            return 1
+        print("Totais por fabricante OK.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
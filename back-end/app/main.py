@@ -1,10 +1,50 @@
-from fastapi import FastAPI, Query, Depends
+import asyncio
+import time
+from fastapi import FastAPI, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
-from .database import get_db, TimePoint, EstadoSnapshot
+from typing import List, Optional, Dict, Any, Hashable, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, text
+from .database import engine, get_async_db, AsyncSessionLocal, async_engine, EstadoSnapshot
+from .rollup import ensure_rollup
+from .schema import refresh_column_map, current_column_map
+from .cache import response_cache, data_version
+from .columnar import columnar_engine
+from . import admission, batch, export, singleflight
+from .admission import admission_control, is_overloaded
+from .estados import RANKING_ORDER, snapshot_covers
+from .fabricantes import fabricantes
+from .responses import encoded_response, make_etag, matching_etag, not_modified, plain_response
+from .metrics import MetricsMiddleware, explain_recorded, render_metrics
+from .singleflight import inflight
+from .series import SeriesWindow, rows_to_points, window_series, windowed_series_sql
+from .resilience import (
+    REFRESH_TIMEOUT_SCALE,
+    STALE_RESPONSES,
+    UNAVAILABLE_RESPONSES,
+    breaker,
+    is_database_failure,
+    last_good,
+    render_metrics_lines,
+    request_deadline,
+    statement_timeout,
+)
+from .queries import (
+    ROLLUP_TABLE,
+    rollup_where,
+    with_where,
+    overview_total_sql,
+    timeseries_sql,
+    ranking_sql,
+    overview_payload,
+    series_point,
+    ranking_item,
+    snapshot_ranking_item,
+    dashboard_sql,
+    split_dashboard_rows,
+)
 
 
 app = FastAPI(title="Vacina Brasil API", version="1.0.0")
@@ -23,8 +63,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# Tempo de banco/serialização por requisição (Server-Timing) e /metrics
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+def startup_rollup():
+    # Resolve uma vez o layout de colunas de distribuicao_raw (ver app/schema.py)
+    try:
+        with engine.connect() as conn:
+            refresh_column_map(conn)
+    except Exception as e:
+        print("Aviso: não foi possível resolver as colunas de distribuicao_raw:", e)
+
+    # Garante que o rollup exista; se a tabela bruta ainda não foi agregada
+    # (primeiro deploy), popula agora para os endpoints não responderem zeros.
+    try:
+        ensure_rollup()
+    except Exception as e:
+        print("Aviso: não foi possível preparar distribuicao_rollup:", e)
+
+
+@app.on_event("startup")
+async def startup_columnar():
+    # Com QUERY_ENGINE=numpy (ou mmap), carrega os arrays antes da primeira requisição
+    if not columnar_engine.enabled:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await columnar_engine.current(await data_version.current(db))
+    except Exception as e:
+        print("Aviso: não foi possível carregar o motor colunar:", e)
+
+
+@app.on_event("shutdown")
+async def shutdown_async_engine():
+    await async_engine.dispose()
+    await export.dispose()
+
 
 # ====== Modelos de resposta ======
 
@@ -40,6 +119,24 @@ class ApiListResponse(BaseModel):
     message: Optional[str] = None
 
 
+class BatchFilter(BaseModel):
+    """Um conjunto de filtros do /batch (mesmos parâmetros dos endpoints)."""
+    id: Optional[str] = None
+    ano: Optional[str] = None
+    mes: Optional[str] = None
+    uf: Optional[str] = None
+    fabricante: Optional[str] = None
+    de: Optional[str] = None
+    ate: Optional[str] = None
+    janela: Optional[str] = None
+    acumulado: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    metrica: str
+    filtros: List[BatchFilter]
+
+
 def parse_int(value: Optional[str]) -> Optional[int]:
     if value is None:
         return None
@@ -48,35 +145,6 @@ def parse_int(value: Optional[str]) -> Optional[int]:
     except Exception:
         return None
 
-def try_scalar_query(db: Session, sql_variants: List[str]):
-    """Tenta executar cada string SQL em sql_variants em ordem e retorna
-    a first row if uma execução funcionar. Caso todas falhem, retorna None.
-
-    Isso torna o código tolerante a variações no schema (por exemplo colunas
-    em maiúsculas ou com prefixos como TX_QTDE)."""
-    for sql in sql_variants:
-        try:
-            r = db.execute(text(sql)).first()
-            if r is not None:
-                return r
-        except Exception:
-            # ignora e tenta próxima variante
-            continue
-    return None
-
-
-def try_query_all(db: Session, sql_variants: List[str]):
-    """Executa cada SQL em sql_variants até uma execução bem sucedida e
-    retorna .all() do resultado. Se todas falharem, retorna None."""
-    for sql in sql_variants:
-        try:
-            rows = db.execute(text(sql)).all()
-            return rows
-        except Exception:
-            continue
-    return None
-
-
 def is_unset(filter_value: Optional[str]) -> bool:
     if filter_value is None:
         return True
@@ -84,266 +152,575 @@ def is_unset(filter_value: Optional[str]) -> bool:
     return v in ("", "todos", "all", "none", "null")
 
 
+def filter_key(
+    endpoint: str,
+    ano: Optional[str],
+    mes: Optional[str],
+    uf: Optional[str],
+    fabricante: Optional[str],
+    *extra: Hashable,
+) -> Tuple:
+    """Chave de cache com os filtros normalizados pelas mesmas regras das
+    consultas (`parse_int`/`is_unset`): `mes=todos`, `mes=` e `mes` ausente
+    caem na mesma entrada, assim como `mes=03` e `mes=3`. `extra` são
+    parâmetros próprios do endpoint, já normalizados."""
+    return (
+        endpoint,
+        parse_int(ano),
+        parse_int(mes),
+        None if is_unset(uf) else uf,
+        None if is_unset(fabricante) else fabricante.strip().lower(),
+        *extra,
+    )
+
+
+async def resolve_fabricante(db: AsyncSession, fabricante: Optional[str], version: int) -> Optional[int]:
+    """Id do fabricante filtrado (None sem filtro; ver app/fabricantes.py)."""
+    return await fabricantes.resolve(db, None if is_unset(fabricante) else fabricante, version)
+
+
+def debug_mode(value: Optional[str]) -> Optional[str]:
+    """`debug=1` devolve o SQL e a contagem de linhas; `debug=explain` também
+    o EXPLAIN (ANALYZE, BUFFERS) das consultas que o handler executou."""
+    if value is None:
+        return None
+    v = value.strip().lower()
+    if v in ("", "0", "false", "no"):
+        return None
+    return "explain" if v == "explain" else "sql"
+
+
+async def debug_response(request: Request, db: AsyncSession, data: Any, info: Dict[str, Any], mode: str):
+    if mode == "explain":
+        info = {**info, "explain": await explain_recorded(db)}
+    return plain_response({"data": data, "success": True, "debug": info}, request)
+
+
+def cached_response(request: Request, key: Tuple, version: int, data: Any):
+    """Codifica `data` uma vez, guarda os bytes no cache e responde."""
+    encoded = encoded_response(data, key, version)
+    response_cache.set(key, version, encoded)
+    return encoded.response(request)
+
+
+# ====== Consultas assíncronas ======
+
+async def fetch_all(sql: str, params: Dict[str, Any]):
+    """Executa `sql` numa sessão própria.
+
+    Usado para rodar consultas independentes de uma mesma requisição em
+    paralelo (`asyncio.gather`), já que uma AsyncSession não aceita uso
+    concorrente.
+    """
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(text(sql), params)).all()
+
+
+async def fetch_snapshot(uf: Optional[str]):
+    """Snapshot dos estados (opcionalmente de uma UF) na ordem do ranking pré-calculado."""
+    async with AsyncSessionLocal() as session:
+        stmt = select(EstadoSnapshot)
+        if uf is not None:
+            stmt = stmt.where(EstadoSnapshot.uf == uf)
+        stmt = stmt.order_by(*RANKING_ORDER)
+        return (await session.execute(stmt)).scalars().all()
+
+
+# ====== Cálculo das respostas ======
+#
+# Cada `compute_*` devolve (dados, informações de debug) para a versão dos
+# dados e os filtros crus da requisição; `serve` cuida de cache, ETag, limites
+# de tempo e do fallback para o último resultado bom.
+
+async def compute_overview(db: AsyncSession, version: int, ano, mes, uf, fabricante):
+    # Total distribuído a partir do rollup de `distribuicao_raw` (mesmos
+    # números da soma de QTDE na tabela bruta, sem varrê-la a cada requisição);
+    # aplicadas e ESAVI vêm do rollup dos microdados de aplicação.
+    # Aplicar filtros ANO/MES apenas se fornecidos e válidos (números).
+    fabricante_id = await resolve_fabricante(db, fabricante, version)
+    if columnar_engine.enabled:
+        snapshot = await columnar_engine.current(version)
+        overview = snapshot.overview(parse_int(ano), parse_int(mes), fabricante_id)
+        return overview, {"engine": "numpy", **snapshot.stats()}
+
+    base_sql, params = overview_total_sql(parse_int(ano), parse_int(mes), fabricante_id)
+    total_rows = await fetch_all(base_sql, params)
+    r = total_rows[0] if total_rows else None
+    overview = overview_payload(r.total, r.aplicadas, r.esavi) if r is not None else overview_payload(0)
+    return overview, {"sql": base_sql, "rows": len(total_rows)}
+
+
+async def compute_timeseries(db: AsyncSession, version: int, ano, mes, uf, fabricante, window_key=None):
+    # Para evitar depender do snapshot `timeseries` (vazia no deploy),
+    # agregar a partir do rollup (ANO, MES, SIGLA) de `distribuicao_raw`.
+    # Isso garante que o frontend receba dados consistentes filtrados por
+    # ano/mes/uf quando disponíveis no dump.
+    uf_value = None if is_unset(uf) else uf
+    fabricante_id = await resolve_fabricante(db, fabricante, version)
+    # Intervalo de meses, acumulado e média móvel (ver app/series.py)
+    window = SeriesWindow(*window_key) if window_key is not None else None
+    if columnar_engine.enabled:
+        snapshot = await columnar_engine.current(version)
+        if window is not None:
+            months = snapshot.months(parse_int(ano), parse_int(mes), uf_value, fabricante_id)
+            series = window_series(months, uf_value, window)
+        else:
+            series = snapshot.timeseries(parse_int(ano), parse_int(mes), uf_value, fabricante_id)
+        return series, {"engine": "numpy", **snapshot.stats()}
+
+    if window is not None:
+        sql, params = windowed_series_sql(parse_int(ano), parse_int(mes), uf_value, fabricante_id, window)
+        agg_rows = (await db.execute(text(sql), params)).all() or []
+        return rows_to_points(agg_rows, uf_value, window), {"sql": sql, "rows": len(agg_rows)}
+
+    sql, params = timeseries_sql(parse_int(ano), parse_int(mes), uf_value, fabricante_id)
+    agg_rows = (await db.execute(text(sql), params)).all() or []
+    series = [series_point(r.ano, r.mes, uf_value, r.distribuidas, r.aplicadas, r.esavi) for r in agg_rows]
+    return series, {"sql": sql, "rows": len(agg_rows)}
+
+
+async def compute_ranking(db: AsyncSession, version: int, ano, mes, uf, fabricante):
+    fabricante_id = await resolve_fabricante(db, fabricante, version)
+    if columnar_engine.enabled:
+        snapshot = await columnar_engine.current(version)
+        items = snapshot.ranking(parse_int(ano), parse_int(mes), None if is_unset(uf) else uf, fabricante_id)
+        return items, {"engine": "numpy", **snapshot.stats()}
+
+    # Consultar snapshot dos estados no banco, já ranqueado (ordem de
+    # `posicao`, ver app/estados.py). A agregação do rollup só é
+    # necessária quando o snapshot está vazio, então não roda em paralelo.
+    # O snapshot não tem período nem fabricante: com esses filtros o ranking
+    # vem do rollup.
+    records = []
+    if snapshot_covers(parse_int(ano), parse_int(mes), fabricante_id):
+        stmt = select(EstadoSnapshot)
+        if not is_unset(uf):
+            stmt = stmt.where(EstadoSnapshot.uf == uf)
+        records = (await db.execute(stmt.order_by(*RANKING_ORDER))).scalars().all()
+    if records:
+        return [snapshot_ranking_item(r) for r in records], {"source": "estado_snapshot", "rows": len(records)}
+
+    # Sem snapshot: agrupar por sigla a partir do rollup de `distribuicao_raw`
+    # e retornar ranking por distribuídas. As variantes de nome de coluna do
+    # dump são resolvidas ao recalcular o rollup.
+    executed_sql, params = ranking_sql(parse_int(ano), parse_int(mes), None if is_unset(uf) else uf, fabricante_id)
+    agg_rows = (await db.execute(text(executed_sql), params)).all()
+    items = [ranking_item(r.uf, r.distribuidas, r.aplicadas) for r in (agg_rows or [])]
+    return items, {"sql": executed_sql, "rows": len(agg_rows)}
+
+
+async def compute_dashboard(db: AsyncSession, version: int, ano, mes, uf, fabricante):
+    uf_value = None if is_unset(uf) else uf
+    fabricante_id = await resolve_fabricante(db, fabricante, version)
+    if columnar_engine.enabled:
+        snapshot = await columnar_engine.current(version)
+        dashboard = snapshot.dashboard(parse_int(ano), parse_int(mes), uf_value, fabricante_id)
+        return dashboard, {"engine": "numpy", **snapshot.stats()}
+
+    sql, params = dashboard_sql(parse_int(ano), parse_int(mes), uf_value, fabricante_id)
+    # GROUPING SETS e snapshot dos estados em paralelo; o ranking continua
+    # priorizando o snapshot, quando existir (e sem filtro de período ou fabricante)
+    if snapshot_covers(parse_int(ano), parse_int(mes), fabricante_id):
+        rows, records = await asyncio.gather(fetch_all(sql, params), fetch_snapshot(uf_value))
+    else:
+        rows, records = await fetch_all(sql, params), []
+    overview, series, ranking = split_dashboard_rows(rows, uf_value)
+    if records:
+        ranking = [snapshot_ranking_item(r) for r in records]
+    dashboard = {
+        "overview": overview,
+        "timeseries": series,
+        "ranking": ranking,
+    }
+    return dashboard, {"sql": sql, "rows": len(rows)}
+
+
+async def compute_batch(db: AsyncSession, version: int, ano, mes, uf, fabricante, metrica, sets):
+    # Vários conjuntos de filtros de uma métrica (ver app/batch.py); os
+    # filtros gerais (ano, mes, uf, fabricante) não são usados
+    resolved = [
+        (set_id, ano_int, mes_int, uf_value, await resolve_fabricante(db, fabricante_value, version), window_key)
+        for set_id, ano_int, mes_int, uf_value, fabricante_value, window_key in sets
+    ]
+    if columnar_engine.enabled:
+        snapshot = await columnar_engine.current(version)
+        data = {}
+        for set_id, ano_int, mes_int, uf_value, fabricante_id, window_key in resolved:
+            if metrica == "overview":
+                data[set_id] = snapshot.overview(ano_int, mes_int, fabricante_id)
+            elif metrica == "ranking_ufs":
+                data[set_id] = snapshot.ranking(ano_int, mes_int, uf_value, fabricante_id)
+            elif window_key is not None:
+                months = snapshot.months(ano_int, mes_int, uf_value, fabricante_id)
+                data[set_id] = window_series(months, uf_value, SeriesWindow(*window_key))
+            else:
+                data[set_id] = snapshot.timeseries(ano_int, mes_int, uf_value, fabricante_id)
+        return data, {"engine": "numpy", "filtros": len(resolved), **snapshot.stats()}
+
+    sql, params = batch.batch_sql(metrica, resolved)
+    # O ranking prioriza o snapshot dos estados, como em /ranking/ufs
+    if metrica == "ranking_ufs" and any(snapshot_covers(s[1], s[2], s[4]) for s in resolved):
+        rows, records = await asyncio.gather(fetch_all(sql, params), fetch_snapshot(None))
+    else:
+        rows, records = (await db.execute(text(sql), params)).all(), []
+    data = {s[0]: batch.answer(metrica, rows, s, records) for s in resolved}
+    return data, {"sql": sql, "rows": len(rows), "filtros": len(resolved)}
+
+
+# Partes do /dashboard que também são respostas dos endpoints individuais
+DASHBOARD_PARTS = (("overview", "overview"), ("timeseries", "timeseries"), ("ranking_ufs", "ranking"))
+
+
+def store_result(endpoint: str, filters: Tuple, version: int, data: Any) -> None:
+    """Guarda um resultado novo no cache de respostas e como último resultado bom."""
+    key = filter_key(endpoint, *filters)
+    last_good.set(key, version, data)
+    if endpoint == "dashboard":
+        # Aproveitar a mesma consulta para aquecer o cache dos endpoints individuais
+        for part_endpoint, part in DASHBOARD_PARTS:
+            part_key = filter_key(part_endpoint, *filters)
+            last_good.set(part_key, version, data[part])
+            response_cache.set(part_key, version, encoded_response(data[part], part_key, version))
+
+
+async def refresh_last_good(endpoint: str, filters: Tuple, compute) -> None:
+    """Recalcula um resultado servido como `stale`, fora da requisição e com
+    um limite de tempo maior."""
+    if not breaker.allow():
+        raise RuntimeError("circuito aberto")
+    try:
+        with statement_timeout(endpoint, REFRESH_TIMEOUT_SCALE):
+            async with AsyncSessionLocal() as session:
+                version = await data_version.current(session)
+                data, _ = await asyncio.wait_for(
+                    compute(session, version, *filters), request_deadline(endpoint, REFRESH_TIMEOUT_SCALE)
+                )
+    except Exception as e:
+        breaker.record_failure() if is_database_failure(e) else breaker.release()
+        raise
+    breaker.record_success()
+    key = filter_key(endpoint, *filters)
+    response_cache.set(key, version, encoded_response(data, key, version))
+    store_result(endpoint, filters, version, data)
+
+
+def fallback_response(request: Request, endpoint: str, filters: Tuple, compute, error: Optional[BaseException]):
+    """Último resultado bom marcado como `stale` (e recalculado em segundo
+    plano, se o banco estiver aceitando consultas) ou 503."""
+    key = filter_key(endpoint, *filters)
+    message = "Banco de dados indisponível"
+    if error is not None and debug_mode(request.query_params.get("debug")):
+        message = f"{message}: {type(error).__name__}: {error}"
+    entry = last_good.get(key)
+    if entry is None:
+        UNAVAILABLE_RESPONSES.inc(1, endpoint)
+        return plain_response(
+            {"data": None, "success": False, "message": message}, request,
+            status_code=503, headers={"Retry-After": str(breaker.retry_after()), "Cache-Control": "no-store"},
+        )
+
+    data, version, stored_at = entry
+    STALE_RESPONSES.inc(1, endpoint)
+    if error is not None:
+        last_good.refresh_in_background(key, lambda: refresh_last_good(endpoint, filters, compute))
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(stored_at))
+    return plain_response(
+        {"data": data, "success": True, "message": f"{message}; dados de {stamp}", "stale": True,
+         "data_version": version},
+        request,
+        headers={"Cache-Control": "no-store", "Age": str(max(0, int(time.time() - stored_at)))},
+    )
+
+
+def overloaded_response(request: Request, error: BaseException):
+    """503 imediato quando não há vaga de cálculo (app/admission.py)."""
+    message = "Servidor sobrecarregado, tente novamente"
+    if debug_mode(request.query_params.get("debug")):
+        message = f"{message}: {error.__cause__ or error}"
+    return plain_response(
+        {"data": None, "success": False, "message": message}, request, status_code=503,
+        headers={"Retry-After": str(admission.ADMISSION_RETRY_AFTER), "Cache-Control": "no-store"},
+    )
+
+
+async def serve(request: Request, db: AsyncSession, endpoint: str, filters: Tuple, debug: Optional[str], compute):
+    """Fluxo comum dos endpoints do dashboard: ETag/304 e cache de respostas;
+    senão `compute` (coalescido com requisições idênticas em andamento) com o
+    limite de tempo do endpoint. Se o banco falhar (ou o circuito estiver
+    aberto), responde com o último resultado bom ou 503."""
+    debug = debug_mode(debug)
+    cache_key = filter_key(endpoint, *filters)
+    admitted = breaker.allow()
+    try:
+        with statement_timeout(endpoint):
+            # Com o circuito aberto, nada vai ao banco: só o cache da última versão vista
+            version = await data_version.current(db) if admitted else data_version.current_cached()
+            if not debug:
+                etag = make_etag(cache_key, version)
+                matched = matching_etag(request, etag)
+                if matched is not None:
+                    breaker.release()
+                    # ETag com sufixo de codificação: o corpo tem versão em gzip
+                    return not_modified(matched, vary=matched != etag)
+                cached = response_cache.get(cache_key, version)
+                if cached is not None:
+                    breaker.release()
+                    return cached.response(request)
+            if not admitted:
+                return fallback_response(request, endpoint, filters, compute, None)
+
+            async def compute_in_slot():
+                # Vaga de cálculo do endpoint (app/admission.py); o limite de
+                # tempo da requisição conta a partir da admissão
+                async with admission_control.slot(endpoint):
+                    return await asyncio.wait_for(compute(db, version, *filters), request_deadline(endpoint))
+
+            if debug:
+                # Debug mede e explica as próprias consultas: não entra na coalescência
+                data, debug_info = await compute_in_slot()
+            else:
+                # Requisições idênticas simultâneas esperam o mesmo cálculo (app/singleflight.py)
+                data, debug_info = await inflight.do(cache_key + (version,), compute_in_slot, endpoint)
+    except Exception as e:
+        if is_overloaded(e):
+            breaker.release()
+            return overloaded_response(request, e)
+        if admitted:
+            breaker.record_failure() if is_database_failure(e) else breaker.release()
+        return fallback_response(request, endpoint, filters, compute, e)
+    breaker.record_success()
+
+    if debug:
+        return await debug_response(request, db, data, debug_info, debug)
+    store_result(endpoint, filters, version, data)
+    return cached_response(request, cache_key, version, data)
+
+
 # ====== Endpoints ======
 
 @app.get("/overview", response_model=ApiResponse)
-def get_overview(
+async def get_overview(
+    request: Request,
     ano: Optional[str] = Query(None),
     mes: Optional[str] = Query(None),
     uf: Optional[str] = Query(None),
     fabricante: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    debug: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        # Consultar snapshot dos estados
-        query = db.query(EstadoSnapshot)
-        
-        if not is_unset(uf):
-            query = query.filter(EstadoSnapshot.uf == uf)
-        
-        state_items = query.all()
-        
-        # Agregação direta da tabela `distribuicao_raw` — somar apenas a coluna QTDE
-        # Aplicar filtros ANO/MES apenas se fornecidos e válidos (números)
-        try:
-            ano_int = parse_int(ano)
-            mes_int = parse_int(mes)
-
-            where = []
-            params = {}
-            if ano_int is not None:
-                where.append('"ANO" = :ano')
-                params['ano'] = ano_int
-            if mes_int is not None:
-                where.append('"MES" = :mes')
-                params['mes'] = mes_int
-
-            base_sql = 'SELECT COALESCE(SUM(CAST("QTDE" AS numeric)),0) AS total FROM public.distribuicao_raw'
-            if where:
-                base_sql = f"{base_sql} WHERE {' AND '.join(where)}"
-
-            r = db.execute(text(base_sql), params).first()
-            total_distribuidas = int(r.total) if r and getattr(r, 'total', None) is not None else 0
-        except Exception:
-            # Se a tabela não existir ou houver erro, retornar zeros para não quebrar o frontend
-            total_distribuidas = 0
-
-        # Para esse diagnóstico/ajuste, manter os demais campos como zero para evitar quebra no frontend
-        total_aplicadas = 0
-        eficiencia = 0.0
-        esavi = 0
-        
-        overview = {
-            "distribuídas": total_distribuidas,
-            "aplicadas": total_aplicadas,
-            "eficiência": eficiencia,
-            "esavi": esavi,
-        }
-        return {"data": overview, "success": True}
-    except Exception:
-        # Em caso de erro de consulta, retornar valores vazios/zeros para não expor mocks
-        overview = {
-            "distribuídas": 0,
-            "aplicadas": 0,
-            "eficiência": 0.0,
-            "esavi": 0,
-        }
-        return {"data": overview, "success": True}
+    return await serve(request, db, "overview", (ano, mes, uf, fabricante), debug, compute_overview)
 
 
 @app.get("/timeseries", response_model=ApiListResponse)
-def get_timeseries(
+async def get_timeseries(
+    request: Request,
     ano: Optional[str] = Query(None),
     mes: Optional[str] = Query(None),
     uf: Optional[str] = Query(None),
     fabricante: Optional[str] = Query(None),
-    debug: Optional[int] = Query(0),
-    db: Session = Depends(get_db)
+    de: Optional[str] = Query(None, description="primeiro mês, AAAA-MM ou AAAA"),
+    ate: Optional[str] = Query(None, description="último mês, AAAA-MM ou AAAA"),
+    janela: Optional[str] = Query(None, description="meses da média móvel"),
+    acumulado: Optional[str] = Query(None),
+    debug: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # Respostas de debug sempre consultam o banco (e não entram no cache)
+    filters = (ano, mes, uf, fabricante)
     try:
-        # Para evitar depender do snapshot `timeseries` (vazia no deploy),
-        # consultar diretamente a tabela `distribuicao_raw` usando a mesma
-        # SQL testada no endpoint de debug. Isso garante que o frontend
-        # receba dados consistentes filtrados por ano/mes/uf quando
-        # disponíveis no dump.
-        ano_int = parse_int(ano)
-        mes_int = parse_int(mes)
-        params = {}
-        where = []
-        if ano_int is not None:
-            where.append('"ANO" = :ano')
-            params['ano'] = ano_int
-        if mes_int is not None:
-            where.append('"MES" = :mes')
-            params['mes'] = mes_int
-        if not is_unset(uf):
-            where.append('"SIGLA" = :uf')
-            params['uf'] = uf
-
-        sql = 'SELECT "ANO" AS ano, "MES" AS mes, SUM(CAST("QTDE" AS numeric)) AS distribuidas FROM public.distribuicao_raw'
-        if where:
-            sql = f"{sql} WHERE {' AND '.join(where)}"
-        sql = f"{sql} GROUP BY \"ANO\", \"MES\" ORDER BY \"ANO\", \"MES\""
-
-        agg_rows = db.execute(text(sql), params).all() or []
-
-        series = [
-            {
-                "ano": int(r.ano) if getattr(r, 'ano', None) is not None else 2021,
-                "mês": int(r.mes) if getattr(r, 'mes', None) is not None else 0,
-                "uf": (params.get('uf') if params.get('uf') is not None else 'BR'),
-                "distribuídas": int(r.distribuidas) if getattr(r, 'distribuidas', None) is not None else 0,
-                "aplicadas": 0,
-                "eficiência": 0.0,
-                "esavi": 0,
-            }
-            for r in agg_rows
-        ]
-
-        if debug:
-            return {"data": series, "success": True, "debug": {"sql": sql, "rows": len(agg_rows)}}
-        
-        return {"data": series, "success": True}
-    except Exception:
-        # Em caso de erro -> retornar lista vazia
-        return {"data": [], "success": True}
+        window = SeriesWindow.from_params(de, ate, janela, acumulado)
+    except ValueError as e:
+        # Parâmetro de janela malformado: 400, e não a série sem a janela pedida
+        return plain_response({"data": None, "success": False, "message": str(e)}, request, status_code=400)
+    if window.active:
+        filters += (window.key(),)
+    return await serve(request, db, "timeseries", filters, debug, compute_timeseries)
 
 
 @app.get("/ranking/ufs", response_model=ApiListResponse)
-def get_ranking_ufs(
+async def get_ranking_ufs(
+    request: Request,
     ano: Optional[str] = Query(None),
     mes: Optional[str] = Query(None),
     uf: Optional[str] = Query(None),
     fabricante: Optional[str] = Query(None),
-    debug: Optional[int] = Query(0),
-    db: Session = Depends(get_db)
+    debug: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        # Consultar snapshot dos estados no banco
-        query = db.query(EstadoSnapshot)
-        
-        if not is_unset(uf):
-            query = query.filter(EstadoSnapshot.uf == uf)
-        
-        records = query.order_by(EstadoSnapshot.eficiência.desc()).all()
-        
-        if not records:
-            # Se não houver snapshot, tentar agrupar por sigla a partir da tabela
-            # `distribuicao` e retornar ranking por distribuídas.
+    return await serve(request, db, "ranking_ufs", (ano, mes, uf, fabricante), debug, compute_ranking)
+
+
+@app.get("/dashboard", response_model=ApiResponse)
+async def get_dashboard(
+    request: Request,
+    ano: Optional[str] = Query(None),
+    mes: Optional[str] = Query(None),
+    uf: Optional[str] = Query(None),
+    fabricante: Optional[str] = Query(None),
+    debug: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Overview, série temporal e ranking de UFs numa única requisição.
+
+    Os três blocos saem de uma só consulta GROUPING SETS sobre o rollup e são
+    idênticos às respostas de `/overview`, `/timeseries` e `/ranking/ufs`
+    para os mesmos filtros.
+    """
+    return await serve(request, db, "dashboard", (ano, mes, uf, fabricante), debug, compute_dashboard)
+
+
+@app.post("/batch", response_model=ApiResponse)
+async def post_batch(
+    request: Request,
+    body: BatchRequest,
+    debug: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Uma métrica (`overview`, `timeseries` ou `ranking_ufs`) para vários
+    conjuntos de filtros, numa só consulta agrupada; a resposta traz cada
+    resultado sob o `id` do conjunto (ou a posição dele na lista)."""
+    metrica = body.metrica.strip().lower()
+    message = None
+    if metrica not in batch.METRICAS:
+        message = f"métrica inválida: {metrica} (use {', '.join(batch.METRICAS)})"
+    elif len(body.filtros) > batch.BATCH_MAX:
+        message = f"no máximo {batch.BATCH_MAX} conjuntos de filtros por requisição"
+    ids = [f.id if f.id is not None else str(i) for i, f in enumerate(body.filtros)]
+    if message is None and len(set(ids)) != len(ids):
+        message = "ids repetidos em filtros"
+    if message is not None:
+        return plain_response({"data": None, "success": False, "message": message}, request, status_code=400)
+
+    sets = []
+    for set_id, f in zip(ids, body.filtros):
+        window_key = None
+        if metrica == "timeseries":
             try:
-                # Construir SQL parametrizado para agrupar por UF na tabela distribucao_raw
-                ano_int = parse_int(ano)
-                mes_int = parse_int(mes)
-                where_clauses = []
-                params = {}
-                if ano_int is not None:
-                    where_clauses.append('"ANO" = :ano')
-                    params['ano'] = ano_int
-                if mes_int is not None:
-                    where_clauses.append('"MES" = :mes')
-                    params['mes'] = mes_int
-                if not is_unset(uf):
-                    where_clauses.append('"SIGLA" = :uf')
-                    params['uf'] = uf
-
-                # Usar alias sem acento para garantir que o driver exponha a coluna
-                base_sql = 'SELECT "SIGLA" AS uf, SUM(CAST("QTDE" AS numeric)) AS distribuidas FROM public.distribuicao_raw'
-                if where_clauses:
-                    base_sql = f"{base_sql} WHERE {' AND '.join(where_clauses)}"
-                base_sql = f"{base_sql} GROUP BY \"SIGLA\" ORDER BY SUM(CAST(\"QTDE\" AS numeric)) DESC"
-
-                # Variantes alternativas caso a coluna tenha nome diferente no dump
-                alt_variants = [
-                    "SELECT sigla AS uf, SUM(CAST(qtde AS numeric)) AS distribuidas FROM distribuicao_raw",
-                    'SELECT "TX_SIGLA" AS uf, SUM(CAST("QTDE" AS numeric)) AS distribuidas FROM distribuicao_raw',
-                    'SELECT sigla AS uf, SUM(CAST("QTDE" AS numeric)) AS distribuidas FROM public.distribuicao_raw',
-                ]
-
-                agg_rows = []
-                executed_sql = base_sql
-                # Tentar variante padrão
-                try:
-                    agg_rows = db.execute(text(base_sql), params).all()
-                except Exception:
-                    agg_rows = []
-
-                # Se não trouxe resultados, tentar variantes alternativas (sem depender de exceção)
-                if not agg_rows:
-                    for v in alt_variants:
-                        try:
-                            sql = v
-                            if where_clauses:
-                                sql = f"{sql} WHERE {' AND '.join(where_clauses)}"
-                            sql = f"{sql} GROUP BY sigla ORDER BY SUM(CAST(\"QTDE\" AS numeric)) DESC"
-                            agg_rows = db.execute(text(sql), params).all()
-                            executed_sql = sql
-                            if agg_rows:
-                                break
-                        except Exception:
-                            continue
-
-                items = [
-                    {
-                        "uf": (r.uf.strip() if getattr(r, 'uf', None) else r.uf) if getattr(r, 'uf', None) is not None else None,
-                        "nome": None,
-                        "distribuídas": int(r.distribuidas) if getattr(r, 'distribuidas', None) is not None else 0,
-                        "aplicadas": 0,
-                        "eficiência": 0.0,
-                    }
-                    for r in (agg_rows or [])
-                ]
-                if debug:
-                    return {"data": items, "success": True, "debug": {"sql": executed_sql, "rows": len(agg_rows)}}
-            except Exception:
-                items = []
-        else:
-            # Converter objetos do banco para dicts
-            items = [
-                {
-                    "uf": r.uf,
-                    "nome": r.nome,
-                    "distribuídas": r.distribuídas,
-                    "aplicadas": r.aplicadas,
-                    "eficiência": round(r.eficiência, 1),
-                }
-                for r in records
-            ]
-        
-        return {"data": items, "success": True}
+                window = SeriesWindow.from_params(f.de, f.ate, f.janela, f.acumulado)
+            except ValueError as e:
+                return plain_response({"data": None, "success": False, "message": f"filtros[{set_id}]: {e}"},
+                                      request, status_code=400)
+            window_key = window.key() if window.active else None
+        sets.append((set_id, *filter_key("", f.ano, f.mes, f.uf, f.fabricante)[1:], window_key))
+    filters = (None, None, None, None, metrica, tuple(sets))
+    return await serve(request, db, "batch", filters, debug, compute_batch)
+
+
+# Fabricantes conhecidos (valores aceitos pelo filtro `fabricante`)
+async def compute_fabricantes(db: AsyncSession, version: int, *filters):
+    return await fabricantes.items(db, version), {"source": "fabricantes"}
+
+
+@app.get("/fabricantes", response_model=ApiListResponse)
+async def get_fabricantes(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await serve(request, db, "fabricantes", (None, None, None, None), None, compute_fabricantes)
+
+
+# Linhas brutas filtradas em streaming (ver app/export.py)
+@app.get("/export")
+async def export_rows(
+    request: Request,
+    ano: Optional[str] = Query(None),
+    mes: Optional[str] = Query(None),
+    uf: Optional[str] = Query(None),
+    fabricante: Optional[str] = Query(None),
+    formato: str = Query("csv", description="csv ou ndjson"),
+):
+    formato = formato.strip().lower()
+    if formato not in export.FORMATS:
+        return plain_response(
+            {"data": None, "success": False, "message": f"formato inválido: {formato} (use csv ou ndjson)"},
+            request, status_code=400,
+        )
+    if not export.try_acquire():
+        export.EXPORTS.inc(1, formato, "recusada")
+        return plain_response(
+            {"data": None, "success": False, "message": "Limite de exportações simultâneas atingido"},
+            request, status_code=503, headers={"Retry-After": str(export.EXPORT_RETRY_AFTER)},
+        )
+    # Sessão própria e curta: a dependência `get_async_db` seguraria uma
+    # conexão do pool dos endpoints até o fim do streaming
+    try:
+        async with AsyncSessionLocal() as session:
+            version = await data_version.current(session)
+            fabricante_id = await resolve_fabricante(session, fabricante, version)
+        sql, params = export.export_sql(
+            await export.column_map(), parse_int(ano), parse_int(mes), None if is_unset(uf) else uf, fabricante_id
+        )
+    except ValueError as e:
+        export.release()
+        return plain_response({"data": None, "success": False, "message": str(e)}, request, status_code=400)
     except Exception as e:
-        # Em caso de erro, não retornar mocks — retornar lista vazia
-        items = []
-        if 'debug' in locals() and debug:
-            return {"data": items, "success": True, "message": str(e)}
-        return {"data": items, "success": True}
+        export.release()
+        export.EXPORTS.inc(1, formato, "erro")
+        return plain_response(
+            {"data": None, "success": False, "message": f"Exportação indisponível: {type(e).__name__}"},
+            request, status_code=503, headers={"Retry-After": str(export.EXPORT_RETRY_AFTER)},
+        )
+
+    filters = (parse_int(ano), parse_int(mes), params.get("sigla"), None if is_unset(fabricante) else fabricante.strip().lower())
+    parts = [str(v) for v in filters if v is not None]
+    filename = "_".join(["distribuicao", *parts]) + f".{formato}"
+    return StreamingResponse(
+        export.stream_rows(sql, params, formato),
+        media_type=export.FORMATS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
 
 
 # Healthcheck simples
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
 
-# Endpoint de diagnóstico temporário: retorna soma direta da tabela distribuicao_raw
+# Métricas no formato Prometheus (latência por endpoint, banco, pool, cache)
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    text_body = render_metrics({"async": async_engine.pool, "sync": engine.pool}, response_cache.stats())
+    text_body += render_metrics_lines() + export.render_metrics_lines() + singleflight.render_metrics_lines()
+    text_body += admission.render_metrics_lines()
+    return PlainTextResponse(text_body, media_type="text/plain; version=0.0.4")
+
+
+# Contadores do cache de respostas (para dimensionar CACHE_MAX_ENTRIES/TTL)
+@app.get("/debug/cache")
+async def debug_cache():
+    return {
+        "data": {
+            **response_cache.stats(),
+            "data_version": data_version.current_cached(),
+            "columnar": columnar_engine.stats(),
+            "last_good": last_good.stats(),
+            "circuit_breaker": breaker.stats(),
+            "single_flight": inflight.stats(),
+            "admission": admission_control.stats(),
+        },
+        "success": True,
+    }
+
+
+# Layout de colunas de distribuicao_raw resolvido via information_schema.
+# `refresh=1` resolve de novo (ex.: após um reload manual da tabela).
+@app.get("/debug/schema")
+async def debug_schema(refresh: Optional[int] = Query(0), db: AsyncSession = Depends(get_async_db)):
+    try:
+        column_map = current_column_map()
+        if refresh or column_map is None:
+            column_map = await db.run_sync(lambda session: refresh_column_map(session))
+        return {"data": column_map.as_dict(), "success": True}
+    except Exception as e:
+        return {"data": None, "success": False, "message": str(e)}
+
+
+# Endpoint de diagnóstico temporário: retorna a soma de QTDE (via rollup de distribuicao_raw)
 @app.get("/debug/distrib_total")
-def debug_distrib_total(ano: Optional[str] = Query(None), mes: Optional[str] = Query(None), db: Session = Depends(get_db)):
+async def debug_distrib_total(ano: Optional[str] = Query(None), mes: Optional[str] = Query(None), db: AsyncSession = Depends(get_async_db)):
     try:
-        ano_int = parse_int(ano)
-        mes_int = parse_int(mes)
-        where = []
-        params = {}
-        if ano_int is not None:
-            where.append('"ANO" = :ano')
-            params['ano'] = ano_int
-        if mes_int is not None:
-            where.append('"MES" = :mes')
-            params['mes'] = mes_int
-
-        sql = 'SELECT COALESCE(SUM("QTDE"),0) AS total FROM public.distribuicao_raw'
-        if where:
-            sql = f"{sql} WHERE {' AND '.join(where)}"
-
-        r = db.execute(text(sql), params).first()
+        where, params = rollup_where(parse_int(ano), parse_int(mes))
+        sql = with_where(f'SELECT COALESCE(SUM(qtde),0) AS total FROM {ROLLUP_TABLE}', where)
+
+        r = (await db.execute(text(sql), params)).first()
         total = int(r.total) if r and getattr(r, 'total', None) is not None else 0
         return {"data": {"total": total}, "success": True}
     except Exception as e:
@@ -351,25 +728,15 @@ def debug_distrib_total(ano: Optional[str] = Query(None), mes: Optional[str] = Q
 
 
 @app.get("/debug/distrib_series")
-def debug_distrib_series(ano: Optional[str] = Query(None), db: Session = Depends(get_db)):
-    """Retorna série agregada por ano/mes diretamente do banco (debug)."""
+async def debug_distrib_series(ano: Optional[str] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Retorna série agregada por ano/mes a partir do rollup (debug)."""
     try:
-        ano_int = parse_int(ano)
-        params = {}
-        where = []
-        if ano_int is not None:
-            where.append('"ANO" = :ano')
-            params['ano'] = ano_int
-
-        sql = 'SELECT "ANO" AS ano, "MES" AS mes, SUM(CAST("QTDE" AS numeric)) AS total FROM public.distribuicao_raw'
-        if where:
-            sql = f"{sql} WHERE {' AND '.join(where)}"
-        sql = f"{sql} GROUP BY \"ANO\", \"MES\" ORDER BY \"ANO\", \"MES\""
-
-        rows = db.execute(text(sql), params).all()
+        where, params = rollup_where(parse_int(ano), None)
+        sql = with_where(f'SELECT ano, mes, SUM(qtde) AS total FROM {ROLLUP_TABLE}', where)
+        sql = f"{sql} GROUP BY ano, mes ORDER BY ano, mes"
+
+        rows = (await db.execute(text(sql), params)).all()
         data = [ { 'ano': int(r.ano), 'mês': int(r.mes), 'total': int(r.total) } for r in rows ]
         return { 'data': data, 'success': True }
     except Exception as e:
         return { 'data': [], 'success': True, 'message': str(e) }
-
-
@@ -0,0 +1,305 @@
+"""Instrumentação por requisição e métricas no formato Prometheus.
+
+- Hooks de cursor do SQLAlchemy (`instrument_engine`) somam, por requisição,
+  tempo de banco, número de consultas e linhas retornadas, e guardam as
+  últimas consultas (SQL + parâmetros do driver) para o `debug=explain`.
+- `MetricsMiddleware` (ASGI puro) abre as estatísticas da requisição num
+  ContextVar, responde com `Server-Timing` (db, ser, total) e alimenta os
+  histogramas por endpoint.
+- `timed_pool` envolve a classe de pool do engine para medir a espera no
+  checkout de conexões.
+- `render_metrics` gera o texto servido em `/metrics`.
+
+O ContextVar é herdado pelas tarefas de `asyncio.gather` e pelo greenlet do
+SQLAlchemy async, então consultas paralelas de uma requisição somam no mesmo
+registro (o tempo de banco é a soma dos tempos das consultas, mesmo quando
+elas se sobrepõem).
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Consultas guardadas por requisição para o `debug=explain`
+MAX_RECORDED_STATEMENTS = 20
+
+
+class Histogram:
+    """Histograma cumulativo (semântica do Prometheus), com rótulos."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            base = _labels(self.label_names, labels)
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, ("le", repr(bound)))} {c}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, ("le", "+Inf"))} {count}')
+            lines.append(f"{self.name}_sum{base} {total:.6f}")
+            lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.label_names, labels)} {_number(v)}" for labels, v in items)
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Latência das requisições por endpoint.", ("endpoint", "method"), LATENCY_BUCKETS
+)
+REQUESTS = Counter("http_requests_total", "Requisições por endpoint e status.", ("endpoint", "method", "status"))
+REQUEST_DB_SECONDS = Counter("http_request_db_seconds_total", "Tempo de banco somado por endpoint.", ("endpoint",))
+REQUEST_QUERIES = Counter("http_request_db_queries_total", "Consultas executadas por endpoint.", ("endpoint",))
+REQUEST_ROWS = Counter("http_request_db_rows_total", "Linhas retornadas pelo banco por endpoint.", ("endpoint",))
+QUERY_SECONDS = Histogram("db_query_duration_seconds", "Duração de cada consulta.", ("engine",), LATENCY_BUCKETS)
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Espera por uma conexão do pool (inclui abrir conexão nova).",
+    ("pool",), POOL_WAIT_BUCKETS,
+)
+
+
+# ====== Estatísticas por requisição ======
+
+class RecordedStatement:
+    __slots__ = ("sql", "params", "duration", "rows")
+
+    def __init__(self, sql: str, params: Any, duration: float, rows: int):
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.rows = rows
+
+
+class RequestStats:
+    __slots__ = ("started", "db_seconds", "queries", "rows", "ser_seconds", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.ser_seconds = 0.0
+        self.statements: List[RecordedStatement] = []
+
+    def server_timing(self) -> str:
+        total = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} consultas, {self.rows} linhas", '
+            f"ser;dur={self.ser_seconds * 1000:.2f}, total;dur={total:.2f}"
+        )
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record_serialization(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.ser_seconds += seconds
+
+
+def instrument_engine(sync_engine, name: str) -> None:
+    """Registra os hooks de cursor no engine (para o async, passar `.sync_engine`)."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        elapsed = time.perf_counter() - started
+        QUERY_SECONDS.observe(elapsed, name)
+        stats = _current.get()
+        if stats is None:
+            return
+        rows = max(getattr(cursor, "rowcount", 0) or 0, 0)
+        stats.db_seconds += elapsed
+        stats.queries += 1
+        stats.rows += rows
+        if len(stats.statements) < MAX_RECORDED_STATEMENTS and not executemany:
+            stats.statements.append(RecordedStatement(statement, parameters, elapsed, rows))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # Consulta que falhou não chega ao after_cursor_execute
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+def timed_pool(pool_class, name: str):
+    """Subclasse de `pool_class` que mede a espera em cada checkout."""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                POOL_WAIT_SECONDS.observe(time.perf_counter() - started, name)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+# ====== Middleware ======
+
+class MetricsMiddleware:
+    """Abre as estatísticas da requisição, adiciona `Server-Timing` e
+    registra latência e contadores por endpoint (rota do FastAPI, não a URL
+    com parâmetros, para não explodir a cardinalidade)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "outros"
+            method = scope.get("method", "GET")
+            REQUEST_SECONDS.observe(time.perf_counter() - stats.started, endpoint, method)
+            REQUESTS.inc(1, endpoint, method, str(status[0]))
+            if stats.queries:
+                REQUEST_DB_SECONDS.inc(stats.db_seconds, endpoint)
+                REQUEST_QUERIES.inc(stats.queries, endpoint)
+                REQUEST_ROWS.inc(stats.rows, endpoint)
+
+
+# ====== EXPLAIN das consultas da requisição ======
+
+async def explain_recorded(db, skip: Iterable[str] = ("public.data_version",)) -> List[Dict[str, Any]]:
+    """Reexecuta com `EXPLAIN (ANALYZE, BUFFERS)` as consultas SELECT que a
+    requisição atual rodou, com os mesmos parâmetros do driver."""
+    stats = _current.get()
+    if stats is None:
+        return []
+    statements = [
+        s for s in list(stats.statements)
+        if s.sql.lstrip().upper().startswith("SELECT") and not any(name in s.sql for name in skip)
+    ]
+    conn = await db.connection()
+    plans = []
+    for s in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {s.sql}", s.params)
+        plan = result.scalar()
+        plans.append({
+            "sql": s.sql,
+            "params": list(s.params) if isinstance(s.params, (list, tuple)) else s.params,
+            "duration_ms": round(s.duration * 1000, 3),
+            "rows": s.rows,
+            "plan": plan,
+        })
+    return plans
+
+
+# ====== /metrics ======
+
+def _gauge(name: str, help_text: str, label_name: str, values: Dict[str, float]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines.extend(f'{name}{{{label_name}="{_escape(k)}"}} {_number(v)}' for k, v in sorted(values.items()))
+    return lines
+
+
+def render_metrics(pools: Dict[str, Any], cache_stats: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for metric in (REQUEST_SECONDS, REQUESTS, REQUEST_DB_SECONDS, REQUEST_QUERIES, REQUEST_ROWS,
+                   QUERY_SECONDS, POOL_WAIT_SECONDS):
+        lines.extend(metric.render())
+
+    lines.extend(_gauge("db_pool_size", "Tamanho configurado do pool.", "pool",
+                        {name: pool.size() for name, pool in pools.items()}))
+    lines.extend(_gauge("db_pool_checked_out", "Conexões em uso.", "pool",
+                        {name: pool.checkedout() for name, pool in pools.items()}))
+    lines.extend(_gauge("db_pool_overflow", "Conexões além do pool_size.", "pool",
+                        {name: max(pool.overflow(), 0) for name, pool in pools.items()}))
+
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        name = f"response_cache_{key}_total"
+        lines += [f"# HELP {name} Cache de respostas: {key}.", f"# TYPE {name} counter", f"{name} {cache_stats[key]}"]
+    lines += ["# HELP response_cache_entries Entradas no cache de respostas.",
+              "# TYPE response_cache_entries gauge", f"response_cache_entries {cache_stats['entries']}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,239 @@
+"""Migração de `public.distribuicao_raw` para tabela tipada e particionada por ANO.
+
+Depois da migração:
+
+- ANO e MES são `integer` e QTDE é `bigint` (as agregações deixam de fazer
+  CAST por linha — ver `ColumnMap.qtde_expr`);
+- a tabela é particionada por faixa de ANO (uma partição por ano, mais uma
+  DEFAULT para ANO nulo), então filtros por ano só leem a partição do ano;
+- existe um índice (ANO, MES, SIGLA) INCLUDE (QTDE) em todas as partições,
+  permitindo index-only scans nas agregações por mês.
+
+Uso (a partir de `back-end/`):
+
+    python -m app.partitioning              # migra (no-op se já particionada)
+    python -m app.partitioning --verificar  # confere via EXPLAIN o pruning
+"""
+import argparse
+import json
+import sys
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .database import engine
+from .schema import RAW_SCHEMA, RAW_TABLE, quote_ident, refresh_column_map
+
+
+RAW = f"{RAW_SCHEMA}.{RAW_TABLE}"
+LEGACY_TABLE = f"{RAW_TABLE}_legado"
+DEFAULT_PARTITION = f"{RAW_TABLE}_default"
+INDEX_NAME = f"ix_{RAW_TABLE}_ano_mes_sigla"
+
+# Tipo final de cada coluna lógica
+TYPED_COLUMNS = {"ano": "integer", "mes": "integer", "qtde": "bigint"}
+
+
+def partition_name(ano: int) -> str:
+    return f"{RAW_TABLE}_{int(ano)}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    r = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)) AS ok"
+    ), {"name": RAW}).first()
+    return bool(r.ok)
+
+
+def _column_types(conn: Connection, table: str) -> List[tuple]:
+    return conn.execute(text(
+        "SELECT a.attname AS name, format_type(a.atttypid, a.atttypmod) AS type "
+        "FROM pg_attribute a WHERE a.attrelid = to_regclass(:name) AND a.attnum > 0 "
+        "AND NOT a.attisdropped ORDER BY a.attnum"
+    ), {"name": table}).all()
+
+
+def create_partitioned_table(conn: Connection, table: str, columns: List[tuple], ano_column: str) -> None:
+    """Cria a tabela pai (PARTITION BY RANGE no ano), a partição DEFAULT e o
+    índice de cobertura."""
+    cols = ", ".join(f"{quote_ident(name)} {sql_type}" for name, sql_type in columns)
+    conn.execute(text(
+        f"CREATE TABLE {RAW_SCHEMA}.{quote_ident(table)} ({cols}) PARTITION BY RANGE ({quote_ident(ano_column)})"
+    ))
+    conn.execute(text(
+        f"CREATE TABLE {RAW_SCHEMA}.{quote_ident(DEFAULT_PARTITION)} "
+        f"PARTITION OF {RAW_SCHEMA}.{quote_ident(table)} DEFAULT"
+    ))
+
+
+def create_covering_index(conn: Connection) -> None:
+    column_map = refresh_column_map(conn)
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {RAW} "
+        f"({column_map.col('ano')}, {column_map.col('mes')}, {column_map.col('sigla')}) "
+        f"INCLUDE ({column_map.col('qtde')})"
+    ))
+
+
+def existing_partitions(conn: Connection) -> Set[str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name)"
+    ), {"name": RAW}).all()
+    return {r.relname for r in rows}
+
+
+def ensure_year_partitions(conn: Connection, anos: Iterable[int]) -> List[int]:
+    """Cria as partições anuais que faltarem; retorna os anos criados.
+
+    Linhas desses anos que tenham caído na partição DEFAULT são movidas para a
+    nova partição antes do ATTACH (que, caso contrário, falharia).
+    """
+    if not is_partitioned(conn):
+        return []
+    column_map = refresh_column_map(conn)
+    ano_col = column_map.col("ano")
+    present = existing_partitions(conn)
+    created = []
+    for ano in sorted({int(a) for a in anos if a is not None}):
+        name = partition_name(ano)
+        if name in present:
+            continue
+        part = f"{RAW_SCHEMA}.{quote_ident(name)}"
+        default = f"{RAW_SCHEMA}.{quote_ident(DEFAULT_PARTITION)}"
+        conn.execute(text(f"CREATE TABLE {part} (LIKE {RAW} INCLUDING DEFAULTS)"))
+        conn.execute(text(f"INSERT INTO {part} SELECT * FROM {default} WHERE {ano_col} = :ano"), {"ano": ano})
+        conn.execute(text(f"DELETE FROM {default} WHERE {ano_col} = :ano"), {"ano": ano})
+        conn.execute(text(
+            f"ALTER TABLE {RAW} ATTACH PARTITION {part} FOR VALUES FROM ({ano}) TO ({ano + 1})"
+        ))
+        created.append(ano)
+    return created
+
+
+def migrate(conn: Connection) -> bool:
+    """Converte a tabela bruta numa tabela tipada e particionada.
+
+    A tabela original é preservada como `distribuicao_raw_legado` (apague-a
+    manualmente após conferir a migração). Retorna False se a tabela já
+    estava particionada.
+    """
+    if is_partitioned(conn):
+        create_covering_index(conn)
+        return False
+
+    column_map = refresh_column_map(conn)
+    typed = {column_map.columns[logical]: sql_type for logical, sql_type in TYPED_COLUMNS.items()}
+    columns = [(r.name, typed.get(r.name, r.type)) for r in _column_types(conn, RAW)]
+    new_table = f"{RAW_TABLE}_novo"
+
+    create_partitioned_table(conn, new_table, columns, column_map.columns["ano"])
+
+    anos = [r.ano for r in conn.execute(text(
+        f"SELECT DISTINCT CAST(NULLIF(trim(CAST({column_map.col('ano')} AS text)), '') AS numeric)::integer AS ano "
+        f"FROM {RAW}"
+    )) if r.ano is not None]
+
+    conn.execute(text(f"ALTER TABLE {RAW} RENAME TO {quote_ident(LEGACY_TABLE)}"))
+    conn.execute(text(f"ALTER TABLE {RAW_SCHEMA}.{quote_ident(new_table)} RENAME TO {quote_ident(RAW_TABLE)}"))
+    ensure_year_partitions(conn, anos)
+
+    select_cols = []
+    for name, sql_type in columns:
+        if name in typed:
+            select_cols.append(
+                f"CAST(NULLIF(trim(CAST({quote_ident(name)} AS text)), '') AS numeric)::{sql_type}"
+            )
+        else:
+            select_cols.append(quote_ident(name))
+    conn.execute(text(
+        f"INSERT INTO {RAW} ({', '.join(quote_ident(n) for n, _ in columns)}) "
+        f"SELECT {', '.join(select_cols)} FROM {RAW_SCHEMA}.{quote_ident(LEGACY_TABLE)}"
+    ))
+    create_covering_index(conn)
+    return True
+
+
+def vacuum_analyze() -> None:
+    """VACUUM ANALYZE fora de transação: atualiza estatísticas e o visibility
+    map (necessário para index-only scans)."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM ANALYZE {RAW}"))
+
+
+def _scanned_relations(plan: Dict) -> List[str]:
+    found = []
+    if "Relation Name" in plan:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_scanned_relations(child))
+    return found
+
+
+def _node_types(plan: Dict) -> List[str]:
+    types = [plan.get("Node Type")]
+    for child in plan.get("Plans", []):
+        types.extend(_node_types(child))
+    return types
+
+
+def verify_pruning(conn: Connection) -> List[str]:
+    """EXPLAIN de uma agregação por ano/mês; retorna a lista de problemas
+    (vazia quando só a partição do ano é lida)."""
+    problems = []
+    if not is_partitioned(conn):
+        return [f"{RAW} não está particionada."]
+    column_map = refresh_column_map(conn)
+    r = conn.execute(text(
+        f"SELECT {column_map.col('ano')} AS ano, {column_map.col('mes')} AS mes FROM {RAW} "
+        f"WHERE {column_map.col('ano')} IS NOT NULL LIMIT 1"
+    )).first()
+    if r is None:
+        return ["Tabela vazia: nada para verificar."]
+
+    sql = (
+        f"SELECT SUM({column_map.qtde_expr()}) FROM {RAW} "
+        f"WHERE {column_map.col('ano')} = {int(r.ano)} AND {column_map.col('mes')} = {int(r.mes)}"
+    )
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    relations = set(_scanned_relations(root))
+    expected = {partition_name(r.ano)}
+    if relations != expected:
+        problems.append(f"Esperava ler apenas {sorted(expected)}, o plano lê {sorted(relations)}.")
+    if "CAST" in sql:
+        problems.append("QTDE ainda não é numérica: a agregação faz CAST por linha.")
+    print(f"EXPLAIN {sql}\n  partições lidas: {sorted(relations)}; nós: {', '.join(t for t in _node_types(root) if t)}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Migra distribuicao_raw para tabela tipada e particionada por ANO.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="após migrar, confere via EXPLAIN que filtros por ano leem só uma partição")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conn:
+        migrated = migrate(conn)
+    if migrated:
+        print(f"{RAW} migrada (tabela original preservada como {RAW_SCHEMA}.{LEGACY_TABLE}).")
+    else:
+        print(f"{RAW} já estava particionada; índice de cobertura conferido.")
+    vacuum_analyze()
+
+    if args.verificar:
+        with engine.connect() as conn:
+            problems = verify_pruning(conn)
+        if problems:
+            for p in problems:
+                print("FALHOU:", p)
+            return 1
+        print("Pruning OK: a consulta lê apenas a partição do ano.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
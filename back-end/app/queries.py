@@ -0,0 +1,215 @@
+"""SQL sobre os rollups de distribuição e aplicação e formatação das respostas.
+
+Compartilhado pelos endpoints individuais (`/overview`, `/timeseries`,
+`/ranking/ufs`) e pelo `/dashboard`, que responde os três numa única
+consulta com GROUPING SETS. As chaves com acento (`distribuídas`, `mês`,
+`eficiência`) são as esperadas pelo frontend.
+
+As consultas leem a view `vacinacao_rollup` (ver app/rollup.py): as linhas
+de `distribuicao_rollup` (qtde) seguidas das de `aplicacao_rollup`
+(aplicadas, esavi), todas no grão (ano, mes, sigla, fabricante_id). Como
+toda consulta soma as medidas, cada uma conta só as linhas da sua origem.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+
+ROLLUP_TABLE = "public.vacinacao_rollup"
+APLICACAO_TABLE = "public.aplicacao_rollup"
+
+# Valores de GROUPING(ano, mes, sigla) para cada conjunto do /dashboard
+GROUPING_TOTAL = 7      # ()            -> overview
+GROUPING_ANO_MES = 1    # (ano, mes)    -> série temporal
+GROUPING_SIGLA = 6      # (sigla)       -> ranking por UF
+
+
+def rollup_where(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str] = None,
+    fabricante_id: Optional[int] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Cláusulas WHERE e parâmetros para filtrar o rollup."""
+    where = []
+    params: Dict[str, Any] = {}
+    if ano_int is not None:
+        where.append('ano = :ano')
+        params['ano'] = ano_int
+    if mes_int is not None:
+        where.append('mes = :mes')
+        params['mes'] = mes_int
+    if uf is not None:
+        where.append('sigla = :uf')
+        params['uf'] = uf
+    if fabricante_id is not None:
+        where.append('fabricante_id = :fabricante_id')
+        params['fabricante_id'] = fabricante_id
+    return where, params
+
+
+def with_where(sql: str, where: List[str]) -> str:
+    if where:
+        return f"{sql} WHERE {' AND '.join(where)}"
+    return sql
+
+
+def overview_total_sql(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    fabricante_id: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Totais do overview; como em `/overview`, a UF não filtra os totais."""
+    where, params = rollup_where(ano_int, mes_int, None, fabricante_id)
+    sql = with_where(
+        'SELECT COALESCE(SUM(qtde),0) AS total, COALESCE(SUM(aplicadas),0) AS aplicadas, '
+        f'COALESCE(SUM(esavi),0) AS esavi FROM {ROLLUP_TABLE}',
+        where,
+    )
+    return sql, params
+
+
+def timeseries_sql(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str],
+    fabricante_id: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    where, params = rollup_where(ano_int, mes_int, uf, fabricante_id)
+    sql = with_where(
+        'SELECT ano, mes, SUM(qtde) AS distribuidas, SUM(aplicadas) AS aplicadas, SUM(esavi) AS esavi '
+        f'FROM {ROLLUP_TABLE}',
+        where,
+    )
+    return f"{sql} GROUP BY ano, mes ORDER BY ano, mes", params
+
+
+def ranking_sql(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str],
+    fabricante_id: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    where, params = rollup_where(ano_int, mes_int, uf, fabricante_id)
+    # Usar alias sem acento para garantir que o driver exponha a coluna
+    sql = with_where(
+        f'SELECT sigla AS uf, SUM(qtde) AS distribuidas, SUM(aplicadas) AS aplicadas FROM {ROLLUP_TABLE}',
+        where,
+    )
+    return f"{sql} GROUP BY sigla ORDER BY SUM(qtde) DESC", params
+
+
+def _int(value) -> int:
+    return int(value) if value is not None else 0
+
+
+def eficiencia(distribuidas, aplicadas) -> float:
+    """Doses aplicadas por dose distribuída, em %, com uma casa decimal."""
+    distribuidas, aplicadas = _int(distribuidas), _int(aplicadas)
+    if distribuidas <= 0:
+        return 0.0
+    return round(aplicadas * 100.0 / distribuidas, 1)
+
+
+def overview_payload(distribuidas, aplicadas=0, esavi=0) -> Dict[str, Any]:
+    # Aplicadas e ESAVI ficam zerados enquanto `aplicacao_rollup` estiver vazio
+    return {
+        "distribuídas": _int(distribuidas),
+        "aplicadas": _int(aplicadas),
+        "eficiência": eficiencia(distribuidas, aplicadas),
+        "esavi": _int(esavi),
+    }
+
+
+def series_point(ano, mes, uf: Optional[str], distribuidas, aplicadas=0, esavi=0) -> Dict[str, Any]:
+    return {
+        "ano": int(ano) if ano is not None else 2021,
+        "mês": int(mes) if mes is not None else 0,
+        "uf": uf if uf is not None else 'BR',
+        "distribuídas": _int(distribuidas),
+        "aplicadas": _int(aplicadas),
+        "eficiência": eficiencia(distribuidas, aplicadas),
+        "esavi": _int(esavi),
+    }
+
+
+def ranking_item(uf, distribuidas, aplicadas=0) -> Dict[str, Any]:
+    return {
+        "uf": uf.strip() if uf else uf,
+        "nome": None,
+        "distribuídas": _int(distribuidas),
+        "aplicadas": _int(aplicadas),
+        "eficiência": eficiencia(distribuidas, aplicadas),
+        # Indicadores per capita só existem no snapshot dos estados (sem filtros)
+        "população": None,
+        "doses_por_100k": None,
+        "cobertura": None,
+        "posição": None,
+    }
+
+
+def snapshot_ranking_item(r) -> Dict[str, Any]:
+    return {
+        "uf": r.uf,
+        "nome": r.nome,
+        "distribuídas": r.distribuídas,
+        "aplicadas": r.aplicadas,
+        "eficiência": round(r.eficiência, 1),
+        "população": r.populacao,
+        "doses_por_100k": r.doses_por_100k,
+        "cobertura": r.cobertura,
+        "posição": r.posicao,
+    }
+
+
+def dashboard_sql(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str],
+    fabricante_id: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Uma passada sobre o rollup com os três agrupamentos do dashboard.
+
+    O total do overview considera apenas ano/mes (como `/overview`), enquanto
+    série e ranking também filtram pela UF — por isso a UF entra como
+    FILTER no agregado, e não no WHERE.
+    """
+    where, params = rollup_where(ano_int, mes_int, None, fabricante_id)
+    uf_filter = ''
+    if uf is not None:
+        uf_filter = ' FILTER (WHERE sigla = :uf)'
+        params['uf'] = uf
+    sql = with_where(
+        'SELECT ano, mes, sigla, GROUPING(ano, mes, sigla) AS grupo, '
+        'COALESCE(SUM(qtde), 0) AS total, COALESCE(SUM(aplicadas), 0) AS aplicadas, '
+        'COALESCE(SUM(esavi), 0) AS esavi, '
+        f'SUM(qtde){uf_filter} AS total_uf, SUM(aplicadas){uf_filter} AS aplicadas_uf, '
+        f'SUM(esavi){uf_filter} AS esavi_uf '
+        f'FROM {ROLLUP_TABLE}',
+        where,
+    )
+    sql = f"{sql} GROUP BY GROUPING SETS ((), (ano, mes), (sigla))"
+    return sql, params
+
+
+def split_dashboard_rows(rows, uf: Optional[str]):
+    """Separa as linhas do GROUPING SETS em (overview, série, ranking por UF).
+
+    Reproduz a ordenação das consultas individuais: série por ano/mes
+    (NULLs por último) e ranking por distribuídas decrescente.
+    """
+    overview = overview_payload(0)
+    series_rows = []
+    ranking_rows = []
+    for r in rows:
+        if r.grupo == GROUPING_TOTAL:
+            overview = overview_payload(r.total, r.aplicadas, r.esavi)
+        elif r.grupo == GROUPING_ANO_MES and r.total_uf is not None:
+            series_rows.append(r)
+        elif r.grupo == GROUPING_SIGLA and r.total_uf is not None:
+            ranking_rows.append(r)
+
+    series_rows.sort(key=lambda r: (r.ano is None, r.ano or 0, r.mes is None, r.mes or 0))
+    ranking_rows.sort(key=lambda r: r.total_uf, reverse=True)
+
+    series = [series_point(r.ano, r.mes, uf, r.total_uf, r.aplicadas_uf, r.esavi_uf) for r in series_rows]
+    ranking = [ranking_item(r.sigla, r.total_uf, r.aplicadas_uf) for r in ranking_rows]
+    return overview, series, ranking
@@ -0,0 +1,278 @@
+"""Limites de tempo no banco, último resultado bom e circuit breaker.
+
+Quando o Postgres fica lento, os handlers seguravam uma conexão do pool sem
+limite de tempo e, se a consulta falhava, respondiam zeros com
+`success: true` — o dashboard mostrava "0 doses" em vez dos dados. Aqui:
+
+- `statement_timeout(endpoint)` marca a requisição com o limite do endpoint;
+  toda transação aberta por uma Session nesse contexto começa com
+  `SET LOCAL statement_timeout`, e `request_deadline` limita também a espera
+  por conexão do pool.
+- `LastGoodStore` guarda, por combinação de filtros, o último resultado
+  calculado com sucesso (de qualquer versão dos dados). Se o banco falhar ou
+  estourar o tempo, ele é servido marcado como `stale` e recalculado em
+  segundo plano; sem resultado guardado, a resposta é 503 com
+  `success: false`.
+- `CircuitBreaker`: depois de `BREAKER_FAILURES` falhas seguidas de banco,
+  as requisições deixam de ir ao pool por `BREAKER_RESET_SECONDS` (servem o
+  último resultado ou 503); então uma requisição de teste decide se o
+  circuito fecha de novo.
+
+Ajustes opcionais por variável de ambiente:
+
+    STATEMENT_TIMEOUT_MS    (default 3000; 0 desliga) — limite padrão
+    STATEMENT_TIMEOUTS      limites por endpoint, ex.: "dashboard=5000,overview=2000"
+    BREAKER_FAILURES        (default 5)
+    BREAKER_RESET_SECONDS   (default 10)
+    LAST_GOOD_MAX_ENTRIES   (default 2048)
+"""
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+
+from .cache import _env_number
+from .metrics import Counter
+
+
+STATEMENT_TIMEOUT_MS = _env_number("STATEMENT_TIMEOUT_MS", 3000)
+BREAKER_FAILURES = _env_number("BREAKER_FAILURES", 5)
+BREAKER_RESET_SECONDS = _env_number("BREAKER_RESET_SECONDS", 10.0, float)
+LAST_GOOD_MAX_ENTRIES = _env_number("LAST_GOOD_MAX_ENTRIES", 2048)
+
+# Limites padrão por endpoint (ms); o /dashboard faz o trabalho dos três e o
+# /batch, o de vários conjuntos de filtros
+DEFAULT_ENDPOINT_TIMEOUTS = {"dashboard": 2 * STATEMENT_TIMEOUT_MS, "batch": 2 * STATEMENT_TIMEOUT_MS}
+
+# O recálculo em segundo plano não segura nenhuma requisição: pode esperar mais
+REFRESH_TIMEOUT_SCALE = 4.0
+
+
+def parse_endpoint_timeouts(value: Optional[str]) -> Dict[str, int]:
+    """`"dashboard=5000, overview=2000"` -> {"dashboard": 5000, "overview": 2000}."""
+    timeouts: Dict[str, int] = {}
+    for item in (value or "").split(","):
+        name, _, ms = item.partition("=")
+        try:
+            timeouts[name.strip()] = int(ms)
+        except ValueError:
+            continue
+    return timeouts
+
+
+ENDPOINT_TIMEOUTS = {**DEFAULT_ENDPOINT_TIMEOUTS, **parse_endpoint_timeouts(os.getenv("STATEMENT_TIMEOUTS"))}
+
+STALE_RESPONSES = Counter("stale_responses_total", "Respostas servidas do último resultado bom.", ("endpoint",))
+UNAVAILABLE_RESPONSES = Counter("unavailable_responses_total", "Respostas 503 sem resultado guardado.", ("endpoint",))
+BACKGROUND_REFRESHES = Counter("stale_refreshes_total", "Recálculos em segundo plano por resultado.", ("result",))
+
+
+# ====== statement_timeout ======
+
+_statement_timeout_ms: ContextVar[Optional[int]] = ContextVar("statement_timeout_ms", default=None)
+
+
+def endpoint_timeout_ms(endpoint: str) -> int:
+    return ENDPOINT_TIMEOUTS.get(endpoint, STATEMENT_TIMEOUT_MS)
+
+
+def request_deadline(endpoint: str, scale: float = 1.0) -> Optional[float]:
+    """Tempo máximo (s) de uma requisição: o limite das consultas mais uma
+    folga para a espera no pool. None quando o limite está desligado."""
+    ms = endpoint_timeout_ms(endpoint) * scale
+    return ms / 1000 + 1.0 if ms > 0 else None
+
+
+@contextlib.contextmanager
+def statement_timeout(endpoint: Optional[str], scale: float = 1.0):
+    """Aplica o limite do `endpoint` (vezes `scale`) às transações abertas
+    neste contexto (None: sem limite, ex.: recarga do motor colunar)."""
+    ms = int(endpoint_timeout_ms(endpoint) * scale) if endpoint is not None else None
+    token = _statement_timeout_ms.set(ms if ms else None)
+    try:
+        yield
+    finally:
+        _statement_timeout_ms.reset(token)
+
+
+@event.listens_for(Session, "after_begin")
+def _set_local_timeout(session, transaction, connection):
+    # O ContextVar chega ao greenlet do SQLAlchemy async (ver app/metrics.py)
+    ms = _statement_timeout_ms.get()
+    if ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(ms)}")
+
+
+# SQLSTATE de banco lento ou fora do ar: 57014 (statement_timeout), 57P*
+# (desligamento/recuperação), 08* (conexão) e 53* (recursos esgotados)
+FAILURE_SQLSTATES = ("57014", "57P", "08", "53")
+
+
+def is_database_failure(error: BaseException) -> bool:
+    """Falhas que indicam banco lento ou fora do ar (e não erro de SQL)."""
+    if isinstance(error, (asyncio.TimeoutError, exc.TimeoutError, exc.OperationalError, OSError)):
+        return True
+    if isinstance(error, exc.DBAPIError):
+        # asyncpg (via SQLAlchemy) expõe `sqlstate`; psycopg2, `pgcode`
+        code = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None) or ""
+        return error.connection_invalidated or str(code).startswith(FAILURE_SQLSTATES)
+    return False
+
+
+# ====== Circuit breaker ======
+
+class CircuitBreaker:
+    """fechado -> (N falhas seguidas) -> aberto -> (reset_seconds) ->
+    meio-aberto: uma requisição de teste fecha ou reabre o circuito."""
+
+    CLOSED, OPEN, HALF_OPEN = "fechado", "aberto", "meio-aberto"
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.max_failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> int:
+        with self._lock:
+            remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def release(self) -> None:
+        """Fim de uma requisição que não usou o banco (ex.: resposta do cache):
+        libera o teste do meio-aberto sem decidir o estado."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.max_failures:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+            }
+
+
+# ====== Último resultado bom ======
+
+class LastGoodStore:
+    """Último resultado bom por chave de filtros, independente da versão dos
+    dados (LRU limitado). Guarda o payload, não os bytes: a resposta
+    servida daqui leva a marca `stale`."""
+
+    def __init__(self, max_entries: int = LAST_GOOD_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._tasks: set = set()
+        self._lock = threading.Lock()
+
+    def set(self, key: Hashable, version: int, data: Any) -> None:
+        with self._lock:
+            self._entries[key] = (data, version, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, int, float]]:
+        """(dados, versão, gravado em — epoch) ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def refresh_in_background(self, key: Hashable, refresh: Callable[[], Awaitable[None]]) -> bool:
+        """Agenda `refresh` se ainda não houver um recálculo da mesma chave."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        async def run():
+            try:
+                await refresh()
+                BACKGROUND_REFRESHES.inc(1, "ok")
+            except Exception:
+                BACKGROUND_REFRESHES.inc(1, "falha")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # Referência forte até o fim: o loop só guarda referências fracas das tarefas
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "refreshing": len(self._refreshing)}
+
+
+breaker = CircuitBreaker()
+last_good = LastGoodStore()
+
+
+def render_metrics_lines() -> str:
+    """Linhas do /metrics com os contadores deste módulo e o estado do circuito."""
+    lines = []
+    for metric in (STALE_RESPONSES, UNAVAILABLE_RESPONSES, BACKGROUND_REFRESHES):
+        lines.extend(metric.render())
+    stats = breaker.stats()
+    lines += [
+        "# HELP db_circuit_open Circuit breaker do banco aberto (1) ou não (0).",
+        "# TYPE db_circuit_open gauge",
+        f"db_circuit_open {int(stats['state'] != CircuitBreaker.CLOSED)}",
+        "# HELP db_circuit_opens_total Vezes que o circuito abriu.",
+        "# TYPE db_circuit_opens_total counter",
+        f"db_circuit_opens_total {stats['opens']}",
+        "# HELP db_circuit_rejected_total Requisições que não foram ao banco com o circuito aberto.",
+        "# TYPE db_circuit_rejected_total counter",
+        f"db_circuit_rejected_total {stats['rejected']}",
+    ]
+    return "\n".join(lines) + "\n"
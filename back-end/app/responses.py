@@ -0,0 +1,248 @@
+"""Caminho rápido de serialização das respostas do dashboard.
+
+Os endpoints devolviam dicts que o FastAPI revalidava em `ApiResponse`/
+`ApiListResponse` (pydantic, `Dict[str, Any]`) antes de gerar o JSON. Aqui o
+corpo é codificado uma única vez — com orjson, se instalado — e guardado no
+cache já em bytes (e em gzip, quando grande), junto de um ETag forte derivado
+da versão dos dados e dos filtros. Quando há versão em gzip, cada codificação
+tem o seu ETag (sufixos `-gz` e `-id`), como pede um validador forte.
+Requisições com `If-None-Match` igual recebem 304 sem corpo.
+
+Ajuste opcional por variável de ambiente:
+
+    GZIP_MIN_BYTES   (default 1024) — corpos menores não são comprimidos
+
+Uso (a partir de `back-end/`):
+
+    python -m app.responses --benchmark   # antes/depois por payload
+"""
+import argparse
+import decimal
+import gzip
+import hashlib
+import json
+import sys
+import time
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from .cache import _env_number
+from .metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: cai no json da biblioteca padrão
+    orjson = None
+
+
+GZIP_MIN_BYTES = _env_number("GZIP_MIN_BYTES", 1024)
+GZIP_LEVEL = 6
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if hasattr(value, "item"):  # escalares NumPy
+        return value.item()
+    if hasattr(value, "isoformat"):  # datas das linhas brutas (/export) sem orjson
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def encode_json(payload: Any) -> bytes:
+    """JSON compacto em UTF-8 (acentos preservados, como no JSONResponse)."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(
+        payload, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def make_etag(key: Hashable, version: int) -> str:
+    """ETag forte: muda quando a versão dos dados ou os filtros mudam."""
+    digest = hashlib.sha1(repr((version, key)).encode("utf-8")).hexdigest()[:20]
+    return f'"v{version}-{digest}"'
+
+
+def coding_etag(etag: str, coding: str) -> str:
+    """ETag de uma codificação do corpo: `"v6-abc"` -> `"v6-abc-gz"`."""
+    return f'{etag[:-1]}-{coding}"'
+
+
+def gzip_accepted(accept_encoding: str) -> bool:
+    """`Accept-Encoding` aceita gzip? `gzip;q=0` é recusa explícita, mesmo
+    com `*`; sem menção a gzip, vale o q de `*` (se houver)."""
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def accepts_gzip(request: Request) -> bool:
+    return gzip_accepted(request.headers.get("accept-encoding", ""))
+
+
+def matching_etag(request: Request, etag: str) -> Optional[str]:
+    """ETag (de `make_etag` ou de uma das codificações) que o cliente enviou
+    em `If-None-Match` e ainda vale, ou None. A cópia em gzip só vale para
+    quem ainda aceita gzip."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # Proxies que comprimem costumam enfraquecer o ETag (W/"..."); aceitar ambos
+    candidates = {c.strip()[2:] if c.strip().startswith("W/") else c.strip() for c in header.split(",")}
+    if "*" in candidates:
+        return etag
+    variants = [etag, coding_etag(etag, "id")]
+    if accepts_gzip(request):
+        variants.append(coding_etag(etag, "gz"))
+    return next((v for v in variants if v in candidates), None)
+
+
+class EncodedBody:
+    """Resposta já codificada, reutilizada enquanto estiver no cache."""
+
+    __slots__ = ("body", "gzip_body", "etag")
+
+    def __init__(self, payload: Dict[str, Any], etag: Optional[str] = None):
+        started = time.perf_counter()
+        self.body = encode_json(payload)
+        self.etag = etag
+        self.gzip_body = gzip.compress(self.body, GZIP_LEVEL) if len(self.body) >= GZIP_MIN_BYTES else None
+        record_serialization(time.perf_counter() - started)
+
+    def response(self, request: Optional[Request] = None) -> Response:
+        headers = {}
+        body, coding = self.body, "id"
+        if self.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+            if request is not None and accepts_gzip(request):
+                body, coding = self.gzip_body, "gz"
+                headers["Content-Encoding"] = "gzip"
+        if self.etag is not None:
+            headers["ETag"] = self.etag if self.gzip_body is None else coding_etag(self.etag, coding)
+            # Sempre revalidar: o ETag troca assim que os dados mudam
+            headers["Cache-Control"] = "no-cache"
+        return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def not_modified(etag: str, vary: bool = False) -> Response:
+    """304 com os mesmos validadores do 200 correspondente (`vary` quando o
+    corpo tem versão em gzip)."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if vary:
+        headers["Vary"] = "Accept-Encoding"
+    return Response(status_code=304, headers=headers)
+
+
+def envelope(data: Any) -> Dict[str, Any]:
+    """Envelope de `ApiResponse`/`ApiListResponse` (mesmas chaves do modelo)."""
+    return {"data": data, "success": True, "message": None}
+
+
+def encoded_response(
+    data: Any,
+    key: Hashable,
+    version: int,
+) -> EncodedBody:
+    """Envelope de `ApiResponse`/`ApiListResponse` codificado, com ETag."""
+    return EncodedBody(envelope(data), make_etag(key, version))
+
+
+def plain_response(
+    payload: Dict[str, Any],
+    request: Optional[Request] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """JSON sem ETag e sem passar pelo response_model (que descartaria chaves
+    extras como `debug`)."""
+    response = EncodedBody(payload).response(request)
+    response.status_code = status_code
+    if headers:
+        response.headers.update(headers)
+    return response
+
+
+# ====== Benchmark ======
+
+def _sample_payloads() -> Dict[str, Any]:
+    from .queries import overview_payload, ranking_item, series_point
+
+    siglas = [
+        "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+        "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+    ]
+    return {
+        "overview": overview_payload(123456789),
+        "timeseries": [series_point(ano, mes, None, 1000 * ano + mes) for ano in range(2021, 2025) for mes in range(1, 13)],
+        "ranking": [ranking_item(s, 1000000 - i) for i, s in enumerate(siglas)],
+    }
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def benchmark(repeat: int = 2000) -> None:
+    """Compara, por payload, o caminho antigo (pydantic + jsonable_encoder +
+    JSONResponse), a codificação direta e a reutilização dos bytes em cache."""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from .main import ApiListResponse, ApiResponse
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'json (stdlib)'}")
+    print(f"{'payload':<12}{'bytes':>8}{'gzip':>8}{'antes (us)':>14}{'encode (us)':>14}{'cache (us)':>13}")
+    for name, data in _sample_payloads().items():
+        model = ApiListResponse if isinstance(data, list) else ApiResponse
+        payload = {"data": data, "success": True, "message": None}
+
+        def before():
+            validated = model(**payload)
+            return JSONResponse(jsonable_encoder(validated)).body
+
+        def after():
+            return EncodedBody(payload, '"x"').response()
+
+        cached = EncodedBody(payload, '"x"')
+        assert json.loads(before()) == json.loads(cached.body)
+        print(
+            f"{name:<12}{len(cached.body):>8}{len(cached.gzip_body or b''):>8}"
+            f"{_per_call_us(before, repeat):>14.1f}{_per_call_us(after, repeat):>14.1f}"
+            f"{_per_call_us(cached.response, repeat):>13.1f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serialização rápida das respostas do dashboard.")
+    parser.add_argument("--benchmark", action="store_true", help="mede antes/depois por payload")
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark(args.repeticoes)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Manutenção do rollup (ANO, MES, SIGLA, FABRICANTE_ID) de `public.distribuicao_raw`.
+
+Os endpoints do dashboard respondem a partir de `public.distribuicao_rollup`,
+que tem no máximo anos × 12 meses × 27 UFs × fabricantes linhas, em vez de somar a tabela
+bruta inteira a cada requisição. Este módulo recalcula o rollup e confere a
+paridade com a SQL original sobre a tabela bruta.
+
+Uso (a partir de `back-end/`):
+
+    python -m app.rollup              # recalcula o rollup
+    python -m app.rollup --verificar  # recalcula e confere paridade
+"""
+import argparse
+import sys
+from typing import Iterable, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import engine, AplicacaoRollup, DistribuicaoRollup, DataVersion, Fabricante
+from .estados import ensure_estado_tables, refresh_estado_snapshot
+from .fabricantes import prepare_dimension
+from .schema import ColumnMap, refresh_column_map
+
+
+def create_rollup_table(bind: Engine = engine) -> bool:
+    """Cria o rollup (e tabelas auxiliares e a view lida pelos endpoints) se
+    faltar. Rollups criados antes da dimensão de fabricantes ganham a coluna
+    `fabricante_id`; retorna True nesse caso, pois o conteúdo precisa ser
+    recalculado."""
+    Fabricante.__table__.create(bind=bind, checkfirst=True)
+    DistribuicaoRollup.__table__.create(bind=bind, checkfirst=True)
+    AplicacaoRollup.__table__.create(bind=bind, checkfirst=True)
+    DataVersion.__table__.create(bind=bind, checkfirst=True)
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            return _prepare(conn)
+    return _prepare(bind)
+
+
+def _prepare(conn: Connection) -> bool:
+    added_column = _add_fabricante_column(conn)
+    create_rollup_view(conn)
+    return added_column
+
+
+def create_rollup_view(conn: Connection) -> None:
+    """(Re)cria `vacinacao_rollup`: distribuição e aplicação no mesmo grão,
+    com zero nas medidas que não vêm de cada tabela."""
+    conn.execute(text(
+        "CREATE OR REPLACE VIEW public.vacinacao_rollup AS "
+        "SELECT ano, mes, sigla, fabricante_id, qtde, "
+        "CAST(0 AS bigint) AS aplicadas, CAST(0 AS bigint) AS esavi FROM public.distribuicao_rollup "
+        "UNION ALL "
+        "SELECT ano, mes, sigla, fabricante_id, CAST(0 AS numeric), aplicadas, esavi FROM public.aplicacao_rollup"
+    ))
+
+
+def ensure_rollup_view(conn: Connection) -> None:
+    """Cria `vacinacao_rollup` (e `aplicacao_rollup`, que ela lê) só se
+    faltar: recriar a view a cada recálculo a travaria para os leitores até o
+    commit."""
+    exists = conn.execute(text("SELECT to_regclass('public.vacinacao_rollup') IS NOT NULL AS ok")).first().ok
+    if not exists:
+        AplicacaoRollup.__table__.create(bind=conn, checkfirst=True)
+        create_rollup_view(conn)
+
+
+def _add_fabricante_column(conn: Connection) -> bool:
+    missing = conn.execute(text(
+        "SELECT NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_schema = 'public' "
+        "AND table_name = 'distribuicao_rollup' AND column_name = 'fabricante_id') AS missing"
+    )).first().missing
+    if missing:
+        conn.execute(text("ALTER TABLE public.distribuicao_rollup ADD COLUMN fabricante_id smallint"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_distribuicao_rollup_fabricante "
+            "ON public.distribuicao_rollup (fabricante_id, ano, mes)"
+        ))
+    return bool(missing)
+
+
+def bump_data_version(conn: Connection) -> int:
+    """Incrementa a versão dos dados na transação de `conn` e a retorna."""
+    r = conn.execute(text(
+        "INSERT INTO public.data_version (id, versao, atualizado_em) VALUES (1, 1, now()) "
+        "ON CONFLICT (id) DO UPDATE SET versao = data_version.versao + 1, atualizado_em = now() "
+        "RETURNING versao"
+    )).first()
+    return int(r.versao)
+
+
+def fabricante_expr(column_map: ColumnMap) -> str:
+    # Tabelas brutas ainda sem FABRICANTE_ID (ver app/fabricantes.py) agregam como NULL
+    if column_map.has("fabricante_id"):
+        return column_map.col("fabricante_id")
+    return "CAST(NULL AS smallint)"
+
+
+def raw_aggregate_sql(column_map: ColumnMap, where: str = "") -> str:
+    """Agregação da tabela bruta no grão do rollup, montada a partir do
+    layout de colunas resolvido em `app.schema`."""
+    ano, mes, sigla = column_map.col("ano"), column_map.col("mes"), column_map.col("sigla")
+    fabricante = fabricante_expr(column_map)
+    return (
+        f"SELECT {ano} AS ano, {mes} AS mes, {sigla} AS sigla, {fabricante} AS fabricante_id, "
+        f"SUM({column_map.qtde_expr()}) AS qtde "
+        f"FROM {column_map.table} {where} GROUP BY 1, 2, 3, 4"
+    )
+
+
+def refresh_rollup(conn: Connection) -> int:
+    """Recalcula o rollup dentro da transação de `conn`.
+
+    Usa DELETE + INSERT (e não TRUNCATE) para que leitores concorrentes
+    continuem vendo a versão anterior até o commit, e incrementa
+    `data_version` para invalidar caches. O layout de colunas da tabela bruta
+    é resolvido de novo, já que um reload pode tê-lo alterado. O snapshot dos
+    estados, lido da view `vacinacao_rollup` (criada aqui se faltar), é
+    recalculado na mesma transação. Retorna o número de linhas gravadas.
+    """
+    ensure_rollup_view(conn)
+    source_sql = raw_aggregate_sql(refresh_column_map(conn))
+    conn.execute(text("DELETE FROM public.distribuicao_rollup"))
+    result = conn.execute(text(
+        f"INSERT INTO public.distribuicao_rollup (ano, mes, sigla, fabricante_id, qtde) "
+        f"SELECT ano, mes, sigla, fabricante_id, COALESCE(qtde, 0) FROM ({source_sql}) AS agg"
+    ))
+    refresh_estado_snapshot(conn)
+    bump_data_version(conn)
+    return result.rowcount
+
+
+def refresh_rollup_periods(conn: Connection, periods: Iterable[Tuple[int, int]]) -> int:
+    """Recalcula apenas os meses `(ano, mes)` informados.
+
+    Usado após carregar ou recarregar alguns meses de `distribuicao_raw`,
+    sem reagregar a tabela inteira. Também atualiza o snapshot dos estados
+    (só as UFs que mudaram) e incrementa `data_version`. Retorna o número de
+    linhas gravadas.
+    """
+    periods = sorted(set(periods))
+    if not periods:
+        return 0
+    ensure_rollup_view(conn)
+    column_map = refresh_column_map(conn)
+    ano, mes = column_map.col("ano"), column_map.col("mes")
+    values = ", ".join(f"({int(a)}, {int(m)})" for a, m in periods)
+    conn.execute(text(
+        f"DELETE FROM public.distribuicao_rollup WHERE (ano, mes) IN ({values})"
+    ))
+    source_sql = raw_aggregate_sql(column_map, f"WHERE ({ano}, {mes}) IN ({values})")
+    result = conn.execute(text(
+        f"INSERT INTO public.distribuicao_rollup (ano, mes, sigla, fabricante_id, qtde) "
+        f"SELECT ano, mes, sigla, fabricante_id, COALESCE(qtde, 0) FROM ({source_sql}) AS agg"
+    ))
+    refresh_estado_snapshot(conn)
+    bump_data_version(conn)
+    return result.rowcount
+
+
+def check_parity(conn: Connection) -> int:
+    """Compara o rollup com a agregação direta da tabela bruta.
+
+    Retorna o número de grupos (ano, mes, sigla, fabricante) divergentes — 0
+    quando o rollup está em dia.
+    """
+    source_sql = raw_aggregate_sql(refresh_column_map(conn))
+    raw_sql = f"SELECT ano, mes, sigla, fabricante_id, COALESCE(qtde, 0) AS qtde FROM ({source_sql}) AS agg"
+    rollup_sql = "SELECT ano, mes, sigla, fabricante_id, qtde FROM public.distribuicao_rollup"
+    r = conn.execute(text(
+        f"SELECT COUNT(*) AS n FROM ("
+        f"({raw_sql} EXCEPT ALL {rollup_sql}) UNION ALL ({rollup_sql} EXCEPT ALL {raw_sql})"
+        f") AS diff"
+    )).first()
+    return int(r.n)
+
+
+# Chave do advisory lock que serializa o preparo do rollup entre workers
+ROLLUP_LOCK_KEY = 7301001
+
+
+def ensure_rollup(bind: Engine = engine) -> None:
+    """Garante que o rollup exista e esteja populado (usado no startup).
+
+    Antes, monta a dimensão de fabricantes (app/fabricantes.py) numa base
+    que ainda não a tem, como um dump restaurado: sem ela, todo filtro
+    `fabricante` responderia vazio. Com vários workers o startup roda em
+    paralelo; o advisory lock faz o primeiro preparar tudo e os demais só
+    conferirem depois.
+    """
+    with bind.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY})
+        backfilled = prepare_dimension(conn)
+        added_column = create_rollup_table(conn)
+        empty = conn.execute(text("SELECT 1 FROM public.distribuicao_rollup LIMIT 1")).first() is None
+        if empty or added_column or backfilled:
+            refresh_rollup(conn)
+            return
+        # Snapshot dos estados anterior à população/posição: recalcular uma vez
+        changed = ensure_estado_tables(conn)
+        unranked = conn.execute(text(
+            "SELECT 1 FROM public.estado_snapshot WHERE posicao IS NULL LIMIT 1"
+        )).first() is not None
+        if (changed or unranked) and refresh_estado_snapshot(conn):
+            bump_data_version(conn)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula o rollup de distribuicao_raw.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere a paridade do rollup com a tabela bruta após recalcular")
+    args = parser.parse_args(argv)
+
+    create_rollup_table()
+    with engine.begin() as conn:
+        rows = refresh_rollup(conn)
+    print(f"Rollup recalculado: {rows} grupos (ano, mes, sigla, fabricante).")
+
+    if args.verificar:
+        with engine.connect() as conn:
+            diff = check_parity(conn)
+        if diff:
+            print(f"Paridade FALHOU: {diff} grupos divergentes entre rollup e distribuicao_raw.")
+            return 1
+        print("Paridade OK: rollup idêntico à agregação de distribuicao_raw.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
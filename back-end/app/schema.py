@@ -0,0 +1,149 @@
+"""Resolução única do layout de colunas de `public.distribuicao_raw`.
+
+Os dumps já chegaram com nomes diferentes para as mesmas colunas (`"SIGLA"`,
+`sigla`, `"TX_SIGLA"`; `"QTDE"` com ou sem aspas, como texto ou número). Em
+vez de tentar variantes de SQL até uma funcionar, o layout é lido uma vez de
+`information_schema` — no startup e a cada reload — e guardado num
+`ColumnMap`, usado para montar exatamente uma consulta correta.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+
+RAW_SCHEMA = "public"
+RAW_TABLE = "distribuicao_raw"
+
+# Nomes aceitos para cada coluna lógica, em ordem de preferência. A busca é
+# primeiro exata e depois sem diferenciar maiúsculas/minúsculas.
+COLUMN_CANDIDATES: Dict[str, List[str]] = {
+    "ano": ["ANO", "NU_ANO"],
+    "mes": ["MES", "NU_MES"],
+    "sigla": ["SIGLA", "TX_SIGLA", "UF", "SG_UF"],
+    "qtde": ["QTDE", "TX_QTDE", "QTD", "QUANTIDADE"],
+}
+
+# Colunas opcionais: o id do fabricante (gravado pela carga ou por
+# `python -m app.fabricantes`) e o texto original do insumo/fabricante no dump.
+OPTIONAL_COLUMN_CANDIDATES: Dict[str, List[str]] = {
+    "fabricante_id": ["FABRICANTE_ID"],
+    "fabricante": ["TX_INSUMO", "INSUMO", "FABRICANTE", "TX_FABRICANTE", "NO_FABRICANTE", "DS_VACINA"],
+}
+
+NUMERIC_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ColumnMap:
+    """Colunas físicas de `distribuicao_raw` para cada coluna lógica."""
+
+    def __init__(self, columns: Dict[str, str], types: Dict[str, str]):
+        self.columns = columns
+        self.types = types
+
+    @property
+    def table(self) -> str:
+        return f"{RAW_SCHEMA}.{RAW_TABLE}"
+
+    def has(self, logical: str) -> bool:
+        return logical in self.columns
+
+    def col(self, logical: str) -> str:
+        """Identificador SQL (com aspas) da coluna lógica `logical`."""
+        return quote_ident(self.columns[logical])
+
+    def qtde_expr(self) -> str:
+        """Expressão somável de QTDE; o CAST por linha só é usado quando a
+        coluna não é numérica no banco."""
+        if self.types.get("qtde") in NUMERIC_TYPES:
+            return self.col("qtde")
+        return f"CAST({self.col('qtde')} AS numeric)"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "table": self.table,
+            "columns": dict(self.columns),
+            "types": dict(self.types),
+            "qtde_expr": self.qtde_expr(),
+        }
+
+
+def match_column(candidates: List[str], available: Dict[str, str]) -> Optional[str]:
+    """Primeiro nome de `candidates` presente em `available` (exato, depois
+    sem diferenciar maiúsculas/minúsculas)."""
+    for name in candidates:
+        if name in available:
+            return name
+    lowered = {name.lower(): name for name in available}
+    for name in candidates:
+        if name.lower() in lowered:
+            return lowered[name.lower()]
+    return None
+
+
+def resolve_column_map(conn) -> ColumnMap:
+    """Lê `information_schema.columns` e monta o ColumnMap.
+
+    `conn` pode ser uma Connection ou Session síncrona. Levanta RuntimeError
+    se a tabela não existir ou faltar alguma coluna obrigatória.
+    """
+    rows = conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = :schema AND table_name = :table"
+    ), {"schema": RAW_SCHEMA, "table": RAW_TABLE}).all()
+    available = {r.column_name: r.data_type for r in rows}
+    if not available:
+        raise RuntimeError(f"Tabela {RAW_SCHEMA}.{RAW_TABLE} não encontrada.")
+
+    columns: Dict[str, str] = {}
+    missing = []
+    for logical, candidates in COLUMN_CANDIDATES.items():
+        physical = match_column(candidates, available)
+        if physical is None:
+            missing.append(logical)
+        else:
+            columns[logical] = physical
+    if missing:
+        raise RuntimeError(
+            f"Colunas não encontradas em {RAW_SCHEMA}.{RAW_TABLE}: {', '.join(missing)} "
+            f"(disponíveis: {', '.join(sorted(available))})"
+        )
+    for logical, candidates in OPTIONAL_COLUMN_CANDIDATES.items():
+        physical = match_column(candidates, available)
+        if physical is not None:
+            columns[logical] = physical
+    types = {logical: available[physical] for logical, physical in columns.items()}
+    return ColumnMap(columns, types)
+
+
+_lock = threading.Lock()
+_current: Optional[ColumnMap] = None
+
+
+def refresh_column_map(conn) -> ColumnMap:
+    """Resolve novamente o layout (startup ou após um reload da tabela)."""
+    global _current
+    column_map = resolve_column_map(conn)
+    with _lock:
+        _current = column_map
+    return column_map
+
+
+def get_column_map(conn) -> ColumnMap:
+    """ColumnMap corrente, resolvido na primeira chamada."""
+    with _lock:
+        column_map = _current
+    if column_map is None:
+        column_map = refresh_column_map(conn)
+    return column_map
+
+
+def current_column_map() -> Optional[ColumnMap]:
+    """ColumnMap já resolvido, sem consultar o banco (None se ainda não houver)."""
+    with _lock:
+        return _current
@@ -0,0 +1,312 @@
+"""Série temporal por intervalo de meses, com acumulado e média móvel.
+
+`/timeseries` aceita, além de `ano`/`mes`:
+
+    de=2021-03      primeiro mês (AAAA-MM; `de=2021` é janeiro de 2021)
+    ate=2022-06     último mês (AAAA-MM; `ate=2022` é dezembro de 2022)
+    acumulado=1     distribuídas/aplicadas acumuladas desde o início do intervalo
+    janela=3        média móvel de N meses de calendário (1 a JANELA_MAX)
+
+Valores malformados (`de=2022-13`, `janela=0`, `de` depois de `ate`)
+levantam ValueError e o endpoint responde 400, em vez de devolver a série
+sem a janela pedida.
+
+Com qualquer um deles a série vem de uma só consulta com funções de janela
+sobre o rollup (`windowed_series_sql`), em vez de uma requisição por ano
+costurada no cliente. O filtro de intervalo é uma comparação de linha
+`(ano, mes) >= (:ano, :mes)`, atendida pelos índices (ano, mes, sigla) dos
+rollups. Sem esses parâmetros a resposta é a de sempre.
+
+Regras (as mesmas na referência em Python, `window_series`, usada pelo motor
+colunar e para conferir o SQL):
+
+- só entram meses com ano e mês conhecidos; `ano`/`mes`/`uf`/`fabricante`
+  continuam filtrando as linhas;
+- a janela conta meses de calendário — um mês sem dados vale zero — e pode
+  começar antes de `de`;
+- a média móvel é a soma da janela dividida por N, e fica null enquanto a
+  janela começa antes do primeiro mês com dados da série filtrada.
+
+Uso (a partir de `back-end/`):
+
+    python -m app.series --verificar   # SQL com janelas x referência em Python
+"""
+import argparse
+import re
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from .queries import ROLLUP_TABLE, _int, eficiencia, rollup_where, series_point, timeseries_sql
+
+
+JANELA_MAX = 36
+
+_PERIODO = re.compile(r"^\s*(\d{4})(?:-(\d{1,2}))?\s*$")
+
+# (ano, mes, distribuídas, aplicadas, esavi) de um mês da série
+MonthRow = Tuple[Any, Any, int, int, int]
+
+
+def periodo(ano: int, mes: int) -> int:
+    """Índice contínuo do mês (ano * 12 + mes - 1), usado como ORDER BY da janela."""
+    return ano * 12 + mes - 1
+
+
+def parse_periodo(value: Optional[str], fim: bool = False, nome: str = "de") -> Optional[int]:
+    """`2021-03` -> índice do mês; `2021` -> janeiro (ou dezembro, com `fim`).
+    None se ausente; ValueError se malformado."""
+    if value is None or not value.strip():
+        return None
+    match = _PERIODO.match(value)
+    mes = None
+    if match is not None:
+        mes = int(match.group(2)) if match.group(2) else (12 if fim else 1)
+    if mes is None or not 1 <= mes <= 12:
+        raise ValueError(f"{nome} inválido: {value!r} (use AAAA-MM ou AAAA)")
+    return periodo(int(match.group(1)), mes)
+
+
+def parse_janela(value: Optional[str]) -> Optional[int]:
+    """Meses da média móvel; None se ausente, ValueError fora de 1..JANELA_MAX."""
+    if value is None or not value.strip():
+        return None
+    try:
+        janela = int(value)
+    except ValueError:
+        janela = None
+    if janela is None or not 1 <= janela <= JANELA_MAX:
+        raise ValueError(f"janela inválida: {value!r} (use de 1 a {JANELA_MAX} meses)")
+    return janela
+
+
+def parse_flag(value: Optional[str]) -> bool:
+    return value is not None and value.strip().lower() in ("1", "true", "sim", "yes")
+
+
+class SeriesWindow:
+    """Intervalo (índices de mês, inclusivos) e cálculos pedidos para a série."""
+
+    def __init__(self, de: Optional[int] = None, ate: Optional[int] = None,
+                 janela: Optional[int] = None, acumulado: bool = False):
+        self.de = de
+        self.ate = ate
+        self.janela = janela
+        self.acumulado = acumulado
+
+    @classmethod
+    def from_params(cls, de: Optional[str], ate: Optional[str], janela: Optional[str],
+                    acumulado: Optional[str]) -> "SeriesWindow":
+        """ValueError (mensagem para o 400) se algum parâmetro for inválido."""
+        window = cls(parse_periodo(de), parse_periodo(ate, fim=True, nome="ate"), parse_janela(janela),
+                     parse_flag(acumulado))
+        if window.de is not None and window.ate is not None and window.de > window.ate:
+            raise ValueError(f"intervalo inválido: de={de} depois de ate={ate}")
+        return window
+
+    @property
+    def active(self) -> bool:
+        return self.de is not None or self.ate is not None or self.janela is not None or self.acumulado
+
+    def key(self) -> Tuple:
+        """Parte da chave de cache (filtros já normalizados)."""
+        return (self.de, self.ate, self.janela, self.acumulado)
+
+    def __repr__(self) -> str:
+        return f"SeriesWindow(de={self.de}, ate={self.ate}, janela={self.janela}, acumulado={self.acumulado})"
+
+
+def window_point(ano, mes, uf: Optional[str], distribuidas, aplicadas, esavi, window: SeriesWindow,
+                 acum_distribuidas=None, acum_aplicadas=None,
+                 janela_distribuidas=None, janela_aplicadas=None) -> Dict[str, Any]:
+    """`series_point` mais os campos pedidos em `window`. As somas da janela
+    chegam null quando ela começa antes do primeiro mês com dados."""
+    point = series_point(ano, mes, uf, distribuidas, aplicadas, esavi)
+    if window.acumulado:
+        point["distribuídas_acumuladas"] = _int(acum_distribuidas)
+        point["aplicadas_acumuladas"] = _int(acum_aplicadas)
+        point["eficiência_acumulada"] = eficiencia(acum_distribuidas, acum_aplicadas)
+    if window.janela is not None:
+        for name, total in (("distribuídas", janela_distribuidas), ("aplicadas", janela_aplicadas)):
+            point[f"média_móvel_{name}"] = round(_int(total) / window.janela, 1) if total is not None else None
+    return point
+
+
+# ====== SQL ======
+
+def _range_where(where: List[str], params: Dict[str, Any], name: str, op: str, value: Optional[int]) -> None:
+    if value is None:
+        return
+    # Comparação de linha: o planner usa o índice (ano, mes, sigla) como intervalo
+    where.append(f"(ano, mes) {op} (:{name}_ano, :{name}_mes)")
+    params[f"{name}_ano"], params[f"{name}_mes"] = divmod(value, 12)
+    params[f"{name}_mes"] += 1
+
+
+def windowed_series_sql(
+    ano_int: Optional[int],
+    mes_int: Optional[int],
+    uf: Optional[str],
+    fabricante_id: Optional[int],
+    window: SeriesWindow,
+) -> Tuple[str, Dict[str, Any]]:
+    """Série do intervalo com acumulado e somas da média móvel numa só consulta.
+
+    `base` agrega o rollup por mês a partir de `de - (janela - 1)`, para a
+    janela dos primeiros meses do intervalo; a consulta externa descarta esses
+    meses de apoio.
+    """
+    where, params = rollup_where(ano_int, mes_int, uf, fabricante_id)
+    where += ["ano IS NOT NULL", "mes IS NOT NULL"]
+    first_where = list(where)
+    inicio = window.de
+    if inicio is not None and window.janela is not None:
+        inicio -= window.janela - 1
+    _range_where(where, params, "inicio", ">=", inicio)
+    _range_where(where, params, "ate", "<=", window.ate)
+
+    base = (
+        "SELECT ano, mes, ano * 12 + mes - 1 AS periodo, COALESCE(SUM(qtde), 0) AS distribuidas, "
+        "COALESCE(SUM(aplicadas), 0) AS aplicadas, COALESCE(SUM(esavi), 0) AS esavi "
+        f"FROM {ROLLUP_TABLE} WHERE {' AND '.join(where)} GROUP BY ano, mes"
+    )
+    columns = ["ano", "mes", "distribuidas", "aplicadas", "esavi"]
+    if window.acumulado:
+        # Os meses de apoio da janela não entram no acumulado
+        in_range = "periodo >= :de" if window.de is not None else "TRUE"
+        for measure in ("distribuidas", "aplicadas"):
+            columns.append(
+                f"SUM(CASE WHEN {in_range} THEN {measure} ELSE 0 END) "
+                f"OVER (ORDER BY periodo ROWS UNBOUNDED PRECEDING) AS acum_{measure}"
+            )
+    prefix = ""
+    if window.janela is not None:
+        # Primeiro mês com dados da série filtrada (sem o intervalo), lido uma vez
+        prefix = (
+            f"WITH primeiro AS (SELECT MIN(ano * 12 + mes - 1) AS periodo FROM {ROLLUP_TABLE} "
+            f"WHERE {' AND '.join(first_where)}) "
+        )
+        # RANGE sobre o índice do mês: a janela conta meses de calendário, com ou sem linhas
+        for measure in ("distribuidas", "aplicadas"):
+            columns.append(
+                f"CASE WHEN periodo - {window.janela - 1} >= (SELECT periodo FROM primeiro) "
+                f"THEN SUM({measure}) OVER (ORDER BY periodo RANGE BETWEEN {window.janela - 1} PRECEDING "
+                f"AND CURRENT ROW) END AS janela_{measure}"
+            )
+    sql = f"SELECT {', '.join(columns)}, periodo FROM ({base}) AS base"
+    if window.de is not None:
+        params["de"] = window.de
+        sql = f"SELECT * FROM ({sql}) AS janelas WHERE periodo >= :de"
+    return f"{prefix}{sql} ORDER BY periodo", params
+
+
+def rows_to_points(rows: Iterable, uf: Optional[str], window: SeriesWindow) -> List[Dict[str, Any]]:
+    return [
+        window_point(
+            r.ano, r.mes, uf, r.distribuidas, r.aplicadas, r.esavi, window,
+            getattr(r, "acum_distribuidas", None), getattr(r, "acum_aplicadas", None),
+            getattr(r, "janela_distribuidas", None), getattr(r, "janela_aplicadas", None),
+        )
+        for r in rows
+    ]
+
+
+# ====== Referência em Python ======
+
+def window_series(months: Sequence[MonthRow], uf: Optional[str], window: SeriesWindow) -> List[Dict[str, Any]]:
+    """Mesma série de `windowed_series_sql`, calculada a partir da série mensal
+    sem intervalo (a de `/timeseries` com os mesmos filtros)."""
+    totals: Dict[int, Tuple[int, int, int]] = {}
+    for ano, mes, distribuidas, aplicadas, esavi in months:
+        if ano is None or mes is None:
+            continue
+        totals[periodo(int(ano), int(mes))] = (_int(distribuidas), _int(aplicadas), _int(esavi))
+    if not totals:
+        return []
+    first = min(totals)
+
+    points = []
+    acum_distribuidas = acum_aplicadas = 0
+    for key in sorted(totals):
+        if (window.de is not None and key < window.de) or (window.ate is not None and key > window.ate):
+            continue
+        distribuidas, aplicadas, esavi = totals[key]
+        acum_distribuidas += distribuidas
+        acum_aplicadas += aplicadas
+        janela_distribuidas = janela_aplicadas = None
+        if window.janela is not None and key - (window.janela - 1) >= first:
+            inside = [totals.get(p, (0, 0, 0)) for p in range(key - window.janela + 1, key + 1)]
+            janela_distribuidas = sum(t[0] for t in inside)
+            janela_aplicadas = sum(t[1] for t in inside)
+        ano, mes = divmod(key, 12)
+        points.append(window_point(
+            ano, mes + 1, uf, distribuidas, aplicadas, esavi, window,
+            acum_distribuidas, acum_aplicadas, janela_distribuidas, janela_aplicadas,
+        ))
+    return points
+
+
+# ====== Verificação ======
+
+def verify(conn) -> List[str]:
+    """Compara a consulta com janelas com a referência em Python para uma
+    grade de intervalos, janelas e filtros; devolve as divergências."""
+    bounds = conn.execute(text(
+        f"SELECT MIN(ano * 12 + mes - 1) AS first, MAX(ano * 12 + mes - 1) AS last "
+        f"FROM {ROLLUP_TABLE} WHERE ano IS NOT NULL AND mes IS NOT NULL"
+    )).first()
+    if bounds is None or bounds.first is None:
+        return ["rollup vazio"]
+    first, last = int(bounds.first), int(bounds.last)
+    sigla = conn.execute(text(f"SELECT MIN(sigla) FROM {ROLLUP_TABLE} WHERE sigla IS NOT NULL")).scalar()
+
+    ranges = [(None, None), (first, last), (first + 2, last - 1), (first - 5, first + 3),
+              ((first + last) // 2, None), (None, (first + last) // 2), (last + 1, last + 12)]
+    windows = [SeriesWindow(de, ate, janela, acumulado)
+               for de, ate in ranges for janela in (None, 1, 3, 12) for acumulado in (False, True)]
+    mismatches = []
+    checked = 0
+    for ano_int, mes_int in ((None, None), (first // 12, None), (None, 3)):
+        for uf in (None, sigla):
+            sql, params = timeseries_sql(ano_int, mes_int, uf)
+            months = [(r.ano, r.mes, r.distribuidas, r.aplicadas, r.esavi)
+                      for r in conn.execute(text(sql), params)]
+            for window in windows:
+                if not window.active:
+                    continue
+                sql, params = windowed_series_sql(ano_int, mes_int, uf, None, window)
+                got = rows_to_points(conn.execute(text(sql), params), uf, window)
+                expected = window_series(months, uf, window)
+                checked += 1
+                if got != expected:
+                    mismatches.append(f"ano={ano_int} mes={mes_int} uf={uf} {window}: "
+                                      f"{len(got)} pontos no SQL, {len(expected)} na referência")
+    print(f"{checked} combinações conferidas.")
+    return mismatches
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Série temporal com intervalo, acumulado e média móvel.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="comparar a consulta com funções de janela com a referência em Python")
+    args = parser.parse_args(argv)
+    if not args.verificar:
+        parser.print_help()
+        return 0
+
+    from .database import engine
+
+    with engine.connect() as conn:
+        mismatches = verify(conn)
+    for line in mismatches[:20]:
+        print(f"Divergência: {line}")
+    if mismatches:
+        print(f"{len(mismatches)} combinações divergentes.")
+        return 1
+    print("SQL e referência em Python conferem.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Snapshot colunar compartilhado entre workers num arquivo mapeado em memória.
+
+Com `QUERY_ENGINE=mmap`, o ColumnarSnapshot (app/columnar.py) é gravado uma
+única vez num arquivo e cada worker do Gunicorn o mapeia somente leitura:
+N workers dividem as mesmas páginas do page cache, em vez de N cópias dos
+arrays (e N cargas do rollup a cada mudança de versão).
+
+Formato do arquivo:
+
+    MAGIC (8 bytes) | tamanho do cabeçalho (uint64 LE) | cabeçalho JSON |
+    arrays alinhados em ALIGN bytes
+
+O cabeçalho traz a versão dos dados, os dicionários das dimensões, o
+snapshot dos estados e, para cada array, dtype, tamanho e deslocamento.
+
+Quando a versão muda, o primeiro worker a perceber pega o lock do arquivo
+(`<arquivo>.lock`), lê o rollup e grava um arquivo temporário que substitui
+o atual com `os.replace` (troca atômica). Os demais esperam o lock e mapeiam
+o arquivo novo; quem ainda usa o antigo continua com o mapeamento dele até
+trocar.
+
+    SNAPSHOT_PATH   (default <tmp>/vacinacao_rollup.snap)
+
+Uso (a partir de `back-end/`):
+
+    python -m app.shared_snapshot              # grava o arquivo da versão corrente
+    python -m app.shared_snapshot --verificar  # e confere com o snapshot em memória
+"""
+import argparse
+import contextlib
+import decimal
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from .columnar import DIMENSIONS, MEASURES, ColumnarSnapshot, load_snapshot, np
+from .database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock, cada worker pode gerar o arquivo
+    fcntl = None
+
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH") or os.path.join(tempfile.gettempdir(), "vacinacao_rollup.snap")
+
+MAGIC = b"VACSNAP2"
+PREFIX = struct.Struct("<8sQ")
+ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    raise TypeError(f"tipo não serializável no snapshot: {type(value).__name__}")
+
+
+def write_snapshot(snapshot: ColumnarSnapshot, path: str = SNAPSHOT_PATH) -> int:
+    """Grava `snapshot` em `path` de forma atômica; retorna o tamanho em bytes."""
+    arrays = {f"codes.{name}": array for name, array in snapshot.codes().items()}
+    arrays.update({f"measures.{name}": array for name, array in snapshot.measures().items()})
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "count": int(array.shape[0]), "offset": offset}
+        offset += array.nbytes
+    header = json.dumps({
+        "version": snapshot.version,
+        "created_at": time.time(),
+        "dictionaries": snapshot.dictionaries(),
+        "snapshot_items": snapshot.snapshot_items,
+        "arrays": layout,
+    }, default=_json_default).encode("utf-8")
+    data_start = _align(PREFIX.size + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    return size
+
+
+def _read_header(buffer) -> Dict[str, Any]:
+    magic, header_size = PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("arquivo não é um snapshot colunar")
+    return json.loads(bytes(buffer[PREFIX.size:PREFIX.size + header_size]).decode("utf-8"))
+
+
+def read_version(path: str = SNAPSHOT_PATH) -> Optional[int]:
+    """Versão gravada no arquivo, sem mapeá-lo; None se ausente ou inválido."""
+    try:
+        with open(path, "rb") as f:
+            magic, header_size = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC:
+                return None
+            return int(json.loads(f.read(header_size).decode("utf-8"))["version"])
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def open_snapshot(path: str = SNAPSHOT_PATH) -> ColumnarSnapshot:
+    """Mapeia o arquivo somente leitura. Os arrays apontam direto para o
+    mapeamento (que fica vivo enquanto algum array o referenciar)."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = _read_header(mapped)
+    _, header_size = PREFIX.unpack_from(mapped, 0)
+    data_start = _align(PREFIX.size + header_size)
+
+    def array(name):
+        spec = header["arrays"][name]
+        return np.frombuffer(mapped, dtype=np.dtype(spec["dtype"]), count=spec["count"],
+                             offset=data_start + spec["offset"])
+
+    names = [name for name, _, _ in DIMENSIONS]
+    dictionaries = {name: header["dictionaries"][name] for name in names}
+    codes = {name: array(f"codes.{name}") for name in names}
+    measures = {name: array(f"measures.{name}") for name in MEASURES}
+    return ColumnarSnapshot(
+        int(header["version"]), dictionaries, codes, measures, header["snapshot_items"], source="mmap",
+    )
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _database_version(conn) -> int:
+    try:
+        r = conn.execute(text("SELECT versao FROM public.data_version WHERE id = 1")).first()
+    except Exception:
+        conn.rollback()
+        return 0
+    return int(r.versao) if r is not None else 0
+
+
+def build(version: int = 0, path: str = SNAPSHOT_PATH) -> ColumnarSnapshot:
+    """Lê o rollup e grava o arquivo. A versão gravada é a do banco (se mais
+    nova que `version`), lida antes do rollup: no pior caso o arquivo traz
+    dados mais novos que a versão que declara, e é regravado na próxima troca."""
+    with engine.connect() as conn:
+        version = max(version, _database_version(conn))
+        snapshot = load_snapshot(conn, version)
+    write_snapshot(snapshot, path)
+    return snapshot
+
+
+def load_shared(version: int, path: str = SNAPSHOT_PATH) -> ColumnarSnapshot:
+    """Snapshot de pelo menos `version`: mapeia o arquivo existente ou, se
+    estiver desatualizado, gera um novo (um worker por vez)."""
+    current = read_version(path)
+    if current is None or current < version:
+        with _file_lock(path):
+            # Outro worker pode ter gerado o arquivo enquanto este esperava
+            current = read_version(path)
+            if current is None or current < version:
+                build(version, path)
+    return open_snapshot(path)
+
+
+def _verify(memory: ColumnarSnapshot, mapped: ColumnarSnapshot):
+    """Mesmas respostas nas duas cópias para todas as combinações de filtros."""
+    problems = []
+    if memory.dictionaries() != mapped.dictionaries():
+        problems.append("dicionários diferentes")
+    for name, codes in memory.codes().items():
+        if not np.array_equal(codes, mapped.codes()[name]):
+            problems.append(f"códigos de {name} diferentes")
+    for name, values in memory.measures().items():
+        if not np.array_equal(values, mapped.measures()[name]):
+            problems.append(f"{name} diferente")
+    for ano in [None] + [a for a in memory.anos if a is not None]:
+        for uf in [None] + [s for s in memory.siglas if s is not None]:
+            for fabricante_id in [None] + [f for f in memory.fabricantes if f is not None]:
+                if memory.dashboard(ano, None, uf, fabricante_id) != mapped.dashboard(ano, None, uf, fabricante_id):
+                    problems.append(f"dashboard diverge: ano={ano} uf={uf} fabricante={fabricante_id}")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Grava o snapshot colunar compartilhado entre workers.")
+    parser.add_argument("--arquivo", default=SNAPSHOT_PATH, help=f"caminho do arquivo (default {SNAPSHOT_PATH})")
+    parser.add_argument("--verificar", action="store_true",
+                        help="confere o arquivo mapeado com o snapshot em memória")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("numpy não está instalado (pip install numpy).")
+        return 1
+
+    started = time.perf_counter()
+    with _file_lock(args.arquivo):
+        memory = build(0, args.arquivo)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(args.arquivo)
+    print(f"{args.arquivo}: versão {memory.version}, {memory.rows} linhas, {size / 1024:.0f} KiB "
+          f"gravados em {elapsed * 1000:.0f} ms.")
+    if not args.verificar:
+        return 0
+
+    started = time.perf_counter()
+    mapped = open_snapshot(args.arquivo)
+    print(f"Arquivo mapeado em {(time.perf_counter() - started) * 1000:.1f} ms.")
+    problems = _verify(memory, mapped)
+    if problems:
+        for p in problems[:20]:
+            print("FALHOU:", p)
+        return 1
+    print("Arquivo mapeado idêntico ao snapshot em memória.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Coalescência de consultas idênticas em andamento (single-flight).
+
+Depois de um reload (ou quando uma entrada do cache expira), dezenas de
+dashboards abertos pedem o mesmo `/overview` e `/timeseries` ao mesmo
+tempo; sem coalescência, cada requisição pega uma conexão do pool (5 + 10,
+ver app/database.py) para calcular o mesmo resultado. Aqui a primeira
+requisição de uma chave — endpoint, filtros normalizados e versão dos dados
+— calcula, e as idênticas que chegam enquanto ela roda esperam o mesmo
+resultado, sem tocar no pool.
+
+Se a primeira falhar, as que esperavam recebem `SharedFailure` (com a falha
+original em `__cause__`): cada uma responde pelo fallback de
+app/resilience.py, mas só a primeira conta como falha no circuit breaker.
+
+Ajuste opcional por variável de ambiente:
+
+    SINGLE_FLIGHT   (default 1; 0 desliga, para comparação em benchmark)
+
+Uso (a partir de `back-end/`):
+
+    python -m app.singleflight --verificar --requisicoes 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from .metrics import Counter
+
+
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1").strip().lower() not in ("0", "false", "no")
+
+COALESCED = Counter(
+    "singleflight_requests_total", "Cálculos por papel: leader executou, follower esperou.", ("endpoint", "role")
+)
+
+
+class SharedFailure(Exception):
+    """Falha do cálculo compartilhado, vista por quem só esperava por ele."""
+
+
+class SingleFlight:
+    """Uma execução por chave em andamento; as chamadas concorrentes com a
+    mesma chave recebem o resultado (ou a falha) dela."""
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, "asyncio.Future"] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], endpoint: str = "") -> Any:
+        if not self.enabled:
+            return await fn()
+        pending = self._calls.get(key)
+        if pending is not None:
+            self.followers += 1
+            COALESCED.inc(1, endpoint, "follower")
+            # shield: o limite de tempo de quem espera não cancela o cálculo dos outros
+            try:
+                return await asyncio.shield(pending)
+            except SharedFailure:
+                raise
+            except Exception as e:
+                raise SharedFailure(str(e)) from e
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        COALESCED.inc(1, endpoint, "leader")
+        try:
+            result = await fn()
+        except BaseException as e:
+            # Cancelamento (ex.: limite de tempo da requisição) chega aos outros como timeout
+            error = e if isinstance(e, Exception) else asyncio.TimeoutError()
+            future.set_exception(error)
+            # Marcar como lida: sem ninguém esperando, o asyncio avisaria no log
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.followers
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_ratio": round(self.followers / calls, 4) if calls else 0.0,
+        }
+
+
+inflight = SingleFlight()
+
+
+def render_metrics_lines() -> str:
+    lines = list(COALESCED.render())
+    lines += [
+        "# HELP singleflight_in_flight Cálculos em andamento com requisições esperando por eles.",
+        "# TYPE singleflight_in_flight gauge",
+        f"singleflight_in_flight {len(inflight._calls)}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# ====== Verificação ======
+
+async def count_queries(paths: List[str], requests: int) -> Dict[str, List[int]]:
+    """Para cada caminho: consultas ao banco com 1 requisição e com
+    `requests` requisições simultâneas idênticas (cache limpo antes)."""
+    import httpx
+    from sqlalchemy import event
+
+    from .cache import response_cache
+    from .columnar import columnar_engine
+    from .database import async_engine
+    from .main import app
+
+    # Contar consultas do SQL, não do motor colunar
+    columnar_engine.enabled = False
+    executed = [0]
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        # Só as consultas do cálculo (sem a versão dos dados nem o SET LOCAL do limite de tempo)
+        if "data_version" not in statement and not statement.startswith("SET "):
+            executed[0] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", on_execute)
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://verificar") as client:
+            for path in paths:
+                counts = []
+                for n in (1, requests):
+                    # Aquecer versão dos dados e fabricantes fora da contagem
+                    await client.get(path)
+                    response_cache.clear()
+                    executed[0] = 0
+                    responses = await asyncio.gather(*(client.get(path) for _ in range(n)))
+                    bodies = {r.content for r in responses}
+                    if len(bodies) != 1 or any(r.status_code != 200 for r in responses):
+                        raise RuntimeError(f"{path}: respostas divergentes ou com erro")
+                    counts.append(executed[0])
+                results[path] = counts
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", on_execute)
+        await async_engine.dispose()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Coalescência de requisições idênticas simultâneas.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="N requisições idênticas simultâneas devem fazer as consultas de uma só")
+    parser.add_argument("--requisicoes", type=int, default=50)
+    parser.add_argument("--caminhos", nargs="*",
+                        default=["/overview?ano=2021", "/timeseries?uf=SP", "/ranking/ufs?mes=3", "/dashboard"])
+    args = parser.parse_args(argv)
+    if not args.verificar:
+        parser.print_help()
+        return 0
+
+    results = asyncio.run(count_queries(args.caminhos, args.requisicoes))
+    failed = 0
+    for path, (single, many) in results.items():
+        ok = many == single
+        failed += not ok
+        print(f"{path:<28} 1 requisição: {single} consultas   {args.requisicoes} simultâneas: {many} consultas"
+              f"{'' if ok else '   <- DIVERGENTE'}")
+    # Com `python -m`, este arquivo é `__main__`: o objeto usado pela API é o de app.singleflight
+    from .singleflight import inflight as api_inflight
+
+    print(api_inflight.stats())
+    if failed:
+        print(f"{failed} caminhos sem coalescência.")
+        return 1
+    print("Requisições simultâneas idênticas executaram as consultas uma única vez.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
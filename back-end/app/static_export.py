@@ -0,0 +1,285 @@
+"""Exportação estática de todas as combinações de filtros do dashboard.
+
+O espaço de filtros é finito — anos × (todos + 12 meses) × (BR + UFs) — então
+as respostas de `/overview`, `/timeseries`, `/ranking/ufs` e `/dashboard`
+podem ser geradas de uma vez e servidas por uma CDN, sem passar pelo backend.
+
+Uma única leitura agregada (do rollup ou, com `--fonte bruta`, de uma
+passada sobre `distribuicao_raw`) alimenta todas as combinações em Python.
+Cada resposta é gravada com o mesmo corpo do endpoint em
+`<saida>/v/<sha256>.json` (nome pelo conteúdo: respostas iguais viram um só
+arquivo e podem ser cacheadas para sempre), e `<saida>/manifest.json` mapeia
+cada requisição (`/overview?ano=2021&mes=3`) para o seu arquivo. O manifesto
+é gravado por último, com troca atômica.
+
+O frontend (`VITE_STATIC_BASE_URL`) consulta o manifesto e cai na API para
+combinações ausentes (ex.: filtro por fabricante).
+
+Uso (a partir de `back-end/`):
+
+    python -m app.static_export                      # grava em ../front-end/public/dados
+    python -m app.static_export --saida /tmp/dados --verificar
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import select, text
+
+from .database import EstadoSnapshot, engine
+from .estados import RANKING_ORDER, snapshot_covers
+from .queries import APLICACAO_TABLE, ROLLUP_TABLE, overview_payload, ranking_item, series_point, snapshot_ranking_item
+from .responses import encode_json, envelope
+from .rollup import raw_aggregate_sql
+from .schema import refresh_column_map
+
+
+DEFAULT_OUTPUT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "front-end", "public", "dados"
+)
+DATA_DIR = "v"
+MESES = list(range(1, 13))
+
+
+def _null_last(value):
+    # Mesma ordem do ORDER BY do Postgres: NULLs por último
+    return (value is None, value if value is not None else 0)
+
+
+def request_key(endpoint: str, ano: Optional[int], mes: Optional[int], uf: Optional[str]) -> str:
+    """Chave do manifesto; o frontend monta a mesma (ver src/lib/api.ts)."""
+    params = [(name, value) for name, value in (("ano", ano), ("mes", mes), ("uf", uf)) if value is not None]
+    return f"{endpoint}?{urlencode(params)}" if params else endpoint
+
+
+def read_aggregates(conn, fonte: str) -> List[Tuple[Any, Any, Any, Tuple[int, int, int]]]:
+    """(ano, mes, sigla, (qtde, aplicadas, esavi)) no grão do rollup."""
+    if fonte == "bruta":
+        # Aplicadas e ESAVI só existem agregados (ver load_aplicacao.py)
+        source_sql = (
+            f"SELECT ano, mes, sigla, qtde, 0 AS aplicadas, 0 AS esavi "
+            f"FROM ({raw_aggregate_sql(refresh_column_map(conn))}) AS raw "
+            f"UNION ALL SELECT ano, mes, sigla, 0, aplicadas, esavi FROM {APLICACAO_TABLE}"
+        )
+    else:
+        source_sql = f"SELECT ano, mes, sigla, qtde, aplicadas, esavi FROM {ROLLUP_TABLE}"
+    rows = conn.execute(text(
+        f"SELECT ano, mes, sigla, COALESCE(SUM(qtde), 0) AS qtde, COALESCE(SUM(aplicadas), 0) AS aplicadas, "
+        f"COALESCE(SUM(esavi), 0) AS esavi FROM ({source_sql}) AS agg GROUP BY 1, 2, 3"
+    )).all()
+    return [(r.ano, r.mes, r.sigla, (int(r.qtde), int(r.aplicadas), int(r.esavi))) for r in rows]
+
+
+def _add(target: List[int], values: Tuple[int, int, int]) -> None:
+    for i, value in enumerate(values):
+        target[i] += value
+
+
+def build_payloads(rows: Iterable[Tuple[Any, Any, Any, Tuple[int, int, int]]],
+                   snapshot_items: List[Dict[str, Any]]):
+    """Payloads de cada endpoint para todas as combinações de filtros.
+
+    Cada linha agregada soma nas combinações a que pertence (com e sem cada
+    filtro), então tudo sai de uma passada pelas linhas. Retorna
+    (payloads por chave do manifesto, anos, UFs).
+    """
+    # Cada acumulador guarda [distribuídas, aplicadas, esavi]
+    def zeros():
+        return [0, 0, 0]
+
+    totals: Dict[Tuple, List[int]] = defaultdict(zeros)
+    series: Dict[Tuple, Dict[Tuple, List[int]]] = defaultdict(lambda: defaultdict(zeros))
+    ranking: Dict[Tuple, Dict[Any, List[int]]] = defaultdict(lambda: defaultdict(zeros))
+    anos, ufs = set(), set()
+    for ano, mes, sigla, values in rows:
+        ano = int(ano) if ano is not None else None
+        mes = int(mes) if mes is not None else None
+        anos.add(ano)
+        ufs.add(sigla)
+        for a in {ano, None}:
+            for m in {mes, None}:
+                _add(totals[(a, m)], values)
+                for u in {sigla, None}:
+                    _add(series[(a, m, u)][(ano, mes)], values)
+                    _add(ranking[(a, m, u)][sigla], values)
+
+    anos_filtro = sorted(a for a in anos if a is not None)
+    ufs_filtro = sorted(u for u in ufs if u is not None)
+    payloads: Dict[str, Any] = {}
+    for ano in [None] + anos_filtro:
+        for mes in [None] + MESES:
+            overview = overview_payload(*totals.get((ano, mes), (0, 0, 0)))
+            for uf in [None] + ufs_filtro:
+                points = series.get((ano, mes, uf), {})
+                timeseries = [
+                    series_point(a, m, uf, *points[(a, m)])
+                    for a, m in sorted(points, key=lambda k: (_null_last(k[0]), _null_last(k[1])))
+                ]
+                if snapshot_items and snapshot_covers(ano, mes, None):
+                    # Como em `/ranking/ufs`: o snapshot dos estados tem prioridade
+                    items = [item for item in snapshot_items if uf is None or item["uf"] == uf]
+                else:
+                    by_sigla = ranking.get((ano, mes, uf), {})
+                    ordered = sorted(by_sigla, key=lambda s: (-by_sigla[s][0], s is None, s or ""))
+                    items = [ranking_item(s, by_sigla[s][0], by_sigla[s][1]) for s in ordered]
+                payloads[request_key("/overview", ano, mes, uf)] = overview
+                payloads[request_key("/timeseries", ano, mes, uf)] = timeseries
+                payloads[request_key("/ranking/ufs", ano, mes, uf)] = items
+                payloads[request_key("/dashboard", ano, mes, uf)] = {
+                    "overview": overview, "timeseries": timeseries, "ranking": items,
+                }
+    return payloads, anos_filtro, ufs_filtro
+
+
+def _write_atomic(path: str, body: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(body)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def write_export(output: str, payloads: Dict[str, Any], manifest_extra: Dict[str, Any]) -> Dict[str, int]:
+    """Grava os arquivos por conteúdo e o manifesto; retorna contadores."""
+    data_dir = os.path.join(output, DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    files: Dict[str, str] = {}
+    seen = set()
+    written = reused = total_bytes = 0
+    for key, data in payloads.items():
+        body = encode_json(envelope(data))
+        name = f"{DATA_DIR}/{hashlib.sha256(body).hexdigest()[:20]}.json"
+        path = os.path.join(output, name)
+        if name not in seen and not os.path.exists(path):
+            _write_atomic(path, body)
+            written += 1
+            total_bytes += len(body)
+        else:
+            reused += 1
+        seen.add(name)
+        files[key] = name
+
+    manifest = {**manifest_extra, "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "files": files}
+    _write_atomic(os.path.join(output, "manifest.json"), json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+    return {"requests": len(files), "unique": len(seen), "written": written,
+            "reused": reused, "bytes": total_bytes}
+
+
+def prune(output: str, keep: Iterable[str]) -> int:
+    """Apaga arquivos de dados que o manifesto atual não usa."""
+    keep = {os.path.basename(name) for name in keep}
+    data_dir = os.path.join(output, DATA_DIR)
+    removed = 0
+    for name in os.listdir(data_dir):
+        if name.endswith(".json") and name not in keep:
+            os.unlink(os.path.join(data_dir, name))
+            removed += 1
+    return removed
+
+
+# ====== Verificação contra os handlers ======
+
+def _comparable(endpoint: str, data: Any) -> Any:
+    # Empates em SUM(qtde) não têm ordem definida no SQL
+    def ranking_key(items):
+        return sorted(items, key=lambda i: (-(i.get("distribuídas") or 0), i.get("uf") or ""))
+
+    if endpoint == "/ranking/ufs":
+        return ranking_key(data)
+    if endpoint == "/dashboard":
+        return {**data, "ranking": ranking_key(data["ranking"])}
+    return data
+
+
+def verify(output: str, url: Optional[str] = None) -> List[str]:
+    """Compara cada arquivo exportado com a resposta do handler (em processo,
+    ou da API em `url`); retorna as divergências."""
+    with open(os.path.join(output, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if url:
+        import urllib.request
+
+        def fetch(path):
+            with urllib.request.urlopen(url.rstrip("/") + path, timeout=30) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        client = None
+    else:
+        from fastapi.testclient import TestClient
+        from .main import app
+
+        client = TestClient(app)
+        client.__enter__()
+
+        def fetch(path):
+            return client.get(path).json()
+
+    problems = []
+    try:
+        for key, name in manifest["files"].items():
+            with open(os.path.join(output, name), encoding="utf-8") as f:
+                exported = json.load(f)
+            live = fetch(key)
+            endpoint = key.split("?", 1)[0]
+            if _comparable(endpoint, exported["data"]) != _comparable(endpoint, live.get("data")):
+                problems.append(f"{key}: diverge do handler")
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exporta as respostas do dashboard como JSON estático.")
+    parser.add_argument("--saida", default=DEFAULT_OUTPUT, help=f"diretório de saída (default {DEFAULT_OUTPUT})")
+    parser.add_argument("--fonte", choices=("rollup", "bruta"), default="rollup",
+                        help="rollup (default) ou uma passada agregada sobre distribuicao_raw")
+    parser.add_argument("--limpar", action="store_true", help="apagar arquivos de dados não usados pelo manifesto")
+    parser.add_argument("--verificar", action="store_true", help="comparar os arquivos com os handlers da API")
+    parser.add_argument("--url", help="com --verificar, consultar esta API em vez dos handlers em processo")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        r = conn.execute(text("SELECT versao FROM public.data_version WHERE id = 1")).first()
+        version = int(r.versao) if r is not None else 0
+        rows = read_aggregates(conn, args.fonte)
+        records = conn.execute(
+            select(*EstadoSnapshot.__table__.columns).order_by(*RANKING_ORDER)
+        ).all()
+    read_s = time.perf_counter() - started
+
+    payloads, anos, ufs = build_payloads(rows, [snapshot_ranking_item(r) for r in records])
+    counts = write_export(args.saida, payloads, {"version": version, "anos": anos, "ufs": ufs})
+    elapsed = time.perf_counter() - started
+    print(f"{counts['requests']} respostas ({len(anos) + 1} anos × 13 meses × {len(ufs) + 1} UFs × 4 endpoints) "
+          f"em {counts['unique']} arquivos; {counts['written']} novos ({counts['bytes'] / 1024:.0f} KiB).")
+    print(f"Leitura {read_s * 1000:.0f} ms, total {elapsed:.2f} s. Manifesto: {os.path.join(args.saida, 'manifest.json')}")
+    if args.limpar:
+        with open(os.path.join(args.saida, "manifest.json"), encoding="utf-8") as f:
+            removed = prune(args.saida, json.load(f)["files"].values())
+        print(f"{removed} arquivos antigos removidos.")
+
+    if args.verificar:
+        started = time.perf_counter()
+        problems = verify(args.saida, args.url)
+        if problems:
+            for p in problems[:20]:
+                print("FALHOU:", p)
+            if len(problems) > 20:
+                print(f"... e mais {len(problems) - 20} divergências.")
+            return 1
+        print(f"{counts['requests']} arquivos idênticos às respostas da API "
+              f"({time.perf_counter() - started:.1f} s).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+"""Benchmarks e teste de carga do backend.
+
+Rodar a partir de `back-end/`, com DATABASE_URL apontando para um Postgres
+local (nunca para produção — o gerador regrava os meses que gera):
+
+    python -m bench.generate --linhas 5000000        # dados sintéticos
+    python -m bench.handlers --saida handlers.json   # micro-benchmark por handler
+    python -m bench.load --url http://127.0.0.1:8000 --saida carga.json
+    python -m bench.workers --workers 1 2 4           # vazão com 1..N workers
+    python -m bench.coalesce --concorrencia 64       # rajada idêntica com/sem single-flight
+    python -m bench.batch --rodadas 30               # POST /batch x 27 GET /timeseries
+    python -m bench.overload --concorrencia 64       # sobrecarga com/sem controle de admissão
+    python -m bench.reducer --processos 1 2 4         # redutor de microdados (linhas/s)
+    python -m bench.compare antes.json depois.json   # regressões entre commits
+"""
@@ -0,0 +1,146 @@
+"""`POST /batch` x as mesmas consultas feitas uma a uma (app/batch.py).
+
+Reproduz a comparação nacional do frontend: a série de cada UF com os mesmos
+filtros. O servidor sobe com 1 worker, motor SQL e cache de respostas
+desligado (cada rodada vai ao banco); em cada uma das `--rodadas`, mede o
+tempo até ter todas as séries:
+
+- `/batch`: um POST com um conjunto de filtros por UF;
+- `/timeseries` sequencial: um GET por UF, um depois do outro;
+- `/timeseries` paralelo: um GET por UF em `--concorrencia` conexões (6 é o
+  limite de conexões por host dos navegadores).
+
+Além das latências por rodada, relata as consultas ao banco por rodada (do
+/metrics do servidor) e confere, na primeira rodada, que o /batch devolveu
+as mesmas séries.
+
+    python -m bench.batch --rodadas 30 --filtros ano=2021 --saida batch.json
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+
+from .coalesce import scrape, total
+from .common import latency_summary, print_table, write_results
+from .generate import POPULACAO_UF
+from .workers import start_server, stop_server, wait_ready
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str, body: Any = None) -> Any:
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload is not None else {}
+    conn.request(method, path, body=payload, headers=headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"{method} {path}: {resp.status} {data[:200]!r}")
+    return json.loads(data)["data"]
+
+
+def run_batch(port: int, ufs: List[str], filters: Dict[str, str]) -> Dict[str, Any]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        sets = [{"id": uf, "uf": uf, **filters} for uf in ufs]
+        return _request(conn, "POST", "/batch", {"metrica": "timeseries", "filtros": sets})
+    finally:
+        conn.close()
+
+
+def run_individual(port: int, ufs: List[str], filters: Dict[str, str], concurrency: int) -> Dict[str, Any]:
+    """Um GET /timeseries por UF, com `concurrency` conexões keep-alive."""
+    pending = list(ufs)
+    lock = threading.Lock()
+    results: Dict[str, Any] = {}
+    errors: List[Exception] = []
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        try:
+            while True:
+                with lock:
+                    if not pending:
+                        return
+                    uf = pending.pop(0)
+                results[uf] = _request(conn, "GET", "/timeseries?" + urlencode({"uf": uf, **filters}))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(concurrency, len(ufs)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="POST /batch x chamadas individuais a /timeseries.")
+    parser.add_argument("--porta", type=int, default=8022)
+    parser.add_argument("--rodadas", type=int, default=30)
+    parser.add_argument("--concorrencia", type=int, default=6, help="conexões do modo paralelo")
+    parser.add_argument("--ufs", nargs="*", default=sorted(POPULACAO_UF))
+    parser.add_argument("--filtros", nargs="*", default=[], help="filtros comuns, ex.: ano=2021 fabricante=pfizer")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+    filters = dict(item.split("=", 1) for item in args.filtros)
+
+    env = dict(os.environ, QUERY_ENGINE="sql", CACHE_TTL_SECONDS="0", BATCH_MAX=str(max(50, len(args.ufs))))
+    proc = start_server(1, args.porta, env)
+    results: List[Dict[str, Any]] = []
+    try:
+        if not wait_ready(args.porta, 60):
+            print("Servidor não respondeu ao /health.")
+            return 1
+
+        modes: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = [
+            ("/batch", "1 requisição", lambda: run_batch(args.porta, args.ufs, filters)),
+            ("/timeseries", "sequencial", lambda: run_individual(args.porta, args.ufs, filters, 1)),
+            ("/timeseries", f"paralelo ({args.concorrencia} conexões)",
+             lambda: run_individual(args.porta, args.ufs, filters, args.concorrencia)),
+        ]
+        # Aquecimento (versão dos dados, fabricantes, planos) e conferência das respostas
+        answers = [fn() for _, _, fn in modes]
+        if any(answer != answers[0] for answer in answers[1:]):
+            print("Divergência entre /batch e /timeseries.")
+            return 1
+
+        for endpoint, label, fn in modes:
+            before = scrape(args.porta)
+            samples = []
+            for _ in range(args.rodadas):
+                started = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - started)
+            after = scrape(args.porta)
+            queries = total(after, "http_request_db_queries_total") - total(before, "http_request_db_queries_total")
+            results.append({
+                "endpoint": f"{endpoint} x{1 if endpoint == '/batch' else len(args.ufs)}",
+                "filters": label,
+                **latency_summary(samples),
+                "queries_per_round": round(queries / args.rodadas, 2),
+            })
+    finally:
+        stop_server(proc)
+
+    print(f"UFs: {len(args.ufs)}  filtros: {filters or 'todos'}  rodadas: {args.rodadas}  (latência por rodada)")
+    print_table(results, extra=("queries_per_round",))
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("rodadas", "concorrencia", "ufs", "filtros")}
+        config["cpus"] = os.cpu_count()
+        write_results(args.saida, "batch", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
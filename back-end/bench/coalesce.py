@@ -0,0 +1,140 @@
+"""Rajada de requisições idênticas com e sem single-flight (app/singleflight.py).
+
+Simula o momento logo após um reload: muitos dashboards pedem os mesmos
+filtros ao mesmo tempo e nenhum está no cache. O servidor sobe (1 worker,
+motor SQL, cache de respostas desligado) uma vez com `SINGLE_FLIGHT=0` e
+outra com `SINGLE_FLIGHT=1`; para cada endpoint, `--concorrencia` clientes
+repetem a mesma requisição. Além das latências, relata o que o /metrics do
+servidor viu: consultas por requisição, espera média no checkout do pool,
+pico de conexões em uso (amostrado durante a carga) e respostas stale/503.
+
+    python -m bench.coalesce --concorrencia 64 --requisicoes 2000 --saida coalesce.json
+"""
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from .common import latency_summary, print_table, write_results
+from .load import run_case
+from .workers import start_server, stop_server, wait_ready
+
+
+def scrape(port: int) -> Dict[Tuple[str, str], float]:
+    """Métricas do /metrics como {(nome, rótulos): valor}."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request("GET", "/metrics")
+    body = conn.getresponse().read().decode("utf-8")
+    conn.close()
+    values = {}
+    for line in body.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        metric, _, labels = name.partition("{")
+        values[(metric, labels.rstrip("}"))] = float(value)
+    return values
+
+
+def total(values: Dict[Tuple[str, str], float], metric: str, contains: str = "") -> float:
+    return sum(v for (name, labels), v in values.items() if name == metric and contains in labels)
+
+
+class PoolSampler(threading.Thread):
+    """Pico de conexões do pool assíncrono em uso durante a carga."""
+
+    def __init__(self, port: int, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.port = port
+        self.interval = interval
+        self.peak = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            try:
+                values = scrape(self.port)
+                self.peak = max(self.peak, total(values, "db_pool_checked_out", 'pool="async"'))
+            except (OSError, http.client.HTTPException):
+                pass
+            self._done.wait(self.interval)
+
+    def stop(self) -> float:
+        self._done.set()
+        self.join()
+        return self.peak
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rajada de requisições idênticas com e sem single-flight.")
+    parser.add_argument("--porta", type=int, default=8021)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--requisicoes", type=int, default=2000, help="requisições por endpoint")
+    parser.add_argument("--endpoints", nargs="*", default=["/overview?ano=2021", "/timeseries?uf=SP", "/dashboard"])
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for single_flight in ("0", "1"):
+        env = dict(os.environ, QUERY_ENGINE="sql", CACHE_TTL_SECONDS="0", SINGLE_FLIGHT=single_flight)
+        proc = start_server(1, args.porta, env)
+        try:
+            if not wait_ready(args.porta, 60):
+                print("Servidor não respondeu ao /health.")
+                return 1
+            base_url = f"http://127.0.0.1:{args.porta}"
+            for target in args.endpoints:
+                path, _, query = target.partition("?")
+                params = dict(item.split("=", 1) for item in query.split("&") if item)
+                run_case(base_url, path, params, 20, 4, args.timeout, {})  # aquecimento
+
+                before = scrape(args.porta)
+                sampler = PoolSampler(args.porta)
+                sampler.start()
+                started = time.perf_counter()
+                latencies, statuses, errors = run_case(
+                    base_url, path, params, args.requisicoes, args.concorrencia, args.timeout, {}
+                )
+                wall = time.perf_counter() - started
+                peak = sampler.stop()
+                after = scrape(args.porta)
+
+                def delta(metric: str, contains: str = "") -> float:
+                    return total(after, metric, contains) - total(before, metric, contains)
+
+                answered = sum(statuses.values())
+                waits = delta("db_pool_checkout_wait_seconds_count", 'pool="async"')
+                results.append({
+                    "endpoint": target,
+                    "filters": "single-flight" if single_flight == "1" else "sem coalescência",
+                    "single_flight": single_flight == "1",
+                    **latency_summary(latencies),
+                    "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+                    "queries_per_request": round(delta("http_request_db_queries_total") / answered, 3) if answered else 0.0,
+                    "pool_checkouts": int(waits),
+                    "pool_wait_mean_ms": round(delta("db_pool_checkout_wait_seconds_sum", 'pool="async"')
+                                               / waits * 1000, 3) if waits else 0.0,
+                    "pool_peak_checked_out": int(peak),
+                    "stale": int(delta("stale_responses_total")),
+                    "errors": errors + sum(v for k, v in statuses.items() if k >= 400),
+                })
+        finally:
+            stop_server(proc)
+
+    print(f"CPUs: {os.cpu_count()}  concorrência: {args.concorrencia}  requisições por endpoint: {args.requisicoes}")
+    print_table(results, extra=("throughput_rps", "queries_per_request", "pool_wait_mean_ms",
+                                "pool_peak_checked_out", "stale"))
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("concorrencia", "requisicoes", "endpoints")}
+        config["cpus"] = os.cpu_count()
+        write_results(args.saida, "coalesce", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Utilidades compartilhadas pelos benchmarks: combinações de filtros,
+percentis e gravação dos resultados em JSON."""
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Sequence
+
+
+# Combinações de filtros exercitadas pelo frontend (vazio = "todos")
+FILTER_COMBOS: List[Dict[str, str]] = [
+    {},
+    {"ano": "2021"},
+    {"ano": "2021", "mes": "6"},
+    {"uf": "SP"},
+    {"ano": "2022", "uf": "SP"},
+    {"ano": "2021", "mes": "6", "uf": "RJ"},
+]
+
+ENDPOINTS = ["/overview", "/timeseries", "/ranking/ufs", "/dashboard"]
+
+
+def combo_label(params: Dict[str, str]) -> str:
+    return "&".join(f"{k}={v}" for k, v in sorted(params.items())) or "todos"
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Percentil por interpolação linear (como numpy.percentile)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(samples_s: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99/média/máximo em milissegundos."""
+    ms = [s * 1000 for s in samples_s]
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 4),
+        "p95_ms": round(percentile(ms, 95), 4),
+        "p99_ms": round(percentile(ms, 99), 4),
+        "mean_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+        "max_ms": round(max(ms), 4) if ms else 0.0,
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=here, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def write_results(path: str, kind: str, config: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+    """Grava os resultados com o commit e o ambiente, para `bench.compare`."""
+    document = {
+        "kind": kind,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+def print_table(results: List[Dict[str, Any]], extra: Sequence[str] = ()) -> None:
+    header = f"{'endpoint':<24}{'filtros':<28}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    header += "".join(f"{name:>16}" for name in extra)
+    print(header)
+    for r in results:
+        line = (
+            f"{r['endpoint']:<24}{r['filters']:<28}{r['n']:>7}"
+            f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+        )
+        line += "".join(f"{r.get(name, 0):>16.1f}" for name in extra)
+        print(line)
@@ -0,0 +1,69 @@
+"""Compara dois arquivos de resultados (`bench.handlers` ou `bench.load`).
+
+Casa as linhas por endpoint, filtros e cenário e aponta as que pioraram
+além do limite. Sai com código 1 se houver regressão, para uso em CI.
+
+    python -m bench.compare antes.json depois.json --metrica p95_ms --limite 15
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Tuple
+
+
+def _key(row: Dict[str, Any]) -> Tuple:
+    return row["endpoint"], row["filters"], row.get("scenario", "")
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _revision(doc: Dict[str, Any]) -> str:
+    git = doc.get("git") or {}
+    commit = (git.get("commit") or "?")[:10]
+    return commit + ("+sujo" if git.get("dirty") else "")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Aponta regressões entre dois resultados de benchmark.")
+    parser.add_argument("antes")
+    parser.add_argument("depois")
+    parser.add_argument("--metrica", default="p95_ms",
+                        help="campo comparado (p50_ms, p95_ms, p99_ms, throughput_rps...)")
+    parser.add_argument("--limite", type=float, default=10.0, help="piora tolerada, em %% (default 10)")
+    args = parser.parse_args(argv)
+
+    before, after = _load(args.antes), _load(args.depois)
+    if before.get("kind") != after.get("kind"):
+        print(f"Arquivos de tipos diferentes: {before.get('kind')} x {after.get('kind')}")
+        return 2
+    # Vazão: maior é melhor; latências: menor é melhor
+    higher_is_better = args.metrica.startswith("throughput")
+
+    old_rows = {_key(r): r for r in before["results"]}
+    print(f"{_revision(before)} -> {_revision(after)}  ({args.metrica}, limite {args.limite:.0f}%)")
+    regressions = 0
+    for row in after["results"]:
+        old = old_rows.get(_key(row))
+        if old is None or args.metrica not in row or not old.get(args.metrica):
+            continue
+        delta = (row[args.metrica] - old[args.metrica]) / old[args.metrica] * 100
+        worse = -delta if higher_is_better else delta
+        mark = ""
+        if worse > args.limite:
+            mark = "  REGRESSÃO"
+            regressions += 1
+        label = " ".join(p for p in _key(row) if p)
+        print(f"{label:<52}{old[args.metrica]:>12.3f}{row[args.metrica]:>12.3f}{delta:>+9.1f}%{mark}")
+
+    if regressions:
+        print(f"\n{regressions} regressões acima de {args.limite:.0f}%.")
+        return 1
+    print("\nSem regressões.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Gerador determinístico de `distribuicao_raw` com distribuições realistas.
+
+As UFs seguem a participação na população (Censo 2022), os anos concentram
+as remessas em 2021 e os meses de 2021 acompanham a rampa da campanha. QTDE
+segue uma lognormal (muitas remessas pequenas, poucas grandes). Com a mesma
+semente, o mesmo N gera exatamente as mesmas linhas.
+
+O CSV gerado é carregado com `load_distribuicao.load_file` (COPY em
+streaming, idempotente por ANO/MES, rollup reagregado ao final).
+
+    python -m bench.generate --linhas 5000000
+    python -m bench.generate --linhas 1000000 --limpar --manter /tmp/amostra.csv
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.rollup import create_rollup_table, refresh_rollup
+from app.schema import RAW_SCHEMA, RAW_TABLE
+from load_distribuicao import load_file
+
+
+# Milhões de habitantes (IBGE, Censo 2022), usados como peso de cada UF
+POPULACAO_UF: Dict[str, float] = {
+    "SP": 44.41, "MG": 20.54, "RJ": 16.05, "BA": 14.14, "PR": 11.44, "RS": 10.88,
+    "PE": 9.06, "CE": 8.79, "PA": 8.12, "SC": 7.61, "GO": 7.06, "MA": 6.78,
+    "PB": 3.97, "AM": 3.94, "ES": 3.83, "MT": 3.66, "RN": 3.30, "PI": 3.27,
+    "AL": 3.13, "DF": 2.82, "MS": 2.76, "SE": 2.21, "RO": 1.58, "TO": 1.51,
+    "AC": 0.83, "AP": 0.73, "RR": 0.64,
+}
+
+PESO_ANO: Dict[int, float] = {2021: 0.55, 2022: 0.25, 2023: 0.12, 2024: 0.08}
+
+# Peso de cada mês (jan..dez) por ano; anos ausentes usam PESO_MES_PADRAO
+PESO_MES: Dict[int, List[float]] = {
+    2021: [2, 4, 6, 9, 11, 12, 12, 11, 10, 9, 8, 6],
+    2022: [9, 8, 8, 7, 7, 6, 6, 6, 5, 5, 5, 4],
+}
+PESO_MES_PADRAO = [1.0] * 12
+
+INSUMOS = ["PFIZER", "ASTRAZENECA", "CORONAVAC", "JANSSEN"]
+PESO_INSUMO = [0.45, 0.30, 0.20, 0.05]
+
+BATCH = 100_000
+
+
+def generate_rows(rows: int, seed: int):
+    """Gera as linhas em blocos de BATCH (ANO, MES, SIGLA, QTDE, TX_INSUMO)."""
+    rng = random.Random(seed)
+    siglas = list(POPULACAO_UF)
+    pesos_uf = list(POPULACAO_UF.values())
+    anos = list(PESO_ANO)
+    pesos_ano = list(PESO_ANO.values())
+    remaining = rows
+    while remaining > 0:
+        n = min(BATCH, remaining)
+        remaining -= n
+        batch_anos = rng.choices(anos, pesos_ano, k=n)
+        batch_siglas = rng.choices(siglas, pesos_uf, k=n)
+        batch_insumos = rng.choices(INSUMOS, PESO_INSUMO, k=n)
+        meses_por_ano = {
+            ano: iter(rng.choices(range(1, 13), PESO_MES.get(ano, PESO_MES_PADRAO), k=batch_anos.count(ano)))
+            for ano in anos
+        }
+        for ano, sigla, insumo in zip(batch_anos, batch_siglas, batch_insumos):
+            qtde = max(1, int(rng.lognormvariate(7.0, 1.2)))
+            yield ano, next(meses_por_ano[ano]), sigla, qtde, insumo
+
+
+def write_csv(path: str, rows: int, seed: int, sep: str = ";") -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=sep)
+        writer.writerow(["ANO", "MES", "SIGLA", "QTDE", "TX_INSUMO"])
+        writer.writerows(generate_rows(rows, seed))
+
+
+def truncate_raw() -> None:
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL AS ok"),
+                              {"name": f"{RAW_SCHEMA}.{RAW_TABLE}"}).first().ok
+        if exists:
+            conn.execute(text(f"TRUNCATE {RAW_SCHEMA}.{RAW_TABLE}"))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Preenche distribuicao_raw com dados sintéticos realistas.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="quantidade de linhas (default 1 milhão)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true",
+                        help="esvazia distribuicao_raw antes (senão só os meses gerados são substituídos)")
+    parser.add_argument("--manter", metavar="ARQUIVO", help="grava o CSV neste caminho e não o apaga")
+    args = parser.parse_args(argv)
+
+    path = args.manter or tempfile.mkstemp(prefix="distribuicao_", suffix=".csv")[1]
+    try:
+        started = time.perf_counter()
+        write_csv(path, args.linhas, args.semente)
+        print(f"{args.linhas} linhas geradas em {time.perf_counter() - started:.1f}s ({path}).")
+
+        if args.limpar:
+            truncate_raw()
+        started = time.perf_counter()
+        inserted, _, periods = load_file(path, ";", "utf-8", refresh=not args.limpar)
+        if args.limpar:
+            # Meses que só existiam antes da limpeza também precisam sair do rollup
+            with engine.begin() as conn:
+                create_rollup_table(conn)
+                refresh_rollup(conn)
+        elapsed = time.perf_counter() - started
+        print(f"{inserted} linhas carregadas em {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):,.0f} linhas/s), "
+              f"{len(periods)} meses.")
+    finally:
+        if not args.manter and os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
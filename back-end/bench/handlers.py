@@ -0,0 +1,117 @@
+"""Micro-benchmark dos handlers de `app/main.py`, chamados diretamente (sem
+HTTP), para cada combinação de filtros.
+
+Cada handler é medido em dois cenários:
+
+- `frio`: cache de respostas limpo antes de cada chamada (custo da consulta);
+- `quente`: resposta servida do cache (custo do caminho de hit).
+
+    python -m bench.handlers --repeticoes 200 --saida handlers.json
+"""
+import argparse
+import asyncio
+import inspect
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from starlette.requests import Request
+
+from app import main as api
+from app.cache import response_cache
+from app.database import AsyncSessionLocal, async_engine
+
+from .common import FILTER_COMBOS, combo_label, latency_summary, print_table, write_results
+
+
+HANDLERS: Dict[str, Callable] = {
+    "/overview": api.get_overview,
+    "/timeseries": api.get_timeseries,
+    "/ranking/ufs": api.get_ranking_ufs,
+    "/dashboard": api.get_dashboard,
+    "/debug/distrib_total": api.debug_distrib_total,
+    "/debug/distrib_series": api.debug_distrib_series,
+}
+
+
+def fake_request(path: str, params: Dict[str, str]) -> Request:
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query.encode(),
+        "headers": [(b"accept-encoding", b"gzip")],
+    })
+
+
+def handler_kwargs(handler: Callable, path: str, params: Dict[str, str], db) -> Dict[str, Any]:
+    """Argumentos como o FastAPI passaria: filtros da query, defaults dos
+    `Query(...)`, o Request e a sessão."""
+    kwargs = {}
+    for name, p in inspect.signature(handler).parameters.items():
+        if name == "request":
+            kwargs[name] = fake_request(path, params)
+        elif name == "db":
+            kwargs[name] = db
+        elif name in params:
+            kwargs[name] = params[name]
+        else:
+            default = p.default
+            kwargs[name] = getattr(default, "default", default)
+    return kwargs
+
+
+async def measure(handler: Callable, path: str, params: Dict[str, str], repeat: int, cold: bool) -> List[float]:
+    samples = []
+    async with AsyncSessionLocal() as db:
+        # Uma chamada de aquecimento (pool, ColumnMap, versão dos dados)
+        await handler(**handler_kwargs(handler, path, params, db))
+        for _ in range(repeat):
+            if cold:
+                response_cache.clear()
+            kwargs = handler_kwargs(handler, path, params, db)
+            started = time.perf_counter()
+            await handler(**kwargs)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(repeat: int, endpoints: List[str]) -> List[Dict[str, Any]]:
+    results = []
+    try:
+        for path in endpoints:
+            handler = HANDLERS[path]
+            for params in FILTER_COMBOS:
+                for scenario in ("frio", "quente"):
+                    samples = await measure(handler, path, params, repeat, cold=scenario == "frio")
+                    results.append({
+                        "endpoint": path,
+                        "filters": combo_label(params),
+                        "scenario": scenario,
+                        **latency_summary(samples),
+                    })
+    finally:
+        await async_engine.dispose()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark dos handlers da API.")
+    parser.add_argument("--repeticoes", type=int, default=100, help="chamadas por handler/filtro/cenário")
+    parser.add_argument("--endpoints", nargs="*", default=list(HANDLERS), choices=list(HANDLERS))
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args.repeticoes, args.endpoints))
+    for scenario in ("frio", "quente"):
+        print(f"\n== {scenario} ==")
+        print_table([r for r in results if r["scenario"] == scenario])
+    if args.saida:
+        write_results(args.saida, "handlers", {"repeticoes": args.repeticoes}, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Driver de carga HTTP concorrente (apenas biblioteca padrão).
+
+Para cada endpoint e combinação de filtros, `--concorrencia` threads com
+conexões keep-alive disparam `--requisicoes` requisições no total. Relata
+p50/p95/p99, vazão (req/s) e erros.
+
+    uvicorn app.main:app --port 8000 &
+    python -m bench.load --url http://127.0.0.1:8000 --concorrencia 16 --saida carga.json
+"""
+import argparse
+import http.client
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from .common import ENDPOINTS, FILTER_COMBOS, combo_label, latency_summary, print_table, write_results
+
+
+def _connection(base_url: str, timeout: float) -> http.client.HTTPConnection:
+    parts = urlsplit(base_url)
+    cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    return cls(parts.hostname, parts.port, timeout=timeout)
+
+
+def run_case(base_url: str, path: str, params: Dict[str, str], requests: int, concurrency: int,
+             timeout: float, headers: Dict[str, str]) -> Tuple[List[float], Dict[int, int], int]:
+    """Dispara `requests` GETs com `concurrency` threads.
+
+    Retorna (latências em segundos das respostas 2xx/304, contagem por status,
+    erros de conexão).
+    """
+    prefix = urlsplit(base_url).path.rstrip("/")
+    target = prefix + path + (f"?{urlencode(params)}" if params else "")
+    remaining = [requests]
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    errors = [0]
+
+    def worker():
+        conn = _connection(base_url, timeout)
+        local_lat, local_status, local_errors = [], {}, 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                conn.request("GET", target, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = _connection(base_url, timeout)
+                continue
+            elapsed = time.perf_counter() - started
+            local_status[resp.status] = local_status.get(resp.status, 0) + 1
+            if resp.status < 400:
+                local_lat.append(elapsed)
+        conn.close()
+        with lock:
+            latencies.extend(local_lat)
+            for status, count in local_status.items():
+                statuses[status] = statuses.get(status, 0) + count
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, statuses, errors[0]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga HTTP dos endpoints do dashboard.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL base da API")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--requisicoes", type=int, default=500, help="requisições por endpoint/filtro")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--endpoints", nargs="*", default=ENDPOINTS)
+    parser.add_argument("--sem-gzip", action="store_true", help="não enviar Accept-Encoding: gzip")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    headers = {} if args.sem_gzip else {"Accept-Encoding": "gzip"}
+    results: List[Dict[str, Any]] = []
+    for path in args.endpoints:
+        for params in FILTER_COMBOS:
+            started = time.perf_counter()
+            latencies, statuses, errors = run_case(
+                args.url, path, params, args.requisicoes, args.concorrencia, args.timeout, headers
+            )
+            wall = time.perf_counter() - started
+            results.append({
+                "endpoint": path,
+                "filters": combo_label(params),
+                **latency_summary(latencies),
+                "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+                "statuses": {str(k): v for k, v in sorted(statuses.items())},
+                "errors": errors,
+            })
+
+    print_table(results, extra=("throughput_rps",))
+    failed = sum(r["errors"] + sum(v for k, v in r["statuses"].items() if int(k) >= 400) for r in results)
+    if failed:
+        print(f"\n{failed} requisições com erro ou status >= 400.")
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("url", "concorrencia", "requisicoes", "sem_gzip")}
+        write_results(args.saida, "load", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
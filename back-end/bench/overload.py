@@ -0,0 +1,193 @@
+"""Sobrecarga de `/ranking/ufs` com e sem controle de admissão (app/admission.py).
+
+O servidor sobe (1 worker, motor SQL, cache de respostas desligado) uma vez
+com `ADMISSION_CONTROL=0` e outra com `ADMISSION_CONTROL=1`. Durante
+`--segundos`, `--concorrencia` clientes pedem `/ranking/ufs` com filtro de
+fabricante (agregação no rollup, o caminho caro), cada um com uma combinação
+diferente de ano/mês/fabricante para não cair na coalescência; ao mesmo
+tempo, uma sonda pede `/health` e `/fabricantes` a cada `--intervalo`
+segundos. Os clientes da rajada respeitam o `Retry-After` dos 503 (com
+`--ignorar-retry-after`, repetem na hora). Relata as latências da sonda (o
+que o healthcheck do Render vê), os status da rajada e, do /metrics, as
+requisições recusadas, enfileiradas e servidas como stale.
+
+    python -m bench.overload --concorrencia 64 --segundos 20 --saida overload.json
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from itertools import cycle, product
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlencode
+
+from .coalesce import scrape, total
+from .common import latency_summary, print_table, write_results
+from .workers import start_server, stop_server, wait_ready
+
+
+def _get(conn: http.client.HTTPConnection, path: str) -> Tuple[int, bytes, float]:
+    """(status, corpo, Retry-After em segundos ou 0)."""
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    body = resp.read()
+    try:
+        retry_after = float(resp.getheader("Retry-After") or 0)
+    except ValueError:
+        retry_after = 0.0
+    return resp.status, body, retry_after
+
+
+class Flood:
+    """`concurrency` clientes repetindo os caminhos de `paths` até `stop`."""
+
+    def __init__(self, port: int, paths: List[str], concurrency: int, timeout: float, honor_retry_after: bool):
+        self.port = port
+        self.honor_retry_after = honor_retry_after
+        self.paths = cycle(paths)
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.latencies: Dict[int, List[float]] = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(concurrency)]
+
+    def _worker(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        while not self._done.is_set():
+            with self._lock:
+                path = next(self.paths)
+            started = time.perf_counter()
+            try:
+                status, _, retry_after = _get(conn, path)
+            except (OSError, http.client.HTTPException):
+                with self._lock:
+                    self.errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+                continue
+            with self._lock:
+                self.latencies.setdefault(status, []).append(time.perf_counter() - started)
+            if status == 503 and self.honor_retry_after:
+                # Cliente bem-comportado: espera o Retry-After antes de tentar de novo
+                self._done.wait(retry_after)
+        conn.close()
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._done.set()
+        for t in self._threads:
+            t.join()
+
+
+def probe(port: int, path: str, seconds: float, interval: float, timeout: float) -> Tuple[List[float], int]:
+    """Uma requisição a `path` por intervalo, em conexão nova (como o
+    healthcheck); devolve latências das respostas 200 e falhas."""
+    latencies, failures = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            status, _, _ = _get(conn, path)
+            conn.close()
+        except (OSError, http.client.HTTPException):
+            status = 0
+        elapsed = time.perf_counter() - started
+        if status == 200:
+            latencies.append(elapsed)
+        else:
+            failures += 1
+        time.sleep(max(0.0, interval - elapsed))
+    return latencies, failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sobrecarga de /ranking/ufs com e sem controle de admissão.")
+    parser.add_argument("--porta", type=int, default=8023)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    parser.add_argument("--segundos", type=float, default=20.0)
+    parser.add_argument("--intervalo", type=float, default=0.1, help="intervalo da sonda (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="timeout do cliente (o do Render é 5 s)")
+    parser.add_argument("--ignorar-retry-after", action="store_true",
+                        help="clientes da rajada repetem o 503 na hora (pior caso)")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for admission in ("0", "1"):
+        env = dict(os.environ, QUERY_ENGINE="sql", CACHE_TTL_SECONDS="0", ADMISSION_CONTROL=admission)
+        proc = start_server(1, args.porta, env)
+        label = "com admissão" if admission == "1" else "sem admissão"
+        try:
+            if not wait_ready(args.porta, 60):
+                print("Servidor não respondeu ao /health.")
+                return 1
+            conn = http.client.HTTPConnection("127.0.0.1", args.porta, timeout=args.timeout)
+            codigos = [f["codigo"] for f in json.loads(_get(conn, "/fabricantes")[1])["data"]]
+            conn.close()
+            paths = [
+                "/ranking/ufs?" + urlencode({"fabricante": codigo, "ano": ano, "mes": mes})
+                for codigo, ano, mes in product(codigos, (2021, 2022, 2023), range(1, 13))
+            ]
+
+            before = scrape(args.porta)
+            flood = Flood(args.porta, paths, args.concorrencia, args.timeout, not args.ignorar_retry_after)
+            flood.start()
+            probes: Dict[str, Tuple[List[float], int]] = {}
+            threads = [
+                threading.Thread(
+                    target=lambda p=p: probes.__setitem__(p, probe(args.porta, p, args.segundos, args.intervalo,
+                                                                   args.timeout)),
+                    daemon=True,
+                )
+                for p in ("/health", "/fabricantes")
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            flood.stop()
+            after = scrape(args.porta)
+
+            def delta(metric: str, contains: str = "") -> float:
+                return total(after, metric, contains) - total(before, metric, contains)
+
+            for path, (latencies, failures) in probes.items():
+                results.append({"endpoint": path, "filters": label, "admission": admission == "1",
+                                **latency_summary(latencies), "failures": failures})
+            ok = flood.latencies.get(200, [])
+            results.append({
+                "endpoint": "/ranking/ufs (rajada)",
+                "filters": label,
+                "admission": admission == "1",
+                **latency_summary(ok),
+                "failures": flood.errors + sum(len(v) for k, v in flood.latencies.items() if k != 200),
+                "status_503": len(flood.latencies.get(503, [])),
+                "p50_503_ms": round(latency_summary(flood.latencies.get(503, []))["p50_ms"], 3),
+                "rejected": int(delta("admission_rejected_total")),
+                "queued": int(delta("admission_queued_total")),
+                "stale": int(delta("stale_responses_total")),
+            })
+        finally:
+            stop_server(proc)
+
+    print(f"CPUs: {os.cpu_count()}  concorrência: {args.concorrencia}  duração: {args.segundos}s")
+    print_table(results, extra=("failures", "status_503", "p50_503_ms", "rejected", "queued", "stale"))
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("concorrencia", "segundos", "intervalo", "timeout", "ignorar_retry_after")}
+        config["cpus"] = os.cpu_count()
+        write_results(args.saida, "overload", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
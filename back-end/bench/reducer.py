@@ -0,0 +1,93 @@
+"""Vazão do redutor de microdados (load_aplicacao.py) com 1..N processos.
+
+Gera (ou usa) um arquivo de microdados e mede só a redução — leitura,
+parse do CSV e contagem —, sem gravar no banco. Relata linhas/s no total e
+por processo, e o ganho em relação ao primeiro valor de `--processos`.
+
+    python -m bench.reducer --linhas 5000000 --processos 1 2 4 --saida reducer.json
+    python -m bench.reducer --arquivo dados/vacinacao_SP.csv --processos 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from load_aplicacao import DEFAULT_BLOCK_MB, generate_sample, normalize, reduce_files
+
+from .common import write_results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Linhas/s do redutor de microdados com 1..N processos.")
+    parser.add_argument("--arquivo", help="microdados existentes (default: gera um arquivo sintético)")
+    parser.add_argument("--linhas", type=int, default=2_000_000, help="linhas do arquivo sintético")
+    parser.add_argument("--gzip", action="store_true", help="gerar o arquivo sintético comprimido (.csv.gz)")
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--bloco-mb", type=int, default=DEFAULT_BLOCK_MB)
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por valor (vale a melhor)")
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    path = args.arquivo
+    generated = None
+    if path is None:
+        suffix = ".csv.gz" if args.gzip else ".csv"
+        fd, generated = tempfile.mkstemp(prefix="microdados-", suffix=suffix)
+        os.close(fd)
+        path = generated
+        started = time.perf_counter()
+        generate_sample(path, args.linhas)
+        print(f"{args.linhas} linhas sintéticas geradas em {time.perf_counter() - started:.1f}s ({path}).")
+
+    results: List[Dict[str, Any]] = []
+    try:
+        size_mb = os.path.getsize(path) / (1 << 20)
+        baseline = None
+        for processes in args.processos:
+            best = None
+            for _ in range(args.repeticoes):
+                started = time.perf_counter()
+                raw, blocks = reduce_files([path], "doses", processes, block_mb=args.bloco_mb)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            rows = sum(raw.values())
+            groups = len(normalize(raw)[0])
+            rate = rows / best if best > 0 else 0.0
+            baseline = baseline or rate
+            results.append({
+                "endpoint": "load_aplicacao",
+                "filters": f"{processes} processos",
+                "processes": processes,
+                "rows": rows,
+                "blocks": blocks,
+                "groups": groups,
+                "seconds": round(best, 3),
+                "throughput_rows_s": round(rate, 1),
+                "throughput_rows_s_per_process": round(rate / processes, 1),
+                "throughput_mb_s": round(size_mb / best, 2) if best > 0 else 0.0,
+                "speedup": round(rate / baseline, 2) if baseline else 0.0,
+            })
+    finally:
+        if generated is not None:
+            os.unlink(generated)
+
+    print(f"CPUs: {os.cpu_count()}  arquivo: {size_mb:.0f} MiB  blocos de {args.bloco_mb} MiB")
+    print(f"{'processos':>10}{'linhas':>12}{'grupos':>8}{'s':>9}{'linhas/s':>14}{'por processo':>14}"
+          f"{'MiB/s':>9}{'ganho':>8}")
+    for r in results:
+        print(f"{r['processes']:>10}{r['rows']:>12}{r['groups']:>8}{r['seconds']:>9.2f}"
+              f"{r['throughput_rows_s']:>14,.0f}{r['throughput_rows_s_per_process']:>14,.0f}"
+              f"{r['throughput_mb_s']:>9.1f}{r['speedup']:>8.2f}")
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("linhas", "gzip", "processos", "bloco_mb", "repeticoes")}
+        config["arquivo"] = args.arquivo
+        config["cpus"] = os.cpu_count()
+        write_results(args.saida, "reducer", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
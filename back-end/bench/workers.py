@@ -0,0 +1,133 @@
+"""Escalabilidade da vazão com o número de workers do Gunicorn.
+
+Para cada valor de `--workers`, sobe o Gunicorn (UvicornWorker) na mesma
+máquina, espera o `/health` e dispara a carga de `bench.load` contra cada
+endpoint, alternando as combinações de filtros. Relata vazão, latências e o
+ganho em relação ao primeiro valor da lista.
+
+Por padrão o cache de respostas fica desligado (`CACHE_TTL_SECONDS=0`), para
+medir o motor de consulta e não o LRU; e o motor é o snapshot compartilhado
+(`QUERY_ENGINE=mmap`).
+
+    python -m bench.workers --workers 1 2 4 --concorrencia 32 --saida workers.json
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from .common import ENDPOINTS, FILTER_COMBOS, latency_summary, print_table, write_results
+from .load import run_case
+
+
+BACK_END_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "app.main:app",
+            "--workers", str(workers),
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--bind", f"127.0.0.1:{port}",
+            "--log-level", "warning",
+        ],
+        cwd=BACK_END_DIR,
+        env=env,
+    )
+
+
+def wait_ready(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return True
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.25)
+    return False
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Vazão dos endpoints com 1..N workers do Gunicorn.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--porta", type=int, default=8020)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--requisicoes", type=int, default=2000, help="requisições por endpoint")
+    parser.add_argument("--endpoints", nargs="*", default=ENDPOINTS)
+    parser.add_argument("--motor", default="mmap", help="QUERY_ENGINE dos workers (sql | numpy | mmap)")
+    parser.add_argument("--com-cache", action="store_true", help="manter o cache de respostas ligado")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--saida", help="arquivo JSON de resultados (para bench.compare)")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, QUERY_ENGINE=args.motor)
+    if not args.com_cache:
+        env["CACHE_TTL_SECONDS"] = "0"
+    base_url = f"http://127.0.0.1:{args.porta}"
+    per_combo = max(1, args.requisicoes // len(FILTER_COMBOS))
+
+    results: List[Dict[str, Any]] = []
+    baseline: Dict[str, float] = {}
+    for workers in args.workers:
+        proc = start_server(workers, args.porta, env)
+        try:
+            if not wait_ready(args.porta, 60):
+                print(f"Servidor com {workers} workers não respondeu ao /health.")
+                return 1
+            for path in args.endpoints:
+                # Aquecimento: carga do snapshot em todos os workers
+                for params in FILTER_COMBOS:
+                    run_case(base_url, path, params, workers * 4, workers, args.timeout, {})
+
+                latencies, failed = [], 0
+                started = time.perf_counter()
+                for params in FILTER_COMBOS:
+                    lat, statuses, errors = run_case(
+                        base_url, path, params, per_combo, args.concorrencia, args.timeout, {}
+                    )
+                    latencies.extend(lat)
+                    failed += errors + sum(v for k, v in statuses.items() if k >= 400)
+                wall = time.perf_counter() - started
+                throughput = len(latencies) / wall if wall > 0 else 0.0
+                baseline.setdefault(path, throughput)
+                results.append({
+                    "endpoint": path,
+                    # Todas as combinações de filtros; a linha se distingue pelo nº de workers
+                    "filters": f"{workers} workers",
+                    "workers": workers,
+                    **latency_summary(latencies),
+                    "throughput_rps": round(throughput, 2),
+                    "speedup": round(throughput / baseline[path], 2) if baseline[path] else 0.0,
+                    "errors": failed,
+                })
+        finally:
+            stop_server(proc)
+
+    print(f"CPUs: {os.cpu_count()}  motor: {args.motor}  cache: {'ligado' if args.com_cache else 'desligado'}")
+    print_table(results, extra=("throughput_rps", "speedup"))
+    if args.saida:
+        config = {k: getattr(args, k) for k in ("workers", "concorrencia", "requisicoes", "motor", "com_cache")}
+        config["cpus"] = os.cpu_count()
+        write_results(args.saida, "workers", config, results)
+        print(f"\nResultados gravados em {args.saida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,4 +9,4 @@ echo "Starting Gunicorn via python -m gunicorn..."
 # Chamada final deve delegar ao Gunicorn usando o module runner do Python —
 # formato recomendado para plataformas como Render. A variável ${PORT}
 # é usada para binding no ambiente de execução.
-exec python -m gunicorn app.main:app --workers 1 --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT}
+exec python -m gunicorn app.main:app --workers ${WEB_CONCURRENCY:-1} --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT}
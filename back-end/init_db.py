@@ -3,7 +3,9 @@
 Este script é executado pelo entrypoint do container para garantir que o backend
 tenha tabelas mínimas para responder com dados reais (não apenas mock).
 """
-from app.database import engine, Base, SessionLocal, EstadoSnapshot, TimePoint
+from app.database import engine, Base, SessionLocal, TimePoint
+from app.estados import ensure_estado_tables
+from app.rollup import create_rollup_table, refresh_rollup
 from sqlalchemy.orm import Session
 import random
 
@@ -12,19 +14,6 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
 
 
-def seed_estado_snapshot(db: Session):
-    # Inserir alguns estados de exemplo
-    samples = [
-        ("SP", "São Paulo", 40000000, 35000000, 87.5),
-        ("RJ", "Rio de Janeiro", 18000000, 15000000, 83.3),
-        ("MG", "Minas Gerais", 20000000, 17000000, 85.0),
-    ]
-    objs = []
-    for uf, nome, dist, aplic, ef in samples:
-        objs.append(EstadoSnapshot(uf=uf, nome=nome, distribuídas=dist, aplicadas=aplic, eficiência=ef))
-    db.add_all(objs)
-
-
 def seed_timeseries(db: Session):
     # Inserir série mensal de exemplo para BR e SP
     objs = []
@@ -50,17 +39,15 @@ def main():
     print("Creating tables (if not exists)...")
     create_tables()
 
+    # Estados com a população do Censo 2022; `estado_snapshot` é calculado
+    # junto com o rollup, logo abaixo (ver app/estados.py)
+    with engine.begin() as conn:
+        ensure_estado_tables(conn)
+
     db = SessionLocal()
     try:
-        has_snapshot = db.query(EstadoSnapshot).first() is not None
         has_timeseries = db.query(TimePoint).first() is not None
 
-        if not has_snapshot:
-            print("Seeding estado_snapshot...")
-            seed_estado_snapshot(db)
-        else:
-            print("estado_snapshot already has data, skipping seeding.")
-
         if not has_timeseries:
             print("Seeding timeseries (sample)...")
             seed_timeseries(db)
@@ -74,6 +61,16 @@ def main():
     finally:
         db.close()
 
+    # Recalcular o rollup de distribuicao_raw usado pelos endpoints do dashboard
+    # (com a coluna de fabricante e a view `vacinacao_rollup` lida pelo snapshot)
+    try:
+        create_rollup_table()
+        with engine.begin() as conn:
+            rows = refresh_rollup(conn)
+        print(f"Rollup distribuicao_rollup recalculado ({rows} grupos).")
+    except Exception as e:
+        print("Aviso: não foi possível recalcular distribuicao_rollup:", e)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,331 @@
+"""Redução em paralelo dos microdados de vacinação a contadores de doses e ESAVI.
+
+Os microdados de aplicação (um registro por dose, centenas de milhões de
+linhas) e de notificações de ESAVI não cabem no Postgres do projeto. Este
+script os lê em blocos, num pool de processos, e conta as linhas por (data,
+UF, fabricante); só os contadores — alguns milhares de grupos — vão para o
+banco, em `aplicacao_rollup` (ver app/aplicacao.py), e `estado_snapshot` e
+`timeseries` são recalculados com a eficiência real.
+
+A memória usada não depende do tamanho dos arquivos: cada processo tem no
+máximo um bloco de `--bloco-mb` em mãos, e o processo principal só guarda os
+contadores. Arquivos `.csv` são divididos em faixas de bytes que cada
+processo lê por conta própria; arquivos `.csv.gz` (que não permitem seek) são
+descomprimidos pelo processo principal e os blocos, enviados aos processos.
+Os blocos são cortados em quebras de linha, então campos com quebra de linha
+entre aspas não são suportados (os microdados do OpenDataSUS não as têm).
+
+A carga substitui, para a medida do `--tipo`, os (ano, mes, UF) presentes nos
+arquivos: todos os arquivos de uma UF (o OpenDataSUS divide as maiores em
+partes) devem ser informados na mesma execução.
+
+Uso (a partir de `back-end/`):
+
+    python load_aplicacao.py --tipo doses dados/vacinacao_SP_*.csv
+    python load_aplicacao.py --tipo esavi --processos 4 dados/esavi.csv.gz
+
+    # arquivo sintético para benchmark (ver bench/reducer.py)
+    python load_aplicacao.py --gerar 5000000 /tmp/microdados.csv
+"""
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from datetime import date, timedelta
+from multiprocessing import Pool
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.aplicacao import MEDIDAS, merge_counts, refresh_state_tables
+from app.database import Estado, EstadoSnapshot, TimePoint, engine
+from app.fabricantes import ensure_fabricantes
+from app.rollup import bump_data_version, create_rollup_table
+from app.schema import match_column
+
+
+# Tamanho de cada bloco entregue a um processo
+DEFAULT_BLOCK_MB = 16
+
+# Colunas lógicas -> nomes aceitos no cabeçalho, por tipo de microdado
+# (primeiro o nome usado pelo OpenDataSUS)
+COLUMN_CANDIDATES = {
+    "doses": {
+        "data": ["vacina_dataAplicacao", "DT_APLICACAO", "data_aplicacao"],
+        "uf": ["estabelecimento_uf", "paciente_endereco_uf", "SG_UF", "UF", "SIGLA"],
+        "fabricante": ["vacina_fabricante_nome", "vacina_fabricante", "FABRICANTE", "TX_INSUMO"],
+    },
+    "esavi": {
+        "data": ["DATA_APLICACAO_VACINA", "DT_APLICACAO", "vacina_dataAplicacao", "DATA_NOTIFICACAO",
+                 "DT_NOTIFICACAO"],
+        "uf": ["UF_NOTIFICACAO", "SG_UF_NOTIFICACAO", "estabelecimento_uf", "SG_UF", "UF"],
+        "fabricante": ["FABRICANTE_VACINA", "vacina_fabricante_nome", "FABRICANTE", "TX_INSUMO"],
+    },
+}
+
+SIGLAS = [
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+]
+
+# Os processos contam por textos crus de (data, UF, fabricante); linhas curtas
+# demais contam em SHORT_ROW
+SHORT_ROW = ("",)
+
+
+def read_header(path: str, sep: str, encoding: str) -> Tuple[List[str], int]:
+    """Cabeçalho e o tamanho em bytes da linha de cabeçalho."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        line = f.readline()
+    if not line.strip():
+        raise RuntimeError(f"{path}: arquivo vazio ou sem cabeçalho.")
+    header = next(csv.reader([line.decode(encoding, errors="replace")], delimiter=sep))
+    return [h.strip().lstrip("\ufeff") for h in header], len(line)
+
+
+def map_columns(header: List[str], tipo: str) -> Tuple[int, int, Optional[int]]:
+    """Índices das colunas de data, UF e (se houver) fabricante."""
+    available = {name: "" for name in header}
+    candidates = COLUMN_CANDIDATES[tipo]
+    indexes = {}
+    for logical in ("data", "uf", "fabricante"):
+        name = match_column(candidates[logical], available)
+        indexes[logical] = header.index(name) if name is not None else None
+    missing = [logical for logical in ("data", "uf") if indexes[logical] is None]
+    if missing:
+        raise RuntimeError(f"Colunas ausentes no CSV: {', '.join(missing)} (cabeçalho: {', '.join(header)})")
+    return indexes["data"], indexes["uf"], indexes["fabricante"]
+
+
+# ====== Trabalho dos processos ======
+
+def count_block(data: bytes, columns: Tuple[int, int, Optional[int]], sep: str, encoding: str) -> Counter:
+    """Conta as linhas de um bloco por (data, UF, fabricante) crus."""
+    indexes = [i for i in columns if i is not None]
+    key = itemgetter(*indexes)
+    rows = csv.reader(io.StringIO(data.decode(encoding, errors="replace"), newline=""), delimiter=sep)
+    counts: Counter = Counter()
+    try:
+        # Caminho rápido: a contagem roda em C (Counter sobre o map)
+        counts.update(map(key, rows))
+    except IndexError:
+        # Alguma linha curta: recontar o bloco linha a linha
+        width = max(indexes) + 1
+        counts = Counter()
+        rows = csv.reader(io.StringIO(data.decode(encoding, errors="replace"), newline=""), delimiter=sep)
+        for row in rows:
+            if len(row) >= width:
+                counts[key(row)] += 1
+            elif row:
+                counts[SHORT_ROW] += 1
+    return counts
+
+
+def count_range(path: str, start: int, end: int, columns, sep: str, encoding: str) -> Counter:
+    """Conta as linhas que começam na faixa de bytes [start, end) do arquivo."""
+    with open(path, "rb") as f:
+        f.seek(max(start - 1, 0))
+        if start > 0:
+            # Pula o restante da linha anterior (ela pertence à faixa de antes)
+            f.readline()
+        position = f.tell()
+        if position >= end:
+            return Counter()
+        data = f.read(end - position)
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+    return count_block(data, columns, sep, encoding)
+
+
+# ====== Divisão dos arquivos e redução ======
+
+def file_ranges(path: str, header_size: int, block_bytes: int) -> Iterator[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    for start in range(header_size, size, block_bytes):
+        yield start, min(start + block_bytes, size)
+
+
+def gzip_blocks(path: str, block_bytes: int) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as f:
+        f.readline()  # cabeçalho
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                return
+            if not data.endswith(b"\n"):
+                data += f.readline()
+            yield data
+
+
+def file_tasks(path: str, tipo: str, sep: str, encoding: str, block_bytes: int) -> Iterator[Tuple]:
+    """(função, argumentos) de cada bloco do arquivo."""
+    header, header_size = read_header(path, sep, encoding)
+    columns = map_columns(header, tipo)
+    if path.endswith(".gz"):
+        for data in gzip_blocks(path, block_bytes):
+            yield count_block, (data, columns, sep, encoding)
+    else:
+        for start, end in file_ranges(path, header_size, block_bytes):
+            yield count_range, (path, start, end, columns, sep, encoding)
+
+
+def reduce_files(paths: List[str], tipo: str, processes: int, sep: str = ";", encoding: str = "utf-8",
+                 block_mb: int = DEFAULT_BLOCK_MB) -> Tuple[Counter, int]:
+    """Contadores crus de todos os arquivos e o número de blocos processados.
+
+    Com `processes` > 1 os blocos vão para um pool; no máximo 2 blocos por
+    processo ficam pendentes, o que limita a memória.
+    """
+    # Cabeçalhos lidos antes de subir o pool: um arquivo inválido falha logo
+    for path in paths:
+        map_columns(read_header(path, sep, encoding)[0], tipo)
+    tasks = itertools.chain.from_iterable(
+        file_tasks(path, tipo, sep, encoding, block_mb << 20) for path in paths
+    )
+
+    totals: Counter = Counter()
+    blocks = 0
+    if processes <= 1:
+        for func, args in tasks:
+            totals.update(func(*args))
+            blocks += 1
+        return totals, blocks
+
+    with Pool(processes) as pool:
+        pending = deque()
+        for func, args in tasks:
+            pending.append(pool.apply_async(func, args))
+            if len(pending) >= 2 * processes:
+                totals.update(pending.popleft().get())
+                blocks += 1
+        while pending:
+            totals.update(pending.popleft().get())
+            blocks += 1
+    return totals, blocks
+
+
+def parse_month(value: str) -> Optional[Tuple[int, int]]:
+    """(ano, mes) de uma data ISO (`2021-03-15`, com ou sem hora) ou
+    brasileira (`15/03/2021`); None se inválida."""
+    value = value.strip()
+    try:
+        if len(value) >= 10 and value[4] == "-":
+            ano, mes = int(value[:4]), int(value[5:7])
+        elif len(value) >= 10 and value[2] == "/":
+            ano, mes = int(value[6:10]), int(value[3:5])
+        else:
+            return None
+    except ValueError:
+        return None
+    return (ano, mes) if 1 <= mes <= 12 else None
+
+
+def normalize(raw: Counter) -> Tuple[Dict[Tuple[int, int, Optional[str], Optional[str]], int], int]:
+    """Contadores por (ano, mes, UF, texto do fabricante) e as linhas
+    descartadas (sem data válida ou curtas demais)."""
+    counts: Dict[Tuple[int, int, Optional[str], Optional[str]], int] = Counter()
+    rejected = 0
+    for key, n in raw.items():
+        if key == SHORT_ROW:
+            rejected += n
+            continue
+        month = parse_month(key[0])
+        if month is None:
+            rejected += n
+            continue
+        uf = key[1].strip().upper()
+        fabricante = key[2].strip() if len(key) > 2 and key[2].strip() else None
+        counts[(month[0], month[1], uf if len(uf) == 2 else None, fabricante)] += n
+    return counts, rejected
+
+
+def write_counts(counts, tipo: str) -> Tuple[int, int, int]:
+    """Grava os contadores e recalcula as tabelas dos estados numa transação.
+
+    Retorna (grupos gravados, estados, pontos da série)."""
+    with engine.begin() as conn:
+        create_rollup_table(conn)
+        for model in (Estado, EstadoSnapshot, TimePoint):
+            model.__table__.create(bind=conn, checkfirst=True)
+        ids = ensure_fabricantes(conn, {fabricante for _, _, _, fabricante in counts})
+        by_id: Dict[Tuple[int, int, Optional[str], Optional[int]], int] = Counter()
+        for (ano, mes, uf, fabricante), n in counts.items():
+            by_id[(ano, mes, uf, ids.get(fabricante))] += n
+        groups = merge_counts(conn, by_id, MEDIDAS[tipo])
+        estados, pontos = refresh_state_tables(conn)
+        bump_data_version(conn)
+    return groups, estados, pontos
+
+
+def generate_sample(path: str, rows: int, tipo: str = "doses", seed: int = 42, sep: str = ";") -> None:
+    """Gera microdados sintéticos (determinísticos) no layout do OpenDataSUS."""
+    rng = random.Random(seed)
+    opener = (lambda: gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=1)) \
+        if path.endswith(".gz") else (lambda: open(path, "w", encoding="utf-8", newline=""))
+    candidates = COLUMN_CANDIDATES[tipo]
+    first_day = date(2021, 1, 17)
+    days = [(first_day + timedelta(days=i)).isoformat() for i in range((date(2024, 12, 31) - first_day).days + 1)]
+    fabricantes = ["PFIZER", "ASTRAZENECA/FIOCRUZ", "SINOVAC/BUTANTAN", "JANSSEN"]
+    doses = ["1ª Dose", "2ª Dose", "Reforço"]
+    with opener() as f:
+        writer = csv.writer(f, delimiter=sep)
+        writer.writerow(["document_id", "paciente_idade", candidates["uf"][0], candidates["fabricante"][0],
+                         candidates["data"][0], "vacina_descricao_dose"])
+        for i in range(rows):
+            writer.writerow([
+                f"{seed:04d}{i:012d}", rng.randint(5, 99), rng.choice(SIGLAS), rng.choice(fabricantes),
+                rng.choice(days), rng.choice(doses),
+            ])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reduz microdados de vacinação a contadores de doses/ESAVI.")
+    parser.add_argument("arquivos", nargs="*", help="CSV(s) de microdados (.csv ou .csv.gz)")
+    parser.add_argument("--tipo", choices=("doses", "esavi"), default="doses",
+                        help="doses aplicadas (default) ou notificações de ESAVI")
+    parser.add_argument("--processos", type=int, default=os.cpu_count() or 1,
+                        help="processos do pool (default: nº de CPUs)")
+    parser.add_argument("--bloco-mb", type=int, default=DEFAULT_BLOCK_MB,
+                        help=f"tamanho de cada bloco em MiB (default {DEFAULT_BLOCK_MB})")
+    parser.add_argument("--sep", default=";", help="separador de campos (default ';')")
+    parser.add_argument("--encoding", default="utf-8", help="codificação dos arquivos (default utf-8)")
+    parser.add_argument("--gerar", type=int, metavar="N",
+                        help="gera microdados sintéticos com N linhas no (único) arquivo informado e sai")
+    args = parser.parse_args(argv)
+
+    if args.gerar is not None:
+        if len(args.arquivos) != 1:
+            parser.error("--gerar exige exatamente um arquivo de saída")
+        started = time.perf_counter()
+        generate_sample(args.arquivos[0], args.gerar, args.tipo, sep=args.sep)
+        print(f"{args.gerar} linhas geradas em {args.arquivos[0]} ({time.perf_counter() - started:.1f}s).")
+        return 0
+
+    if not args.arquivos:
+        parser.error("informe ao menos um arquivo")
+
+    started = time.perf_counter()
+    raw, blocks = reduce_files(args.arquivos, args.tipo, args.processos, args.sep, args.encoding, args.bloco_mb)
+    counts, rejected = normalize(raw)
+    rows = sum(raw.values())
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    print(f"{rows} linhas em {blocks} blocos reduzidas em {elapsed:.1f}s com {args.processos} processos "
+          f"({rate:,.0f} linhas/s, {rate / args.processos:,.0f} por processo); "
+          f"{rejected} descartadas sem data válida.")
+
+    started = time.perf_counter()
+    groups, estados, pontos = write_counts(counts, args.tipo)
+    print(f"{groups} grupos (ano, mes, UF, fabricante) gravados em aplicacao_rollup; "
+          f"{estados} estados e {pontos} pontos da série recalculados em {time.perf_counter() - started:.1f}s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""Carga em streaming de CSVs de distribuição em `public.distribuicao_raw`.
+
+Alternativa em Python aos scripts PowerShell de restore de dump: lê um ou
+mais CSVs (`.csv` ou `.csv.gz`) e os envia ao Postgres com `COPY FROM STDIN`
+em blocos, sem carregar o arquivo em memória. As colunas ANO, MES e QTDE são
+gravadas como inteiros; o texto do insumo (ex.: TX_INSUMO), se houver, vira o
+id smallint de `public.fabricantes` em FABRICANTE_ID.
+
+A carga é idempotente por (ANO, MES): os meses presentes no arquivo são
+apagados e regravados na mesma transação, então um mês pode ser reimportado
+sem limpar a tabela. Ao final, só esses meses são reagregados no rollup.
+
+Uso (a partir de `back-end/`):
+
+    python load_distribuicao.py dados/distribuicao_2024.csv.gz
+    python load_distribuicao.py --sep , --encoding utf-8 jan.csv fev.csv
+    python load_distribuicao.py --sep '\\t' --encoding cp1252 dados.tsv
+
+    # arquivo sintético para benchmark da carga
+    python load_distribuicao.py --gerar 5000000 /tmp/amostra.csv.gz
+"""
+import argparse
+import codecs
+import csv
+import gzip
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import engine
+from app.fabricantes import create_mapping_table, ensure_fabricantes, ensure_raw_column
+from app.partitioning import create_covering_index, create_partitioned_table, ensure_year_partitions
+from app.rollup import create_rollup_table, refresh_rollup_periods
+from app.schema import (
+    COLUMN_CANDIDATES,
+    INTEGER_TYPES,
+    OPTIONAL_COLUMN_CANDIDATES,
+    RAW_SCHEMA,
+    RAW_TABLE,
+    quote_ident,
+    refresh_column_map,
+    match_column,
+)
+
+
+# Tamanho de cada bloco enviado ao COPY (bytes lidos do arquivo por vez)
+COPY_CHUNK_BYTES = 1 << 20
+
+# Tipo de cada coluna lógica na tabela bruta tipada
+TYPED_COLUMNS = {"ano": "integer", "mes": "integer", "sigla": "varchar(2)", "qtde": "bigint"}
+
+# Codificações aceitas (nome canônico do Python -> nome no Postgres)
+PG_ENCODINGS = {
+    "utf-8": "UTF8",
+    "iso8859-1": "LATIN1",
+    "iso8859-15": "LATIN9",
+    "cp1250": "WIN1250",
+    "cp1252": "WIN1252",
+}
+
+SIGLAS = [
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+]
+
+
+def parse_sep(value: str) -> str:
+    """Separador do `--sep`: um único caractere (`\\t` ou `tab` viram TAB)."""
+    sep = "\t" if value in ("\\t", "tab") else value
+    if len(sep) != 1 or sep in '"\r\n':
+        raise ValueError(f"separador inválido: {value!r} (use um único caractere, exceto aspas e quebra de linha)")
+    return sep
+
+
+def pg_encoding(encoding: str) -> str:
+    """Nome no Postgres da codificação Python `encoding` (ex.: latin-1 -> LATIN1)."""
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        name = None
+    if name not in PG_ENCODINGS:
+        raise ValueError(f"codificação não suportada: {encoding!r} (use uma de: {', '.join(sorted(PG_ENCODINGS))})")
+    return PG_ENCODINGS[name]
+
+
+def sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def open_text(path: str, encoding: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding=encoding, newline="")
+    return open(path, "r", encoding=encoding, newline="")
+
+
+def open_binary(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def read_header(path: str, sep: str, encoding: str) -> List[str]:
+    with open_text(path, encoding) as f:
+        header = next(csv.reader(f, delimiter=sep), None)
+    if not header:
+        raise RuntimeError(f"{path}: arquivo vazio ou sem cabeçalho.")
+    return [h.strip().lstrip("\ufeff") for h in header]
+
+
+def map_header(header: List[str]) -> Dict[str, str]:
+    """Coluna do CSV correspondente a cada coluna lógica (ano, mes, sigla, qtde
+    e, se existir, o texto do fabricante)."""
+    available = {name: "" for name in header}
+    mapping = {}
+    missing = []
+    for logical, candidates in COLUMN_CANDIDATES.items():
+        name = match_column(candidates, available)
+        if name is None:
+            missing.append(logical)
+        else:
+            mapping[logical] = name
+    if missing:
+        raise RuntimeError(f"Colunas ausentes no CSV: {', '.join(missing)} (cabeçalho: {', '.join(header)})")
+    fabricante = match_column(OPTIONAL_COLUMN_CANDIDATES["fabricante"], available)
+    if fabricante is not None:
+        mapping["fabricante"] = fabricante
+    return mapping
+
+
+def ensure_typed_table(conn: Connection) -> None:
+    """Cria `distribuicao_raw` tipada e particionada, ou converte ANO/MES/QTDE
+    de uma tabela vinda de dump (QTDE como texto) para inteiros.
+
+    Para particionar uma tabela já existente, use `python -m app.partitioning`.
+    """
+    exists = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL AS ok"),
+                          {"name": f"{RAW_SCHEMA}.{RAW_TABLE}"}).first().ok
+    if not exists:
+        # Tabela nova já nasce particionada por ANO, com o índice de cobertura
+        columns = [(name.upper(), sql_type) for name, sql_type in TYPED_COLUMNS.items()]
+        create_partitioned_table(conn, RAW_TABLE, columns, "ANO")
+        create_covering_index(conn)
+        ensure_raw_column(conn)
+        return
+
+    column_map = refresh_column_map(conn)
+    for logical in ("ano", "mes", "qtde"):
+        if column_map.types[logical] in INTEGER_TYPES:
+            continue
+        col = column_map.col(logical)
+        target = TYPED_COLUMNS[logical]
+        print(f"Convertendo {RAW_TABLE}.{column_map.columns[logical]} ({column_map.types[logical]}) para {target}...")
+        conn.execute(text(
+            f"ALTER TABLE {column_map.table} ALTER COLUMN {col} TYPE {target} "
+            f"USING CAST(NULLIF(trim(CAST({col} AS text)), '') AS numeric)::{target}"
+        ))
+    ensure_raw_column(conn)
+    refresh_column_map(conn)
+
+
+def copy_into_stage(conn: Connection, path: str, header: List[str], sep: str, encoding: str) -> int:
+    """COPY do arquivo inteiro para uma tabela temporária só de texto.
+
+    O psycopg2 lê o arquivo em blocos de COPY_CHUNK_BYTES, então a memória
+    usada não depende do tamanho do arquivo.
+    """
+    stage_cols = []
+    seen = set()
+    for i, name in enumerate(header):
+        # Cabeçalhos repetidos ou vazios ganham um nome único no staging
+        col = name if name and name not in seen else f"{name}_{i}"
+        seen.add(col)
+        stage_cols.append(quote_ident(col))
+
+    conn.execute(text(
+        f"CREATE TEMP TABLE distribuicao_stage ({', '.join(c + ' text' for c in stage_cols)}) ON COMMIT DROP"
+    ))
+    copy_sql = (
+        f"COPY distribuicao_stage ({', '.join(stage_cols)}) FROM STDIN "
+        f"WITH (FORMAT csv, HEADER true, DELIMITER {sql_literal(parse_sep(sep))}, "
+        f"ENCODING {sql_literal(pg_encoding(encoding))})"
+    )
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        with open_binary(path) as f:
+            cursor.copy_expert(copy_sql, f, size=COPY_CHUNK_BYTES)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def typed_expr(column: str, sql_type: str) -> str:
+    if sql_type.startswith("varchar"):
+        return f"upper(NULLIF(trim({column}), ''))"
+    return f"CAST(NULLIF(replace(trim({column}), ',', '.'), '') AS numeric)::{sql_type}"
+
+
+def load_file(path: str, sep: str, encoding: str, refresh: bool = True) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """Carrega um arquivo numa única transação.
+
+    Retorna (linhas gravadas, linhas descartadas por falta de ANO/MES, meses
+    recarregados).
+    """
+    # Validar antes de abrir o arquivo e a transação
+    sep = parse_sep(sep)
+    pg_encoding(encoding)
+    header = read_header(path, sep, encoding)
+    mapping = map_header(header)
+
+    with engine.begin() as conn:
+        ensure_typed_table(conn)
+        column_map = refresh_column_map(conn)
+        copy_into_stage(conn, path, header, sep, encoding)
+
+        select_cols = ", ".join(
+            f"{typed_expr(quote_ident(mapping[logical]), sql_type)} AS {logical}"
+            for logical, sql_type in TYPED_COLUMNS.items()
+        )
+        if "fabricante" in mapping:
+            select_cols += f", NULLIF(trim({quote_ident(mapping['fabricante'])}), '') AS fabricante"
+        else:
+            select_cols += ", CAST(NULL AS text) AS fabricante"
+        conn.execute(text(
+            f"CREATE TEMP TABLE distribuicao_typed ON COMMIT DROP AS SELECT {select_cols} FROM distribuicao_stage"
+        ))
+        conn.execute(text("DROP TABLE distribuicao_stage"))
+
+        # Linhas sem ANO/MES não pertencem a nenhum mês, então não há como
+        # recarregá-las de forma idempotente: são descartadas e contadas
+        rejected = conn.execute(text(
+            "DELETE FROM distribuicao_typed WHERE ano IS NULL OR mes IS NULL"
+        )).rowcount
+        periods = [(r.ano, r.mes) for r in conn.execute(text(
+            "SELECT DISTINCT ano, mes FROM distribuicao_typed ORDER BY ano, mes"
+        ))]
+
+        ensure_year_partitions(conn, {ano for ano, _ in periods})
+
+        ano, mes = column_map.col("ano"), column_map.col("mes")
+        conn.execute(text(
+            f"DELETE FROM {column_map.table} AS r USING (SELECT DISTINCT ano, mes FROM distribuicao_typed) AS p "
+            f"WHERE r.{ano} = p.ano AND r.{mes} = p.mes"
+        ))
+        # Textos distintos do insumo -> id do fabricante (poucos valores), e o
+        # INSERT resolve o id com um JOIN, sem passar linha a linha pelo Python
+        textos = [r[0] for r in conn.execute(text("SELECT DISTINCT fabricante FROM distribuicao_typed"))]
+        create_mapping_table(conn, ensure_fabricantes(conn, textos))
+        target_cols = ", ".join(column_map.col(logical) for logical in TYPED_COLUMNS)
+        source_cols = ", ".join(f"t.{logical}" for logical in TYPED_COLUMNS)
+        inserted = conn.execute(text(
+            f"INSERT INTO {column_map.table} ({target_cols}, {column_map.col('fabricante_id')}) "
+            f"SELECT {source_cols}, m.fabricante_id FROM distribuicao_typed AS t "
+            f"LEFT JOIN fabricante_map AS m ON m.texto = t.fabricante"
+        )).rowcount
+
+        if refresh:
+            create_rollup_table(conn)
+            refresh_rollup_periods(conn, periods)
+
+    return inserted, rejected, periods
+
+
+def generate_sample(path: str, rows: int, seed: int = 42, sep: str = ";") -> None:
+    """Gera um CSV sintético (determinístico) no formato do dump de distribuição."""
+    rng = random.Random(seed)
+    opener = (lambda: gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=1)) \
+        if path.endswith(".gz") else (lambda: open(path, "w", encoding="utf-8", newline=""))
+    anos = [2021, 2022, 2023, 2024]
+    with opener() as f:
+        writer = csv.writer(f, delimiter=sep)
+        writer.writerow(["ANO", "MES", "SIGLA", "QTDE", "TX_INSUMO"])
+        insumos = ["PFIZER", "ASTRAZENECA", "CORONAVAC", "JANSSEN"]
+        for _ in range(rows):
+            writer.writerow([
+                rng.choice(anos), rng.randint(1, 12), rng.choice(SIGLAS),
+                rng.randint(1, 5000), rng.choice(insumos),
+            ])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Carrega CSVs de distribuição em distribuicao_raw via COPY.")
+    parser.add_argument("arquivos", nargs="*", help="CSV(s) de distribuição (.csv ou .csv.gz)")
+    parser.add_argument("--sep", default=";", help="separador de campos, um caractere ou \\t (default ';')")
+    parser.add_argument("--encoding", default="latin-1",
+                        help=f"codificação dos arquivos (default latin-1; aceitas: {', '.join(sorted(PG_ENCODINGS))})")
+    parser.add_argument("--sem-rollup", action="store_true", help="não reagregar os meses carregados no rollup")
+    parser.add_argument("--gerar", type=int, metavar="N",
+                        help="gera um CSV sintético com N linhas no (único) arquivo informado e sai")
+    args = parser.parse_args(argv)
+    try:
+        args.sep = parse_sep(args.sep)
+        pg_encoding(args.encoding)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.gerar is not None:
+        if len(args.arquivos) != 1:
+            parser.error("--gerar exige exatamente um arquivo de saída")
+        started = time.perf_counter()
+        generate_sample(args.arquivos[0], args.gerar, sep=args.sep)
+        print(f"{args.gerar} linhas geradas em {args.arquivos[0]} ({time.perf_counter() - started:.1f}s).")
+        return 0
+
+    if not args.arquivos:
+        parser.error("informe ao menos um arquivo")
+
+    for path in args.arquivos:
+        started = time.perf_counter()
+        inserted, rejected, periods = load_file(path, args.sep, args.encoding, refresh=not args.sem_rollup)
+        elapsed = time.perf_counter() - started
+        rate = inserted / elapsed if elapsed > 0 else 0.0
+        print(f"{path}: {inserted} linhas em {elapsed:.1f}s ({rate:,.0f} linhas/s), "
+              f"{len(periods)} meses recarregados, {rejected} linhas sem ANO/MES descartadas.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
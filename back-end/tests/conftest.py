@@ -0,0 +1,15 @@
+"""Testes unitários da lógica pura do backend (sem Postgres).
+
+As conferências que precisam de um banco populado continuam nos
+`python -m app.X --verificar`. Aqui só é preciso uma DATABASE_URL qualquer:
+app/database.py exige a variável, mas os engines não conectam ao importar.
+
+Uso (a partir de `back-end/`):
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+os.environ.setdefault("DATABASE_URL", "postgresql://teste@127.0.0.1:1/teste")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.admission import EndpointLimiter, Overloaded, is_overloaded, parse_endpoint_limits
+from app.singleflight import SharedFailure
+
+
+def test_parse_endpoint_limits():
+    limits = parse_endpoint_limits("dashboard=2/8, overview=4, lixo, ranking_ufs=x/1")
+    assert limits["dashboard"] == (2, 8)
+    assert limits["overview"][0] == 4
+    assert "ranking_ufs" not in limits and "lixo" not in limits
+
+
+def test_slots_queue_fifo_and_handoff():
+    async def run():
+        limiter = EndpointLimiter("teste", concurrency=1, queue=2)
+        order = []
+        await limiter.acquire(None)
+
+        async def waiter(name):
+            await limiter.acquire(None)
+            order.append(name)
+
+        tasks = [asyncio.ensure_future(waiter(n)) for n in ("a", "b")]
+        await asyncio.sleep(0)
+        assert limiter.active == 1 and limiter.waiting == 2
+
+        # Fila cheia: recusa na hora
+        with pytest.raises(Overloaded):
+            await limiter.acquire(None)
+
+        limiter.release()
+        await asyncio.sleep(0)
+        assert order == ["a"] and limiter.active == 1
+        limiter.release()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b"]
+        limiter.release()
+        assert limiter.active == 0 and limiter.waiting == 0
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    async def run():
+        limiter = EndpointLimiter("teste", concurrency=1, queue=4)
+        await limiter.acquire(None)
+        with pytest.raises(Overloaded):
+            await limiter.acquire(0.01)
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def run():
+        limiter = EndpointLimiter("teste", concurrency=1, queue=4)
+        await limiter.acquire(None)
+        task = asyncio.ensure_future(limiter.acquire(None))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert limiter.waiting == 0
+        limiter.release()
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_is_overloaded_sees_shared_failure_cause():
+    shared = SharedFailure("fila cheia")
+    shared.__cause__ = Overloaded("fila cheia")
+    assert is_overloaded(Overloaded("x")) and is_overloaded(shared)
+    assert not is_overloaded(RuntimeError("x"))
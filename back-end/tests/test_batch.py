@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+from app.batch import answer, batch_sql
+from app.series import SeriesWindow, periodo, window_series
+
+
+Row = namedtuple("Row", "ano mes sigla fabricante_id qtde aplicadas esavi")
+Snapshot = namedtuple(
+    "Snapshot", "uf nome distribuídas aplicadas eficiência populacao doses_por_100k cobertura posicao"
+)
+
+ROWS = [
+    Row(2021, 1, "SP", 1, 100, 50, 1),
+    Row(2021, 1, "SP", 2, 20, None, None),
+    Row(2021, 2, "SP", 1, 30, 0, 0),
+    Row(2021, 1, "RJ", 1, 60, 30, 0),
+    Row(2022, 1, "RJ", 2, 10, 0, 0),
+    Row(None, None, "MG", None, None, None, None),
+]
+
+SNAPSHOT = [
+    Snapshot("RJ", "Rio de Janeiro", 70, 30, 42.9, 16054524, 0.4, 0.0, 1),
+    Snapshot("SP", "São Paulo", 150, 50, 33.3, 44411238, 0.3, 0.0, 2),
+]
+
+
+def test_batch_sql_unions_filters_and_dedups():
+    sets = [
+        ("a", 2021, None, "SP", None, None),
+        ("b", 2021, None, "SP", None, None),
+        ("c", 2022, 1, None, None, None),
+    ]
+    sql, params = batch_sql("timeseries", sets)
+    assert "WHERE (ano = :ano_0 AND sigla = :sigla_0) OR (ano = :ano_2 AND mes = :mes_2)" in sql
+    assert params == {"ano_0": 2021, "sigla_0": "SP", "ano_2": 2022, "mes_2": 1}
+    # Sem filtro de fabricante, não agrupa por ele
+    assert "CAST(NULL AS smallint) AS fabricante_id" in sql
+    assert sql.endswith("GROUP BY ano, mes, sigla")
+
+
+def test_batch_sql_without_filters_and_overview_ignores_uf():
+    sql, params = batch_sql("ranking_ufs", [("a", 2021, None, None, 1, None), ("b", None, None, None, None, None)])
+    assert "WHERE" not in sql and params == {}
+    assert sql.endswith("GROUP BY ano, mes, sigla, fabricante_id")
+
+    sql, params = batch_sql("overview", [("a", None, None, "SP", None, None)])
+    assert "WHERE" not in sql
+
+
+def test_answer_overview():
+    data = answer("overview", ROWS, ("a", 2021, None, "SP", None, None))
+    # A UF não filtra o overview
+    assert data == {"distribuídas": 210, "aplicadas": 80, "eficiência": 38.1, "esavi": 1}
+    empty = answer("overview", ROWS, ("b", 2030, None, None, None, None))
+    assert empty["distribuídas"] == 0
+
+
+def test_answer_timeseries_and_window():
+    data = answer("timeseries", ROWS, ("a", None, None, "SP", 1, None))
+    assert [(p["ano"], p["mês"], p["distribuídas"]) for p in data] == [(2021, 1, 100), (2021, 2, 30)]
+
+    window_key = SeriesWindow(de=periodo(2021, 2), acumulado=True).key()
+    data = answer("timeseries", ROWS, ("b", None, None, "SP", None, window_key))
+    months = [(2021, 1, 120, 50, 1), (2021, 2, 30, 0, 0)]
+    assert data == window_series(months, "SP", SeriesWindow(*window_key))
+
+
+def test_answer_ranking_uses_snapshot_only_without_period_or_fabricante():
+    data = answer("ranking_ufs", ROWS, ("a", None, None, None, None, None), SNAPSHOT)
+    assert [item["uf"] for item in data] == ["RJ", "SP"]
+    assert data[0]["posição"] == 1 and data[0]["nome"] == "Rio de Janeiro"
+
+    data = answer("ranking_ufs", ROWS, ("b", 2021, None, None, None, None), SNAPSHOT)
+    assert [(item["uf"], item["distribuídas"]) for item in data] == [("SP", 150), ("RJ", 60)]
+    assert data[0]["posição"] is None
+
+
+def test_answer_ranking_falls_back_when_snapshot_has_no_uf():
+    data = answer("ranking_ufs", ROWS, ("a", None, None, "MG", None, None), SNAPSHOT)
+    # SUM só de NULLs: NULL, que o ranking mostra como zero
+    assert [(item["uf"], item["distribuídas"]) for item in data] == [("MG", 0)]
@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from app.queries import (
+    GROUPING_ANO_MES,
+    GROUPING_SIGLA,
+    GROUPING_TOTAL,
+    overview_payload,
+    split_dashboard_rows,
+)
+
+
+Row = namedtuple("Row", "grupo ano mes sigla total aplicadas esavi total_uf aplicadas_uf esavi_uf")
+
+
+def row(grupo, ano=None, mes=None, sigla=None, total=None, total_uf=None, aplicadas_uf=0):
+    return Row(grupo, ano, mes, sigla, total, 0, 0, total_uf, aplicadas_uf, 0)
+
+
+def test_split_dashboard_rows():
+    rows = [
+        row(GROUPING_ANO_MES, None, None, total_uf=5),
+        row(GROUPING_SIGLA, sigla="RJ", total_uf=30),
+        row(GROUPING_ANO_MES, 2021, 2, total_uf=20, aplicadas_uf=10),
+        row(GROUPING_TOTAL, total=300),
+        row(GROUPING_SIGLA, sigla="SP ", total_uf=70),
+        row(GROUPING_ANO_MES, 2021, 1, total_uf=10),
+        # Grupo sem linhas da UF filtrada: fica fora da série e do ranking
+        row(GROUPING_ANO_MES, 2022, 1, total_uf=None),
+        row(GROUPING_SIGLA, sigla="MG", total_uf=None),
+    ]
+    overview, series, ranking = split_dashboard_rows(rows, "SP")
+
+    assert overview == overview_payload(300)
+    # Série por ano/mês, NULLs por último
+    assert [(p["ano"], p["mês"]) for p in series] == [(2021, 1), (2021, 2), (2021, 0)]
+    assert series[1]["eficiência"] == 50.0
+    assert all(p["uf"] == "SP" for p in series)
+    # Ranking por distribuídas decrescente, com a sigla sem espaços
+    assert [(item["uf"], item["distribuídas"]) for item in ranking] == [("SP", 70), ("RJ", 30)]
+
+
+def test_split_dashboard_rows_without_total():
+    overview, series, ranking = split_dashboard_rows([], None)
+    assert overview == overview_payload(0)
+    assert series == [] and ranking == []
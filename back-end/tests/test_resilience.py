@@ -0,0 +1,65 @@
+import asyncio
+
+from app.resilience import CircuitBreaker, LastGoodStore, is_database_failure, parse_endpoint_timeouts
+
+
+def test_parse_endpoint_timeouts():
+    assert parse_endpoint_timeouts("dashboard=5000, overview=2000, x=abc") == {"dashboard": 5000, "overview": 2000}
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, reset_seconds=60)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    # Um sucesso zera a contagem
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["opens"] == 1 and breaker.stats()["rejected"] == 1
+    assert breaker.retry_after() >= 59
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failures=1, reset_seconds=0)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    # Requisição de teste que não usou o banco: libera outra tentativa
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_breaker_half_open_failure_reopens():
+    breaker = CircuitBreaker(failures=5, reset_seconds=0)
+    for _ in range(5):
+        breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["opens"] == 2
+
+
+def test_last_good_store_is_lru():
+    store = LastGoodStore(max_entries=2)
+    store.set("a", 1, {"x": 1})
+    store.set("b", 1, {"x": 2})
+    assert store.get("a")[0] == {"x": 1}
+    store.set("c", 2, {"x": 3})
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c")[1] == 2
+
+
+def test_is_database_failure():
+    assert is_database_failure(asyncio.TimeoutError())
+    assert is_database_failure(ConnectionRefusedError())
+    assert not is_database_failure(ValueError("sql inválido"))
@@ -0,0 +1,69 @@
+import gzip
+import json
+
+from starlette.requests import Request
+
+from app.responses import EncodedBody, coding_etag, gzip_accepted, make_etag, matching_etag, not_modified
+
+
+def request(**headers) -> Request:
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+ETAG = make_etag(("overview", "2021", None, None, None), 6)
+
+
+def test_make_etag_changes_with_version_and_filters():
+    assert ETAG.startswith('"v6-') and ETAG.endswith('"')
+    assert make_etag(("overview", "2021", None, None, None), 7) != ETAG
+    assert make_etag(("overview", "2022", None, None, None), 6) != ETAG
+    assert coding_etag(ETAG, "gz") == ETAG[:-1] + '-gz"'
+
+
+def test_gzip_accepted_honours_q_values():
+    assert gzip_accepted("gzip, deflate, br")
+    assert gzip_accepted("deflate, gzip;q=0.5")
+    assert gzip_accepted("*")
+    assert not gzip_accepted("gzip;q=0")
+    assert not gzip_accepted("gzip;q=0, *")
+    assert not gzip_accepted("*;q=0")
+    assert not gzip_accepted("br")
+    assert not gzip_accepted("")
+
+
+def test_matching_etag():
+    gz, identity = coding_etag(ETAG, "gz"), coding_etag(ETAG, "id")
+    assert matching_etag(request(), ETAG) is None
+    assert matching_etag(request(if_none_match=ETAG), ETAG) == ETAG
+    assert matching_etag(request(if_none_match=f'"outro", W/{identity}'), ETAG) == identity
+    assert matching_etag(request(if_none_match=gz, accept_encoding="gzip"), ETAG) == gz
+    # Cópia em gzip não vale para quem deixou de aceitar gzip
+    assert matching_etag(request(if_none_match=gz, accept_encoding="gzip;q=0"), ETAG) is None
+    assert matching_etag(request(if_none_match="*"), ETAG) == ETAG
+    assert matching_etag(request(if_none_match='"v5-velho"'), ETAG) is None
+
+
+def test_encoded_body_codings_have_distinct_etags():
+    payload = {"data": [{"uf": "SP", "distribuídas": i} for i in range(200)], "success": True, "message": None}
+    body = EncodedBody(payload, ETAG)
+    assert body.gzip_body is not None
+
+    compressed = body.response(request(accept_encoding="gzip"))
+    plain = body.response(request(accept_encoding="gzip;q=0"))
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(compressed.body)) == payload
+    assert "content-encoding" not in plain.headers and json.loads(plain.body) == payload
+    assert compressed.headers["etag"] == coding_etag(ETAG, "gz")
+    assert plain.headers["etag"] == coding_etag(ETAG, "id")
+    assert compressed.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+
+
+def test_small_body_keeps_plain_etag_and_304_vary():
+    body = EncodedBody({"data": 1}, ETAG)
+    response = body.response(request(accept_encoding="gzip"))
+    assert body.gzip_body is None
+    assert response.headers["etag"] == ETAG and "vary" not in response.headers
+
+    assert "vary" not in not_modified(ETAG).headers
+    assert not_modified(coding_etag(ETAG, "gz"), vary=True).headers["vary"] == "Accept-Encoding"
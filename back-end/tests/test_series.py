@@ -0,0 +1,68 @@
+import pytest
+
+from app.series import SeriesWindow, parse_janela, parse_periodo, periodo, window_series
+
+
+MONTHS = [
+    (2021, 1, 10, 5, 1),
+    (2021, 2, 20, 10, 0),
+    # março sem dados: vale zero na janela
+    (2021, 4, 40, 20, 2),
+    (None, None, 999, 0, 0),
+]
+
+
+def test_parse_periodo():
+    assert parse_periodo("2021-03") == periodo(2021, 3)
+    assert parse_periodo("2021") == periodo(2021, 1)
+    assert parse_periodo("2021", fim=True) == periodo(2021, 12)
+    assert parse_periodo(None) is None
+    assert parse_periodo(" ") is None
+    for value in ("xx", "2022-13", "2022-0", "21-01"):
+        with pytest.raises(ValueError):
+            parse_periodo(value)
+
+
+def test_parse_janela():
+    assert parse_janela("3") == 3
+    assert parse_janela(None) is None
+    for value in ("0", "100000", "abc"):
+        with pytest.raises(ValueError):
+            parse_janela(value)
+
+
+def test_from_params_rejects_inverted_range():
+    with pytest.raises(ValueError):
+        SeriesWindow.from_params("2022", "2021", None, None)
+    assert not SeriesWindow.from_params(None, None, None, None).active
+
+
+def test_window_series_without_window_skips_unknown_months():
+    points = window_series(MONTHS, None, SeriesWindow())
+    assert [(p["ano"], p["mês"]) for p in points] == [(2021, 1), (2021, 2), (2021, 4)]
+    assert [p["distribuídas"] for p in points] == [10, 20, 40]
+    assert all(p["uf"] == "BR" for p in points)
+
+
+def test_window_series_cumulative_starts_at_range():
+    window = SeriesWindow(de=periodo(2021, 2), acumulado=True)
+    points = window_series(MONTHS, "SP", window)
+    assert [p["distribuídas_acumuladas"] for p in points] == [20, 60]
+    assert [p["aplicadas_acumuladas"] for p in points] == [10, 30]
+    assert points[-1]["eficiência_acumulada"] == 50.0
+    assert all(p["uf"] == "SP" for p in points)
+
+
+def test_window_series_moving_average_counts_calendar_months():
+    points = window_series(MONTHS, None, SeriesWindow(janela=2))
+    # A janela de janeiro começaria antes do primeiro mês com dados
+    assert [p["média_móvel_distribuídas"] for p in points] == [None, 15.0, 20.0]
+    assert [p["média_móvel_aplicadas"] for p in points] == [None, 7.5, 10.0]
+
+
+def test_window_series_range_and_empty():
+    window = SeriesWindow(de=periodo(2021, 2), ate=periodo(2021, 3), janela=3)
+    points = window_series(MONTHS, None, window)
+    assert [(p["ano"], p["mês"]) for p in points] == [(2021, 2)]
+    assert points[0]["média_móvel_distribuídas"] is None
+    assert window_series([], None, SeriesWindow(janela=3)) == []
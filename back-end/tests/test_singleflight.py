@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SharedFailure, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(enabled=True)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"total": 42}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("chave", compute, "overview") for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert results == [{"total": 42}] * 5
+    assert flight.stats()["leaders"] == 1 and flight.stats()["followers"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_distinct_keys_and_sequential_calls_run_separately():
+    flight = SingleFlight(enabled=True)
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def run():
+        first = await asyncio.gather(flight.do("a", lambda: compute("a")), flight.do("b", lambda: compute("b")))
+        second = await flight.do("a", lambda: compute("a"))
+        return first, second
+
+    assert asyncio.run(run()) == (["a", "b"], "a")
+    assert calls == ["a", "b", "a"]
+
+
+def test_failure_reaches_followers_as_shared_failure():
+    flight = SingleFlight(enabled=True)
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("banco fora do ar")
+
+    async def run():
+        return await asyncio.gather(flight.do("k", compute), flight.do("k", compute), return_exceptions=True)
+
+    leader, follower = asyncio.run(run())
+    assert isinstance(leader, RuntimeError)
+    assert isinstance(follower, SharedFailure)
+    assert isinstance(follower.__cause__, RuntimeError)
+
+
+def test_follower_timeout_does_not_cancel_leader():
+    flight = SingleFlight(enabled=True)
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("k", compute))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(flight.do("k", compute), 0.01)
+        return await leader
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight(enabled=False)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.gather(*(flight.do("k", compute) for _ in range(3)))
+
+    asyncio.run(run())
+    assert calls == 3
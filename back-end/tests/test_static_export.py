@@ -0,0 +1,58 @@
+from app.queries import overview_payload
+from app.static_export import build_payloads, request_key
+
+
+ROWS = [
+    (2021, 1, "SP", (100, 50, 1)),
+    (2021, 2, "SP", (30, 0, 0)),
+    (2021, 1, "RJ", (60, 30, 0)),
+    (2022, 1, "RJ", (10, 0, 0)),
+    (None, None, None, (5, 0, 0)),
+]
+
+SNAPSHOT_ITEMS = [
+    {"uf": "RJ", "nome": "Rio de Janeiro", "distribuídas": 70, "posição": 1},
+    {"uf": "SP", "nome": "São Paulo", "distribuídas": 130, "posição": 2},
+]
+
+
+def test_request_key_matches_frontend():
+    assert request_key("/overview", None, None, None) == "/overview"
+    assert request_key("/timeseries", 2021, None, "SP") == "/timeseries?ano=2021&uf=SP"
+    assert request_key("/dashboard", 2021, 3, None) == "/dashboard?ano=2021&mes=3"
+
+
+def test_build_payloads_combinations():
+    payloads, anos, ufs = build_payloads(ROWS, [])
+    assert anos == [2021, 2022] and ufs == ["RJ", "SP"]
+    # (anos + todos) x (12 meses + todos) x (UFs + todas) x 4 endpoints
+    assert len(payloads) == 3 * 13 * 3 * 4
+
+    assert payloads["/overview"] == overview_payload(205, 80, 1)
+    assert payloads["/overview?ano=2021&mes=1"] == overview_payload(160, 80, 1)
+    # O overview ignora a UF, como na API
+    assert payloads["/overview?ano=2021&uf=SP"] == payloads["/overview?ano=2021"]
+    assert payloads["/overview?ano=2022&mes=5"] == overview_payload(0)
+
+    series = payloads["/timeseries?uf=SP"]
+    assert [(p["ano"], p["mês"], p["distribuídas"], p["uf"]) for p in series] == [
+        (2021, 1, 100, "SP"), (2021, 2, 30, "SP"),
+    ]
+    # Linha sem ano/mês: último ponto da série nacional
+    assert payloads["/timeseries"][-1]["mês"] == 0
+
+    ranking = payloads["/ranking/ufs?ano=2021"]
+    assert [(item["uf"], item["distribuídas"]) for item in ranking] == [("SP", 130), ("RJ", 60)]
+
+    dashboard = payloads["/dashboard?ano=2021&uf=RJ"]
+    assert dashboard["overview"] == payloads["/overview?ano=2021&uf=RJ"]
+    assert dashboard["timeseries"] == payloads["/timeseries?ano=2021&uf=RJ"]
+    assert dashboard["ranking"] == payloads["/ranking/ufs?ano=2021&uf=RJ"]
+
+
+def test_build_payloads_snapshot_only_without_period():
+    payloads, _, _ = build_payloads(ROWS, SNAPSHOT_ITEMS)
+    assert payloads["/ranking/ufs"] == SNAPSHOT_ITEMS
+    assert payloads["/ranking/ufs?uf=SP"] == [SNAPSHOT_ITEMS[1]]
+    # Com período, o ranking vem das linhas agregadas
+    assert [item["uf"] for item in payloads["/ranking/ufs?ano=2022"]] == ["RJ"]
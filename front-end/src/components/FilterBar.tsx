@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import {
   Select,
   SelectContent,
@@ -8,6 +8,16 @@ import {
 } from "@/components/ui/select";
 import { Button } from "@/components/ui/button";
 import { RotateCcw } from "lucide-react";
+import { getFabricantes } from "@/lib/api";
+import { Fabricante } from "@/types";
+
+// Usada enquanto /fabricantes não responde (ou se falhar)
+const FABRICANTES_PADRAO: Fabricante[] = [
+  { id: 1, codigo: "pfizer", nome: "Pfizer/BioNTech" },
+  { id: 2, codigo: "astrazeneca", nome: "AstraZeneca" },
+  { id: 3, codigo: "coronavac", nome: "CoronaVac" },
+  { id: 4, codigo: "janssen", nome: "Janssen" },
+];
 
 interface FilterBarProps {
   onFilterChange?: (filters: Record<string, string>) => void;
@@ -20,6 +30,15 @@ export function FilterBar({ onFilterChange }: FilterBarProps) {
     uf: "todos",
     fabricante: "todos",
   });
+  const [fabricantes, setFabricantes] = useState<Fabricante[]>(FABRICANTES_PADRAO);
+
+  useEffect(() => {
+    getFabricantes()
+      .then((items) => {
+        if (items.length > 0) setFabricantes(items);
+      })
+      .catch(() => {});
+  }, []);
 
   const handleFilterChange = (key: string, value: string) => {
     const newFilters = { ...filters, [key]: value };
@@ -111,10 +130,9 @@ export function FilterBar({ onFilterChange }: FilterBarProps) {
             </SelectTrigger>
             <SelectContent>
               <SelectItem value="todos">Todos</SelectItem>
-              <SelectItem value="pfizer">Pfizer/BioNTech</SelectItem>
-              <SelectItem value="astrazeneca">AstraZeneca</SelectItem>
-              <SelectItem value="coronavac">CoronaVac</SelectItem>
-              <SelectItem value="janssen">Janssen</SelectItem>
+              {fabricantes.map((f) => (
+                <SelectItem key={f.codigo} value={f.codigo}>{f.nome}</SelectItem>
+              ))}
             </SelectContent>
           </Select>
         </div>
@@ -1,9 +1,71 @@
-import { Overview, TimePoint, RankingUf, Filters, ApiResponse } from '@/types';
+import { Overview, TimePoint, RankingUf, Dashboard, Fabricante, Filters, ApiResponse } from '@/types';
 
 const API_BASE_URL = (import.meta as any).env?.VITE_API_URL ?? 'http://localhost:8001';
 
+// Respostas pré-geradas por `python -m app.static_export` (ex.: '/dados' ou
+// a URL de uma CDN). Vazio desliga a leitura estática.
+const STATIC_BASE_URL: string = ((import.meta as any).env?.VITE_STATIC_BASE_URL ?? '').replace(/\/$/, '');
+
+interface StaticManifest {
+  version: number;
+  files: Record<string, string>;
+}
+
+let manifestPromise: Promise<StaticManifest | null> | null = null;
+
+function loadManifest(): Promise<StaticManifest | null> {
+  if (!STATIC_BASE_URL) return Promise.resolve(null);
+  if (!manifestPromise) {
+    manifestPromise = fetch(`${STATIC_BASE_URL}/manifest.json`, { cache: 'no-cache' })
+      .then((response) => (response.ok ? (response.json() as Promise<StaticManifest>) : null))
+      .catch(() => null);
+  }
+  return manifestPromise;
+}
+
+// Mesma chave de `request_key` em back-end/app/static_export.py
+function staticKey(endpoint: string, params?: Record<string, string | number | boolean | undefined>): string | null {
+  const query: string[] = [];
+  for (const [key, value] of Object.entries(params ?? {})) {
+    if (value === undefined || value === null) continue;
+    if (key !== 'ano' && key !== 'mes' && key !== 'uf') return null; // ex.: fabricante: só na API
+  }
+  for (const name of ['ano', 'mes', 'uf']) {
+    const value = params?.[name];
+    if (value === undefined || value === null) continue;
+    if (name === 'uf') {
+      query.push(`uf=${encodeURIComponent(String(value))}`);
+    } else {
+      const parsed = parseInt(String(value), 10);
+      if (Number.isNaN(parsed)) return null;
+      query.push(`${name}=${parsed}`);
+    }
+  }
+  return query.length ? `${endpoint}?${query.join('&')}` : endpoint;
+}
+
+// Resposta estática da combinação de filtros, se exportada; senão undefined
+async function fetchStatic<T>(endpoint: string, params?: Record<string, string | number | boolean | undefined>): Promise<T | undefined> {
+  const key = staticKey(endpoint, params);
+  if (key === null) return undefined;
+  const manifest = await loadManifest();
+  const file = manifest?.files[key];
+  if (!file) return undefined;
+  try {
+    const response = await fetch(`${STATIC_BASE_URL}/${file}`);
+    if (!response.ok) return undefined;
+    return ((await response.json()) as ApiResponse<T>).data;
+  } catch {
+    return undefined;
+  }
+}
+
 // Função auxiliar para fazer requisições HTTP
 async function fetchApi<T>(endpoint: string, params?: Record<string, string | number | boolean | undefined>): Promise<T> {
+  // Combinações exportadas vêm da CDN; as demais (ou em caso de falha), da API
+  const exported = await fetchStatic<T>(endpoint, params);
+  if (exported !== undefined) return exported;
+
   const url = new URL(`${API_BASE_URL}${endpoint}`);
 
   if (params) {
@@ -55,8 +117,11 @@ export async function getOverview(filters: Filters = {}): Promise<Overview> {
 
   // Buscar dados brutos e normalizar chaves (aceitar tanto 'distribuídas' quanto 'distribuidas')
   const raw = await fetchApi<any>('/overview', params);
+  return normalizeOverview(raw);
+}
 
-  // Normalizar nomes de campos do backend para o formato esperado pelo frontend
+// Normalizar nomes de campos do backend para o formato esperado pelo frontend
+function normalizeOverview(raw: any): Overview {
   const distribuidas = raw?.['distribuidas'] ?? raw?.['distribuídas'] ?? 0;
   const aplicadas = raw?.['aplicadas'] ?? 0;
   const eficiencia = raw?.['eficiencia'] ?? raw?.['eficiência'] ?? 0.0;
@@ -104,6 +169,34 @@ export async function getRankingUfs(filters: Filters = {}): Promise<RankingUf[]>
   return fetchApi<RankingUf[]>('/ranking/ufs', params);
 }
 
+// Buscar overview, série temporal e ranking de UFs em uma única requisição
+export async function getDashboard(filters: Filters = {}): Promise<Dashboard> {
+  const params: Record<string, string | number | boolean | undefined> = {};
+  const shouldInclude = (v: any) => {
+    if (v === undefined || v === null) return false;
+    if (typeof v === 'string' && v.trim().toLowerCase() === 'todos') return false;
+    return true;
+  };
+
+  if (shouldInclude(filters.ano)) params.ano = filters.ano;
+  if (shouldInclude(filters.mes)) params.mes = filters.mes;
+  if (shouldInclude(filters.uf)) params.uf = filters.uf;
+  if (shouldInclude(filters.fabricante)) params.fabricante = filters.fabricante;
+
+  const raw = await fetchApi<any>('/dashboard', params);
+
+  return {
+    overview: normalizeOverview(raw?.overview),
+    timeseries: (raw?.timeseries ?? []) as TimePoint[],
+    ranking: (raw?.ranking ?? []) as RankingUf[],
+  };
+}
+
+// Buscar fabricantes aceitos pelo filtro `fabricante`
+export async function getFabricantes(): Promise<Fabricante[]> {
+  return fetchApi<Fabricante[]>('/fabricantes');
+}
+
 // Hook personalizado para gerenciar estado de carregamento
 export function useApiState<T>() {
   return {
@@ -13,7 +13,7 @@ import {
   LineChart,
   Line,
 } from "recharts";
-import { getOverview, getTimeseries, getRankingUfs } from "@/lib/api";
+import { getDashboard } from "@/lib/api";
 import { Filters, Overview, TimePoint, RankingUf } from "@/types";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
 
@@ -31,11 +31,7 @@ export function Aplicacao() {
       try {
         setLoading(true);
         setError(null);
-        const [ov, ts, rk] = await Promise.all([
-          getOverview(filters),
-          getTimeseries(filters),
-          getRankingUfs(filters),
-        ]);
+        const { overview: ov, timeseries: ts, ranking: rk } = await getDashboard(filters);
         if (!cancelled) {
           setOverview(ov);
           setTimeseries(ts);
@@ -3,7 +3,7 @@ import { FilterBar } from "@/components/FilterBar";
 import { Kpis } from "@/components/Kpis";
 import { TimeSeries } from "@/components/TimeSeries";
 import { RankingTable } from "@/components/RankingTable";
-import { getOverview, getTimeseries, getRankingUfs } from "@/lib/api";
+import { getDashboard } from "@/lib/api";
 import { Overview, TimePoint, RankingUf, Filters } from "@/types";
 
 export function Dashboard() {
@@ -20,11 +20,8 @@ export function Dashboard() {
       try {
         setLoading(true);
         setError(null);
-        const [ov, ts, rk] = await Promise.all([
-          getOverview(filters),
-          getTimeseries(filters),
-          getRankingUfs(filters),
-        ]);
+        // Uma única requisição (/dashboard) em vez de três em paralelo
+        const { overview: ov, timeseries: ts, ranking: rk } = await getDashboard(filters);
         if (!isCancelled) {
           setOverview(ov);
           setTimeseries(ts);
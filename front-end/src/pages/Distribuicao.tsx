@@ -13,7 +13,7 @@ import {
   LineChart,
   Line,
 } from "recharts";
-import { getTimeseries, getRankingUfs } from "@/lib/api";
+import { getDashboard } from "@/lib/api";
 import { Filters, TimePoint, RankingUf } from "@/types";
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table";
 
@@ -32,10 +32,7 @@ export function Distribuicao() {
       try {
         setLoading(true);
         setError(null);
-        const [ts, rk] = await Promise.all([
-          getTimeseries(filters),
-          getRankingUfs(filters),
-        ]);
+        const { timeseries: ts, ranking: rk } = await getDashboard(filters);
         if (!cancelled) {
           setTimeseries(ts);
           setRanking(rk);
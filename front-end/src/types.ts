@@ -30,6 +30,23 @@ export interface RankingUf {
   distribuídas: number;
   aplicadas: number;
   eficiência: number;
+  // Só no ranking sem filtro de período nem de fabricante (snapshot dos estados)
+  população?: number | null;
+  doses_por_100k?: number | null;
+  cobertura?: number | null;
+  posição?: number | null;
+}
+
+export interface Fabricante {
+  id: number;
+  codigo: string;
+  nome: string;
+}
+
+export interface Dashboard {
+  overview: Overview;
+  timeseries: TimePoint[];
+  ranking: RankingUf[];
 }
 
 export interface ApiResponse<T> {